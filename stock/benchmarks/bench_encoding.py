@@ -0,0 +1,113 @@
+"""
+原始 SQL 结果编码性能对比
+
+生成与 K 线查询相同结构的合成结果（date + 8 个 Decimal 列，均线含 None），对比:
+  - 原实现：逐行 dict(zip()) + 逐值 isinstance 转换 + json.dumps
+  - 按列转换为字典列表 + json / orjson
+  - 按列转换为列式结构 + json / orjson
+
+用法:
+    python benchmarks/bench_encoding.py --rows 5000 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockproj.settings')
+django.setup()
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from visualization import encoding
+from visualization.encoding import column_converters, columns_to_rows, convert_column
+
+
+NAMES = ['trade_date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'ma_1', 'ma_2', 'ma_3']
+
+
+def make_rows(n_rows, seed=0):
+    """生成 n_rows 行 K 线查询结果，前 20 行均线为 None"""
+    rng = random.Random(seed)
+    start = date(2000, 1, 3)
+    rows = []
+    price = 10.0
+    for i in range(n_rows):
+        price = max(1.0, price * (1 + rng.uniform(-0.03, 0.03)))
+        prices = [Decimal(f'{price * rng.uniform(0.98, 1.02):.4f}') for _ in range(4)]
+        ma = [None if i < 20 else Decimal(f'{price:.4f}') for _ in range(3)]
+        rows.append((start + timedelta(days=i), *prices, Decimal(rng.randint(1000, 999999)), *ma))
+    return rows
+
+
+def encode_per_cell(rows):
+    """原实现"""
+    data = []
+    for row in rows:
+        item = dict(zip(NAMES, row))
+        for key, value in item.items():
+            if isinstance(value, Decimal):
+                item[key] = float(value)
+            elif isinstance(value, date):
+                item[key] = str(value)
+        data.append(item)
+    return json.dumps({'data': data}, cls=DjangoJSONEncoder)
+
+
+def convert(rows):
+    description = [(name, None) for name in NAMES]
+    raw = list(zip(*rows))
+    return [convert_column(values, conv) for values, conv in zip(raw, column_converters(description, raw))]
+
+
+def bench(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<28} {elapsed * 1000:9.3f} ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='原始 SQL 结果编码性能对比')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    orjson = encoding.orjson
+
+    def json_dumps(data):
+        return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+    print(f"{args.rows} 行 x {len(NAMES)} 列，重复 {args.repeat} 次（orjson {'已安装' if orjson else '未安装'}）")
+    base = bench('逐值转换 + json', lambda: encode_per_cell(rows), args.repeat)
+    results = [
+        ('按列转换（不序列化）', lambda: convert(rows)),
+        ('按列转换 -> 行 + json', lambda: json_dumps({'data': columns_to_rows(NAMES, convert(rows))})),
+        ('按列转换 -> 列 + json', lambda: json_dumps({'data': dict(zip(NAMES, convert(rows)))})),
+    ]
+    if orjson is not None:
+        results += [
+            ('按列转换 -> 行 + orjson', lambda: orjson.dumps({'data': columns_to_rows(NAMES, convert(rows))})),
+            ('按列转换 -> 列 + orjson', lambda: orjson.dumps({'data': dict(zip(NAMES, convert(rows)))})),
+        ]
+    for label, func in results:
+        elapsed = bench(label, func, args.repeat)
+        print(f"  {'':<28} {base / elapsed:8.1f}x")
+
+    # 结果一致性检查
+    assert json.loads(encode_per_cell(rows))['data'] == columns_to_rows(NAMES, convert(rows))
+
+
+if __name__ == '__main__':
+    main()
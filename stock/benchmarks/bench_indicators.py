@@ -0,0 +1,165 @@
+"""
+技术指标计算性能对比
+
+在合成数据上对比 custom_chart_example.py 原有的逐点 Python 循环（每个点重新切片求和/
+求标准差/统计涨跌，O(n·period)）与 stock.indicators 的向量化实现，并对比
+逐只股票调用与（股票 x 交易日）二维矩阵一次计算。不访问数据库。
+
+原 calculate_rsi 是每个点取最近 period 天涨跌的简单平均，stock.indicators.rsi 为
+Wilder 平滑，两者数值不同，只比较耗时。
+
+用法:
+    python benchmarks/bench_indicators.py --length 2000 --tickers 500 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockproj.settings')
+django.setup()
+
+from stock import indicators
+
+
+def make_dataset(n_tickers, length, seed=0):
+    """生成随机游走的最高/最低/收盘价"""
+    rng = np.random.default_rng(seed)
+    closes = 10 * np.cumprod(1 + rng.normal(0, 0.02, size=(n_tickers, length)), axis=1)
+    spread = closes * rng.uniform(0, 0.03, size=closes.shape)
+    return closes + spread, closes - spread, closes
+
+
+# ---- 原实现（custom_chart_example.py 改写前） ----
+
+def legacy_sma(data, period=20):
+    sma = []
+    for i in range(len(data)):
+        if i < period - 1:
+            sma.append(None)
+        else:
+            sma.append(sum(data[i - period + 1: i + 1]) / period)
+    return sma
+
+
+def legacy_ema(data, period=20):
+    ema = [data[0]]
+    multiplier = 2 / (period + 1)
+    for i in range(1, len(data)):
+        ema.append((data[i] - ema[i - 1]) * multiplier + ema[i - 1])
+    return ema
+
+
+def legacy_bollinger_bands(data, period=20, std_dev=2):
+    sma = legacy_sma(data, period)
+    upper_band = []
+    lower_band = []
+    for i in range(len(data)):
+        if sma[i] is None:
+            upper_band.append(None)
+            lower_band.append(None)
+        else:
+            std = np.std(data[i - period + 1: i + 1])
+            upper_band.append(sma[i] + std * std_dev)
+            lower_band.append(sma[i] - std * std_dev)
+    return upper_band, sma, lower_band
+
+
+def legacy_rsi(data, period=14):
+    rsi = []
+    for i in range(len(data)):
+        if i < period:
+            rsi.append(None)
+            continue
+        gains = []
+        losses = []
+        for j in range(i - period + 1, i + 1):
+            change = data[j] - data[j - 1]
+            gains.append(change if change > 0 else 0)
+            losses.append(0 if change > 0 else abs(change))
+        avg_gain = sum(gains) / period
+        avg_loss = sum(losses) / period
+        rsi.append(100 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss))
+    return rsi
+
+
+def legacy_macd(data):
+    ema12 = legacy_ema(data, 12)
+    ema26 = legacy_ema(data, 26)
+    line = [a - b for a, b in zip(ema12, ema26)]
+    signal = legacy_ema(line, 9)
+    return line, signal, [a - b for a, b in zip(line, signal)]
+
+
+def to_array(values):
+    return np.array([np.nan if v is None else v for v in values])
+
+
+def bench(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<32} {elapsed * 1000:10.3f} ms")
+    return elapsed
+
+
+def compare(label, legacy, vectorized, repeat):
+    base = bench(f'{label}（原实现）', legacy, repeat)
+    elapsed = bench(f'{label}（向量化）', vectorized, repeat)
+    print(f"  {'':<32} {base / elapsed:9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='技术指标计算性能对比')
+    parser.add_argument('--length', type=int, default=2000, help='单只股票的交易日数量')
+    parser.add_argument('--tickers', type=int, default=500, help='二维对比的股票数量')
+    parser.add_argument('--days', type=int, default=250, help='二维对比的交易日数量')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    highs, lows, closes = make_dataset(1, args.length)
+    close = closes[0]
+    close_list = close.tolist()
+
+    # 结果一致性检查
+    assert np.allclose(to_array(legacy_sma(close_list, 20)), indicators.sma(close, 20), equal_nan=True)
+    assert np.allclose(legacy_ema(close_list, 20), indicators.ema(close, 20))
+    for old, new in zip(legacy_bollinger_bands(close_list), indicators.bollinger_bands(close)):
+        assert np.allclose(to_array(old), new, equal_nan=True)
+    for old, new in zip(legacy_macd(close_list), indicators.macd(close)):
+        assert np.allclose(old, new)
+
+    print(f"单只股票 {args.length} 个交易日，重复 {args.repeat} 次")
+    compare('SMA20', lambda: legacy_sma(close_list, 20), lambda: indicators.sma(close, 20), args.repeat)
+    compare('SMA50', lambda: legacy_sma(close_list, 50), lambda: indicators.sma(close, 50), args.repeat)
+    compare('EMA20', lambda: legacy_ema(close_list, 20), lambda: indicators.ema(close, 20), args.repeat)
+    compare('布林带', lambda: legacy_bollinger_bands(close_list), lambda: indicators.bollinger_bands(close),
+            args.repeat)
+    compare('RSI14（简单平均 / Wilder）', lambda: legacy_rsi(close_list), lambda: indicators.rsi(close), args.repeat)
+    compare('MACD', lambda: legacy_macd(close_list), lambda: indicators.macd(close), args.repeat)
+    bench('ATR14（向量化）', lambda: indicators.atr(highs[0], lows[0], close), args.repeat)
+    bench('KDJ（向量化）', lambda: indicators.kdj(highs[0], lows[0], close), args.repeat)
+
+    highs, lows, closes = make_dataset(args.tickers, args.days, seed=1)
+    print(f"\n{args.tickers} 只股票 x {args.days} 个交易日：逐只调用 vs 二维矩阵一次计算")
+    for label, func in [
+        ('SMA20', lambda c, h, l: indicators.sma(c, 20)),
+        ('布林带', lambda c, h, l: indicators.bollinger_bands(c)),
+        ('RSI14', lambda c, h, l: indicators.rsi(c)),
+        ('MACD', lambda c, h, l: indicators.macd(c)),
+        ('ATR14', lambda c, h, l: indicators.atr(h, l, c)),
+        ('KDJ', lambda c, h, l: indicators.kdj(h, l, c)),
+    ]:
+        base = bench(f'{label}（逐只）', lambda: [func(c, h, l) for c, h, l in zip(closes, highs, lows)], args.repeat)
+        elapsed = bench(f'{label}（二维）', lambda: func(closes, highs, lows), args.repeat)
+        print(f"  {'':<32} {base / elapsed:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
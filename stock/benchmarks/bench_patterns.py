@@ -0,0 +1,103 @@
+"""
+涨跌形态生成性能对比
+
+在合成数据上对比逐窗口 Python 循环（原 generate_trend_patterns 的计算方式）
+与 stock.patterns 的 NumPy 向量化实现，只比较计算部分，不访问数据库。
+
+用法:
+    python benchmarks/bench_patterns.py --tickers 500 --length 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockproj.settings')
+django.setup()
+
+from stock.patterns import compute_patterns, build_pattern_detail
+from stock.views import analyze_trend_pattern
+
+
+def make_dataset(n_tickers, length, seed=0):
+    """生成随机游走收盘价，保留两位小数以产生平盘"""
+    rng = np.random.default_rng(seed)
+    steps = rng.choice([-0.02, -0.01, 0.0, 0.01, 0.02], size=(n_tickers, length))
+    closes = 10 * np.cumprod(1 + steps, axis=1)
+    return np.round(closes, 2)
+
+
+def legacy(closes, days):
+    """原实现：逐窗口拼接字符串并构造详情"""
+    results = []
+    for row in closes:
+        close_list = [float(c) for c in row]
+        for i in range(len(close_list) - days):
+            window = close_list[i:i + days + 1]
+            pattern = analyze_trend_pattern(window)
+            detail = []
+            for j in range(days):
+                diff = window[j + 1] - window[j]
+                trend_type = "涨" if diff > 0 else ("平" if diff == 0 else "跌")
+                detail.append({
+                    'day': j + 1,
+                    'close': window[j],
+                    'next_close': window[j + 1],
+                    'diff': float(diff),
+                    'trend': trend_type,
+                    'code': pattern[j]
+                })
+            results.append((i + days, pattern, detail))
+    return results
+
+
+def vectorized(closes, days, with_detail=True):
+    """新实现：NumPy 计算形态，可选构造详情"""
+    results = []
+    for row in closes:
+        end_idx, patterns = compute_patterns(row, days)
+        if not with_detail:
+            results.extend(zip(end_idx.tolist(), patterns.tolist()))
+            continue
+        close_list = row.tolist()
+        for end, pattern in zip(end_idx.tolist(), patterns.tolist()):
+            results.append((end, pattern, build_pattern_detail(close_list[end - days:end + 1], pattern)))
+    return results
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='涨跌形态生成性能对比')
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--length', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=5)
+    args = parser.parse_args()
+
+    closes = make_dataset(args.tickers, args.length)
+    print(f"数据集: {args.tickers} 只股票 x {args.length} 天, {args.days} 天形态")
+
+    old, t_old = timed(legacy, closes, args.days)
+    new, t_new = timed(vectorized, closes, args.days)
+    codes_only, t_codes = timed(vectorized, closes, args.days, with_detail=False)
+
+    assert [r[1] for r in old] == [r[1] for r in new] == [r[1] for r in codes_only]
+    assert [r[2] for r in old] == [r[2] for r in new]
+
+    print(f"  逐窗口循环:          {t_old:8.3f}s")
+    print(f"  向量化(含详情):      {t_new:8.3f}s  ({t_old / t_new:5.1f}x)")
+    print(f"  向量化(仅形态编码):  {t_codes:8.3f}s  ({t_old / t_codes:5.1f}x)")
+    print(f"  窗口数: {len(new)}")
+
+
+if __name__ == '__main__':
+    main()
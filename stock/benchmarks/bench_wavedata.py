@@ -0,0 +1,87 @@
+"""
+波浪数据读取性能对比
+
+在临时目录生成合成的波浪数据 JSON 文件并转换为二进制格式，对比:
+  - JSON 完整解析
+  - JSON 查单个形态（需先完整解析）
+  - 二进制 mmap 打开 + 查单个形态
+  - 二进制只读形态数量
+  - 二进制完整构造字典
+
+用法:
+    python benchmarks/bench_wavedata.py --records 50000 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockproj.settings')
+django.setup()
+
+from stock.wavedata import WavedataFile, read_wavedata_file, write_wavedata_binary
+
+
+def make_wavedata(n_records, days=5, seed=0):
+    """生成 3^days 个形态、共 n_records 条 {ticker, change_price_delta} 记录"""
+    rng = random.Random(seed)
+    codes = ['']
+    for _ in range(days):
+        codes = [c + d for c in codes for d in '123']
+    data = {code: [] for code in codes}
+    for i in range(n_records):
+        data[rng.choice(codes)].append({
+            'ticker': f'{i % 1000000:06d}',
+            'change_price_delta': round(rng.uniform(-0.1, 0.1), 6)
+        })
+    return data
+
+
+def bench(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<28} {elapsed * 1000:9.3f} ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='波浪数据读取性能对比')
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--pattern', default='33333')
+    args = parser.parse_args()
+
+    data = make_wavedata(args.records)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'bench.json')
+        binary_path = os.path.join(tmp, 'bench.wvd')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        write_wavedata_binary(data, binary_path)
+
+        assert WavedataFile(binary_path).to_dict() == read_wavedata_file(json_path)
+
+        print(f"记录数: {args.records}, JSON {os.path.getsize(json_path) / 1e6:.2f} MB, "
+              f"二进制 {os.path.getsize(binary_path) / 1e6:.2f} MB")
+
+        t_json = bench('JSON 完整解析', lambda: read_wavedata_file(json_path), args.repeat)
+        bench('JSON 单形态', lambda: read_wavedata_file(json_path).get(args.pattern, []), args.repeat)
+        t_one = bench('二进制 单形态(含打开)', lambda: WavedataFile(binary_path).items(args.pattern), args.repeat)
+        t_counts = bench('二进制 形态数量(含打开)', lambda: WavedataFile(binary_path).counts(), args.repeat)
+        t_full = bench('二进制 完整字典(含打开)', lambda: WavedataFile(binary_path).to_dict(), args.repeat)
+
+        print(f"  单形态加速 {t_json / t_one:.1f}x, 形态数量加速 {t_json / t_counts:.1f}x, "
+              f"完整读取 {t_json / t_full:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,7 +15,8 @@ import requests
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockproj.settings')
 django.setup()
 
-from stock.models import StockHistory
+from stock import indicators
+from stock.series import date_strings, series_store, to_json_list
 
 
 def calculate_sma(data, period=20):
@@ -29,14 +30,7 @@ def calculate_sma(data, period=20):
     Returns:
         SMA 数据列表
     """
-    sma = []
-    for i in range(len(data)):
-        if i < period - 1:
-            sma.append(None)
-        else:
-            avg = sum(data[i - period + 1: i + 1]) / period
-            sma.append(avg)
-    return sma
+    return to_json_list(indicators.sma(data, period))
 
 
 def calculate_ema(data, period=20):
@@ -50,18 +44,7 @@ def calculate_ema(data, period=20):
     Returns:
         EMA 数据列表
     """
-    ema = []
-    multiplier = 2 / (period + 1)
-
-    # 第一天的EMA等于当天价格
-    ema.append(data[0])
-
-    # 计算后续的EMA
-    for i in range(1, len(data)):
-        ema_value = (data[i] - ema[i - 1]) * multiplier + ema[i - 1]
-        ema.append(ema_value)
-
-    return ema
+    return to_json_list(indicators.ema(data, period))
 
 
 def calculate_bollinger_bands(data, period=20, std_dev=2):
@@ -76,28 +59,12 @@ def calculate_bollinger_bands(data, period=20, std_dev=2):
     Returns:
         上轨、中轨、下轨数据
     """
-    import numpy as np
-
-    sma = calculate_sma(data, period)
-    upper_band = []
-    lower_band = []
-
-    for i in range(len(data)):
-        if sma[i] is None or i < period - 1:
-            upper_band.append(None)
-            lower_band.append(None)
-        else:
-            # 计算标准差
-            std = np.std(data[i - period + 1: i + 1])
-            upper_band.append(sma[i] + std * std_dev)
-            lower_band.append(sma[i] - std * std_dev)
-
-    return upper_band, sma, lower_band
+    return tuple(to_json_list(band) for band in indicators.bollinger_bands(data, period, std_dev))
 
 
 def calculate_rsi(data, period=14):
     """
-    计算相对强弱指标 (RSI)
+    计算相对强弱指标 (RSI)，使用 Wilder 平滑
 
     Args:
         data: 价格数据列表
@@ -106,35 +73,7 @@ def calculate_rsi(data, period=14):
     Returns:
         RSI 数据列表
     """
-    rsi = []
-
-    for i in range(len(data)):
-        if i < period:
-            rsi.append(None)
-        else:
-            gains = []
-            losses = []
-
-            for j in range(i - period + 1, i + 1):
-                change = data[j] - data[j - 1]
-                if change > 0:
-                    gains.append(change)
-                    losses.append(0)
-                else:
-                    gains.append(0)
-                    losses.append(abs(change))
-
-            avg_gain = sum(gains) / period
-            avg_loss = sum(losses) / period
-
-            if avg_loss == 0:
-                rsi.append(100)
-            else:
-                rs = avg_gain / avg_loss
-                rsi_value = 100 - (100 / (1 + rs))
-                rsi.append(rsi_value)
-
-    return rsi
+    return to_json_list(indicators.rsi(data, period))
 
 
 def generate_custom_chart_data(ticker, days=200):
@@ -148,76 +87,36 @@ def generate_custom_chart_data(ticker, days=200):
     Returns:
         用于前端图表的数据字典
     """
-    # 1. 从数据库获取股票数据
-    history = StockHistory.objects.filter(
-        ticker=ticker
-    ).order_by('trade_date')[:days]
+    # 1. 从序列缓存获取最近 days 天的股票数据（NumPy 数组）
+    dates, columns = series_store.get(ticker).window(limit=days)
 
-    if not history.exists():
+    if not len(dates):
         print(f"未找到股票 {ticker} 的数据")
         return None
 
-    data_list = list(history)
-
     # 2. 提取基础数据
-    dates = [h.trade_date.strftime('%Y-%m-%d') for h in data_list]
-    close_prices = [float(h.close_price) for h in data_list]
-    high_prices = [float(h.high_price) for h in data_list]
-    low_prices = [float(h.low_price) for h in data_list]
-    volumes = [float(h.volume) for h in data_list]
+    close_prices = columns['close']
 
     # 3. 计算自定义指标
     print(f"正在计算技术指标...")
 
     # SMA 指标
-    sma5 = calculate_sma(close_prices, 5)
-    sma10 = calculate_sma(close_prices, 10)
-    sma20 = calculate_sma(close_prices, 20)
-    sma50 = calculate_sma(close_prices, 50)
-
-    # EMA 指标
-    ema12 = calculate_ema(close_prices, 12)
-    ema26 = calculate_ema(close_prices, 26)
-
-    # 计算 MACD
-    macd_line = []
-    signal_line = []
-    macd_histogram = []
-
-    for i in range(len(close_prices)):
-        if ema12[i] and ema26[i]:
-            macd = ema12[i] - ema26[i]
-            macd_line.append(macd)
-        else:
-            macd_line.append(None)
-
-    # Signal线是MACD的9日EMA
-    macd_values = [v for v in macd_line if v is not None]
-    signal_values = calculate_ema(macd_values, 9)
+    sma5 = indicators.sma(close_prices, 5)
+    sma10 = indicators.sma(close_prices, 10)
+    sma20 = indicators.sma(close_prices, 20)
+    sma50 = indicators.sma(close_prices, 50)
 
-    signal_idx = 0
-    for i in range(len(close_prices)):
-        if macd_line[i] is not None:
-            signal_line.append(signal_values[signal_idx])
-            signal_idx += 1
-        else:
-            signal_line.append(None)
-
-    # MACD柱状图
-    for i in range(len(close_prices)):
-        if macd_line[i] and signal_line[i]:
-            macd_histogram.append(macd_line[i] - signal_line[i])
-        else:
-            macd_histogram.append(None)
+    # MACD 指标（EMA12 - EMA26，Signal 为 MACD 的 9 日 EMA）
+    macd_line, signal_line, macd_histogram = indicators.macd(close_prices)
 
     # 4. 构建返回数据
     chart_data = {
-        'dates': dates,
+        'dates': date_strings(dates),
         'series': [
             # 基础价格数据
             {
                 'name': '收盘价',
-                'data': close_prices,
+                'data': to_json_list(close_prices),
                 'type': 'line',
                 'color': '#667eea',
                 'smooth': True,
@@ -226,7 +125,7 @@ def generate_custom_chart_data(ticker, days=200):
             # SMA 均线
             {
                 'name': 'SMA5',
-                'data': sma5,
+                'data': to_json_list(sma5),
                 'type': 'line',
                 'color': '#f59e0b',
                 'smooth': True,
@@ -234,7 +133,7 @@ def generate_custom_chart_data(ticker, days=200):
             },
             {
                 'name': 'SMA10',
-                'data': sma10,
+                'data': to_json_list(sma10),
                 'type': 'line',
                 'color': '#06b6d4',
                 'smooth': True,
@@ -242,7 +141,7 @@ def generate_custom_chart_data(ticker, days=200):
             },
             {
                 'name': 'SMA20',
-                'data': sma20,
+                'data': to_json_list(sma20),
                 'type': 'line',
                 'color': '#ff6b6b',
                 'smooth': True,
@@ -250,7 +149,7 @@ def generate_custom_chart_data(ticker, days=200):
             },
             {
                 'name': 'SMA50',
-                'data': sma50,
+                'data': to_json_list(sma50),
                 'type': 'line',
                 'color': '#8b5cf6',
                 'smooth': True,
@@ -259,7 +158,7 @@ def generate_custom_chart_data(ticker, days=200):
             # MACD 指标
             {
                 'name': 'MACD',
-                'data': macd_line,
+                'data': to_json_list(macd_line),
                 'type': 'line',
                 'color': '#ef232a',
                 'smooth': True,
@@ -267,7 +166,7 @@ def generate_custom_chart_data(ticker, days=200):
             },
             {
                 'name': 'Signal',
-                'data': signal_line,
+                'data': to_json_list(signal_line),
                 'type': 'line',
                 'color': '#14b143',
                 'smooth': True,
@@ -275,7 +174,7 @@ def generate_custom_chart_data(ticker, days=200):
             },
             {
                 'name': 'MACD柱状图',
-                'data': macd_histogram,
+                'data': to_json_list(macd_histogram),
                 'type': 'bar',
                 'color': '#909399',
                 'showSymbol': False
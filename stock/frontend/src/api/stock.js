@@ -29,5 +29,10 @@ export const stockAPI = {
   // 股票详情（用于曲线选股）
   getDetail(ticker, params) {
     return api.get(`/stocks/${ticker}/detail`, { params })
+  },
+
+  // 批量获取多只股票的收盘价（迷你图表）
+  getDetails(tickers, params) {
+    return api.get('/stocks/details', { params: { ...params, tickers: tickers.join(',') } })
   }
 }
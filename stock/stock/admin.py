@@ -12,7 +12,7 @@ class StockHistoryAdmin(admin.ModelAdmin):
 
 @admin.register(StockTrendPattern)
 class StockTrendPatternAdmin(admin.ModelAdmin):
-    list_display = ['ticker', 'pattern_type', 'days', 'pattern_date', 'created_at']
+    list_display = ['ticker', 'pattern_type', 'pattern_code', 'days', 'pattern_date', 'created_at']
     list_filter = ['days', 'pattern_type', 'pattern_date']
     search_fields = ['ticker', 'pattern_type']
     date_hierarchy = 'pattern_date'
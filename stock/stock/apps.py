@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class StockConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stock'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from .executor import autostart
+        from .models import StockHistory
+        from .series import invalidate_series
+        from .universe import refresh_ticker_registry
+
+        post_save.connect(invalidate_series, sender=StockHistory, dispatch_uid='stock_series_save')
+        post_delete.connect(invalidate_series, sender=StockHistory, dispatch_uid='stock_series_delete')
+        post_save.connect(refresh_ticker_registry, sender=StockHistory, dispatch_uid='stock_ticker_save')
+        post_delete.connect(refresh_ticker_registry, sender=StockHistory, dispatch_uid='stock_ticker_delete')
+
+        # Web 服务进程启动时预先启动代码执行进程池
+        autostart()
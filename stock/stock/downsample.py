@@ -0,0 +1,91 @@
+"""
+价格序列降采样
+
+折线使用 Largest-Triangle-Three-Buckets (LTTB) 选点，保留曲线形状；
+K 线按桶聚合为 OHLCV（首开、末收、最高、最低、成交量求和），保留极值。
+"""
+import numpy as np
+
+
+def lttb_indices(y, n_out, x=None):
+    """
+    LTTB 降采样，返回选中点的下标（升序，包含首尾）
+
+    Args:
+        y: 数值序列
+        n_out: 目标点数，小于 3 或不小于原始点数时返回全部下标
+        x: 横坐标，默认为下标
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # 首尾点之外的 n - 2 个点分为 n_out - 2 个桶，每个桶至少一个点
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+
+    # 每个桶的下一个桶平均点，最后一个桶以末点为参照
+    next_lo = np.append(edges[1:-1], n - 1)
+    next_hi = np.append(edges[2:], n)
+    sums_x = np.concatenate(([0.0], np.cumsum(x)))
+    sums_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = next_hi - next_lo
+    avg_x = (sums_x[next_hi] - sums_x[next_lo]) / counts
+    avg_y = (sums_y[next_hi] - sums_y[next_lo]) / counts
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        areas = np.abs(
+            (x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def bucket_starts(n, n_out):
+    """把 n 个点均分为至多 n_out 个桶，返回每个桶的起始下标"""
+    if n_out >= n:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n, n_out + 1).astype(np.intp)[:-1])
+
+
+def downsample_ohlc(opens, highs, lows, closes, volumes, n_out):
+    """
+    把 K 线按桶聚合为至多 n_out 根
+
+    Returns:
+        (ends, columns)：ends 为每个桶最后一天的下标（用于取日期和均线），
+        columns 为 {'open', 'high', 'low', 'close', 'volume'} 数组
+    """
+    return aggregate_ohlc(opens, highs, lows, closes, volumes, bucket_starts(len(closes), n_out))
+
+
+def aggregate_ohlc(opens, highs, lows, closes, volumes, starts):
+    """
+    按分组起始下标把 K 线聚合为 OHLCV：首开、末收、最高、最低、成交量求和
+
+    Args:
+        starts: 升序的分组起始下标，第一个为 0
+
+    Returns:
+        (ends, columns)：ends 为每组最后一天的下标，columns 同 downsample_ohlc
+    """
+    n = len(closes)
+    if n == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return np.empty(0, dtype=np.intp), {k: empty for k in ('open', 'high', 'low', 'close', 'volume')}
+
+    ends = np.append(starts[1:], n) - 1
+    columns = {
+        'open': np.asarray(opens, dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(np.asarray(highs, dtype=np.float64), starts),
+        'low': np.minimum.reduceat(np.asarray(lows, dtype=np.float64), starts),
+        'close': np.asarray(closes, dtype=np.float64)[ends],
+        'volume': np.add.reduceat(np.asarray(volumes, dtype=np.float64), starts),
+    }
+    return ends, columns
@@ -0,0 +1,800 @@
+"""
+自定义策略代码执行进程池
+
+用户代码不再在 Django 请求线程中 exec，而是交给预先启动的工作进程执行：
+  - 工作进程启动时完成 django.setup() 并预先导入 NumPy 和序列读取模块
+  - 每个任务用 resource.setrlimit 限制 CPU 时间，进程地址空间限制内存
+  - 父进程按墙钟时间等待结果，超时直接杀掉工作进程并补充新进程
+  - 同时排队的任务数量有上限，超出时立即返回繁忙
+进程池在 Web 服务进程启动时（AppConfig.ready）预先启动。结果由工作进程编码为 JSON 后
+通过管道返回，Web 进程只在末尾追加 meta 字段，不再解码后重新编码。
+
+用户代码的命名空间中除 ticker 和 StockHistory 外，还提供从序列缓存读取的
+frame（NumPy 列数组）、np 和 indicators 向量化指标函数；import 只能导入
+EXECUTOR_ALLOWED_IMPORTS 中的模块。
+
+编译结果按源码哈希缓存在各工作进程中；成功的执行结果按
+(源码哈希, 股票代码, 数据版本) 缓存在 Web 进程中，数据版本为 stock_history 中该股票的
+(最后交易日, 行数)，有新交易日或补录数据时自然失效，ORM 保存/删除时也会清除对应股票的结果。
+run_batch 把同一段代码分发到全部工作进程，对多只股票执行。
+"""
+import atexit
+import hashlib
+import importlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# 是否使用进程池执行，关闭时在当前进程内直接执行（仅用于开发调试）
+EXECUTOR_ENABLED = True
+
+# Web 服务进程启动时是否预先启动进程池，关闭时在首次提交任务时启动
+EXECUTOR_AUTOSTART = True
+
+# 预先启动进程池的服务程序（sys.argv[0] 的文件名），另外包括 manage.py runserver
+EXECUTOR_AUTOSTART_SERVERS = ('gunicorn', 'uwsgi', 'daphne', 'uvicorn', 'hypercorn')
+
+# 工作进程数量
+EXECUTOR_WORKERS = min(4, os.cpu_count() or 1)
+
+# 除正在执行的任务外，最多排队等待的任务数量
+EXECUTOR_MAX_PENDING = 16
+
+# 单个任务的墙钟超时（秒）
+EXECUTOR_TIMEOUT = 15
+
+# 单个任务的 CPU 时间上限（秒）
+EXECUTOR_CPU_SECONDS = 10
+
+# 工作进程的地址空间上限（字节）
+EXECUTOR_MEMORY_BYTES = 2 * 1024 * 1024 * 1024
+
+# 工作进程启动（django.setup 和预导入）的超时（秒）
+EXECUTOR_STARTUP_TIMEOUT = 60
+
+# 每个工作进程执行多少个任务后重启，回收用户代码残留的内存
+EXECUTOR_MAX_JOBS = 200
+
+# 工作进程启动时预先导入的模块
+EXECUTOR_WARM_MODULES = ('numpy', 'stock.models', 'stock.series', 'stock.indicators')
+
+# 用户代码中允许 import 的模块（包括其子模块）
+EXECUTOR_ALLOWED_IMPORTS = ('numpy', 'math')
+
+# 每个进程缓存的编译结果数量
+COMPILE_CACHE_SIZE = 128
+
+# 执行结果缓存的数量和内存上限（字节，按 JSON 编码后的长度计算）
+RESULT_CACHE_SIZE = 512
+RESULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# 批量执行一次最多的股票数量
+EXECUTOR_BATCH_MAX_TICKERS = 10000
+
+
+class ExecutionError(Exception):
+    """任务未能正常执行"""
+
+
+class ExecutorBusy(ExecutionError):
+    """排队任务已满"""
+
+
+class ExecutionTimeout(ExecutionError):
+    """任务超过墙钟超时"""
+
+
+class WorkerCrashed(ExecutionError):
+    """工作进程异常退出（通常是超出 CPU 时间或内存限制）"""
+
+
+def code_hash(code):
+    """用户代码的缓存键"""
+    return hashlib.sha1(code.encode('utf-8')).hexdigest()
+
+
+class CompileCache:
+    """按源码哈希缓存 compile() 结果的 LRU"""
+
+    def __init__(self, size=COMPILE_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, code, key=None):
+        """
+        返回 (code object, 是否命中缓存)
+
+        Raises:
+            SyntaxError: 代码无法编译
+        """
+        key = key or code_hash(code)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled, True
+            self.misses += 1
+        compiled = compile(code, '<string>', 'exec')
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return compiled, False
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class ResultCache:
+    """
+    执行结果的 LRU，值为 (meta, JSON 字节串)
+
+    键为 (源码哈希, 股票代码, 数据版本)，按数量和 JSON 总字节数淘汰。
+    """
+
+    def __init__(self, size=RESULT_CACHE_SIZE, max_bytes=RESULT_CACHE_BYTES):
+        self.size = size
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """返回 (meta, body)，未命中时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, meta, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= len(old[1])
+            self._entries[key] = (meta, body)
+            self._nbytes += len(body)
+            while len(self._entries) > self.size or self._nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= len(evicted)
+
+    def invalidate(self, tickers):
+        """清除指定股票的全部结果"""
+        tickers = set(tickers)
+        with self._lock:
+            for key in [key for key in self._entries if key[1] in tickers]:
+                self._nbytes -= len(self._entries.pop(key)[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'nbytes': self._nbytes, 'hits': self.hits, 'misses': self.misses}
+
+
+compile_cache = CompileCache()
+result_cache = ResultCache()
+
+
+class PriceFrame:
+    """
+    用户代码中的 frame 变量：一只股票的完整日线（只读 float64 数组）
+
+    属性 dates（datetime64[D]）、open、high、low、close、volume、ma1、ma2、ma3，
+    date_strings() 返回可直接放入 chart_data 的日期字符串列表。
+    """
+
+    def __init__(self, series, dates=None, columns=None):
+        self.series = series
+        self.ticker = series.ticker
+        self.dates = series.dates if dates is None else dates
+        self.columns = series.columns if columns is None else columns
+        for name, values in self.columns.items():
+            setattr(self, name, values)
+
+    @classmethod
+    def load(cls, ticker):
+        from .series import series_store
+        return cls(series_store.get(ticker))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __repr__(self):
+        return f"<PriceFrame {self.ticker}: {len(self)} 天>"
+
+    def window(self, start=None, end=None, limit=None):
+        """按日期范围截取（参数同 PriceSeries.window），返回新的 PriceFrame"""
+        dates, columns = self.series.window(start=start, end=end, limit=limit)
+        return PriceFrame(self.series, dates, columns)
+
+    def tail(self, days):
+        """最近 days 天"""
+        return self.window(limit=days)
+
+    def date_strings(self):
+        from .series import date_strings
+        return date_strings(self.dates)
+
+
+def restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """用户代码的 __import__：只允许绝对导入 EXECUTOR_ALLOWED_IMPORTS 中的模块"""
+    if level != 0 or name.partition('.')[0] not in EXECUTOR_ALLOWED_IMPORTS:
+        raise ImportError(f"不允许导入模块 {name}，只能导入 {', '.join(EXECUTOR_ALLOWED_IMPORTS)}")
+    return __import__(name, globals, locals, fromlist, level)
+
+
+def build_namespace(ticker, stdout_capture):
+    """构建用户代码的执行命名空间"""
+    from . import indicators
+    from .models import StockHistory
+
+    namespace = {
+        '__name__': '__main__',
+        '__builtins__': {
+            '__import__': restricted_import,
+            'print': lambda *args: stdout_capture.write(' '.join(str(a) for a in args) + '\n'),
+            'len': len,
+            'sum': sum,
+            'max': max,
+            'min': min,
+            'abs': abs,
+            'round': round,
+            'float': float,
+            'int': int,
+            'list': list,
+            'range': range,
+            'enumerate': enumerate,
+            'sorted': sorted,
+            'zip': zip,
+            'None': None,
+            'True': True,
+            'False': False,
+            'str': str,
+            'bool': bool,
+        }
+    }
+
+    # 将股票代码和模型导入命名空间
+    namespace['ticker'] = ticker
+    namespace['StockHistory'] = StockHistory
+
+    # 预加载的价格数组和向量化指标，替代逐行查询 ORM
+    namespace['frame'] = PriceFrame.load(ticker)
+    namespace['np'] = np
+    namespace['indicators'] = indicators
+    return namespace
+
+
+def get_data_versions(tickers):
+    """
+    查询股票在 stock_history 中的数据版本 (最后交易日, 行数)
+
+    一次 GROUP BY，只走 (ticker, trade_date) 索引，不读取 K 线数据；
+    没有数据的股票为 (None, 0)。
+    """
+    from django.db.models import Count, Max
+    from .models import StockHistory
+
+    rows = StockHistory.objects.filter(ticker__in=tickers).order_by().values('ticker').annotate(
+        last=Max('trade_date'), rows=Count('trade_date')
+    ).values_list('ticker', 'last', 'rows')
+    versions = dict.fromkeys(tickers, (None, 0))
+    versions.update((ticker, (last, count)) for ticker, last, count in rows)
+    return versions
+
+
+def _version_meta(version):
+    """数据版本 -> meta 中的 (last_trade_date, row_count)"""
+    last_date, rows = version
+    return last_date.isoformat() if last_date else None, rows
+
+
+def execute_code(code, ticker, key=None, version=None):
+    """
+    执行用户代码并校验 chart_data
+
+    Args:
+        version: Web 进程查询到的数据版本，序列缓存与之不一致时先重新加载
+
+    Returns:
+        与 run_custom_code 接口相同结构的结果字典，meta 中记录编译缓存是否命中
+        和本次使用数据的最后交易日、行数
+    """
+    from .series import series_store
+
+    if version is not None:
+        series = series_store.get(ticker)
+        if (series.last_date, len(series)) != tuple(version):
+            series_store.invalidate([ticker])
+
+    stdout_capture = io.StringIO()
+    namespace = build_namespace(ticker, stdout_capture)
+    series = namespace['frame'].series
+    last_date_str, rows = _version_meta((series.last_date, len(series)))
+    meta = {
+        'compile_cache': 'miss',
+        'last_trade_date': last_date_str,
+        'row_count': rows
+    }
+    result = _execute(code, key, namespace, stdout_capture, meta)
+    meta['compile_cache_stats'] = compile_cache.stats()
+    result['meta'] = meta
+    return result
+
+
+def _execute(code, key, namespace, stdout_capture, meta):
+    """在已构建的命名空间中执行代码并校验 chart_data"""
+    try:
+        compiled, hit = compile_cache.get(code, key)
+        if hit:
+            meta['compile_cache'] = 'hit'
+        # 执行用户代码
+        with redirect_stdout(stdout_capture):
+            exec(compiled, namespace)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc(),
+            'output': stdout_capture.getvalue()
+        }
+
+    # 获取输出
+    output = stdout_capture.getvalue()
+
+    # 尝试从命名空间获取结果
+    chart_data = namespace.get('chart_data')
+
+    if chart_data is None:
+        return {
+            'success': False,
+            'error': '代码执行后未定义 chart_data 变量。请在代码末尾定义 chart_data 字典，格式为 {"dates": [...], "series": [...]}',
+            'output': output
+        }
+
+    # 验证数据格式
+    if 'dates' not in chart_data:
+        return {
+            'success': False,
+            'error': 'chart_data 缺少 dates 字段',
+            'output': output
+        }
+
+    if 'series' not in chart_data:
+        return {
+            'success': False,
+            'error': 'chart_data 缺少 series 字段',
+            'output': output
+        }
+
+    return {
+        'success': True,
+        'data': chart_data,
+        'output': output
+    }
+
+
+def _json_default(value):
+    """把 NumPy 数组/标量和日期转换为 JSON 可表示的值"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _nan_to_none(value):
+    """NaN/Inf 不是合法 JSON，转换为 null"""
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, dict):
+        return {k: _nan_to_none(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_nan_to_none(v) for v in value]
+    return value
+
+
+def encode_result(result):
+    """结果字典 -> JSON 字节串，用户数据中的 NumPy 类型和 NaN 在这里转换"""
+    plain = json.loads(json.dumps(result, default=_json_default))
+    return json.dumps(_nan_to_none(plain), allow_nan=False).encode()
+
+
+def encode_execution(result):
+    """
+    execute_code 的结果 -> (success, meta, body)
+
+    body 为不含 meta 的结果 JSON；meta 单独返回，Web 进程据此决定是否缓存，
+    补充缓存信息后用 attach_meta 追加到 body 末尾。
+    """
+    meta = result.pop('meta', {})
+    return result['success'], meta, encode_result(result)
+
+
+def attach_meta(body, meta):
+    """在已编码的结果对象末尾追加 meta 字段，不解码 body"""
+    return body[:-1] + b',"meta":' + json.dumps(meta).encode() + b'}'
+
+
+def _set_cpu_limit(seconds):
+    """把 CPU 时间软上限设为已用时间 + seconds，超出时内核发送 SIGXCPU 结束进程"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime) + seconds + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def get_database_names():
+    """当前进程各数据库连接实际使用的库名（测试时为测试库），传给工作进程"""
+    from django.db import connections
+    return {alias: connections[alias].settings_dict['NAME'] for alias in connections}
+
+
+def worker_main(conn, cpu_seconds, memory_bytes, warm_modules, database_names=None):
+    """
+    工作进程入口：初始化后循环接收任务，直到收到 None 或管道关闭
+
+    Args:
+        database_names: {别名: 库名}，与启动进程池的进程使用同一个库
+    """
+    import django
+    django.setup()
+    from django.db import close_old_connections, connections
+
+    for alias, name in (database_names or {}).items():
+        connections[alias].settings_dict['NAME'] = name
+
+    for module in warm_modules:
+        importlib.import_module(module)
+
+    if resource is not None and memory_bytes:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, hard))
+
+    conn.send(('ready', os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        if resource is not None and cpu_seconds:
+            _set_cpu_limit(cpu_seconds)
+        try:
+            message = encode_execution(
+                execute_code(job['code'], job['ticker'], job.get('key'), job.get('version'))
+            )
+        except Exception as e:
+            message = encode_execution({'success': False, 'error': f'结果无法编码为 JSON: {e}'})
+        finally:
+            close_old_connections()
+        conn.send(message)
+
+
+class CodeWorker:
+    """一个工作进程及与其通信的管道"""
+
+    def __init__(self, context, cpu_seconds, memory_bytes, warm_modules, database_names=None):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main, args=(child_conn, cpu_seconds, memory_bytes, warm_modules, database_names),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.jobs = 0
+
+    def wait_ready(self, timeout):
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise ExecutionTimeout('工作进程启动超时')
+        self.conn.recv()
+        self.ready = True
+
+    def run(self, job, timeout):
+        """
+        发送任务并等待结果
+
+        Raises:
+            ExecutionTimeout: 超过 timeout 秒未返回
+            EOFError/OSError: 工作进程已退出
+        """
+        self.conn.send(job)
+        if not self.conn.poll(timeout):
+            raise ExecutionTimeout(f'代码执行超时（超过 {timeout} 秒）')
+        self.jobs += 1
+        return self.conn.recv()
+
+    def stop(self):
+        """通知进程退出，未及时退出则强制结束"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class CodeExecutor:
+    """
+    预启动的代码执行进程池
+
+    使用 spawn 方式启动工作进程，避免从多线程的 Web 进程 fork；
+    Web 服务进程启动时由 autostart 启动全部进程（其他进程在首次提交任务时启动），
+    崩溃或超时的进程在原位置补充新进程。
+    """
+
+    def __init__(self, workers=EXECUTOR_WORKERS, max_pending=EXECUTOR_MAX_PENDING, timeout=EXECUTOR_TIMEOUT,
+                 cpu_seconds=EXECUTOR_CPU_SECONDS, memory_bytes=EXECUTOR_MEMORY_BYTES,
+                 warm_modules=EXECUTOR_WARM_MODULES, max_jobs=EXECUTOR_MAX_JOBS):
+        self.workers = workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.warm_modules = warm_modules
+        self.max_jobs = max_jobs
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._pid = None
+        self.completed = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.rejected = 0
+
+    def _spawn(self):
+        return CodeWorker(self._context, self.cpu_seconds, self.memory_bytes, self.warm_modules,
+                          get_database_names())
+
+    def start(self):
+        with self._lock:
+            if self._started and self._pid == os.getpid():
+                return
+            if self._started:
+                # 已启动进程池的进程被 fork（如 gunicorn --preload），继承的管道属于父进程
+                self._idle = queue.LifoQueue()
+            else:
+                atexit.register(self.shutdown)
+            for _ in range(self.workers):
+                self._idle.put(self._spawn())
+            self._started = True
+            self._pid = os.getpid()
+
+    def submit(self, code, ticker, timeout=None, key=None, block=False, version=None):
+        """
+        在工作进程中执行用户代码
+
+        Args:
+            block: 排队已满时等待空位而不是立即返回繁忙（批量执行使用）
+
+        Returns:
+            (success, meta, body)，见 encode_execution
+
+        Raises:
+            ExecutorBusy, ExecutionTimeout, WorkerCrashed
+        """
+        if not self._slots.acquire(blocking=block):
+            self.rejected += 1
+            raise ExecutorBusy('执行队列已满，请稍后重试')
+        try:
+            self.start()
+            worker = self._idle.get()
+            try:
+                worker.wait_ready(EXECUTOR_STARTUP_TIMEOUT)
+                job = {'code': code, 'ticker': ticker, 'key': key, 'version': version}
+                result = worker.run(job, timeout or self.timeout)
+            except ExecutionTimeout:
+                self.timeouts += 1
+                worker.kill()
+                worker = self._spawn()
+                raise
+            except (EOFError, OSError):
+                self.crashes += 1
+                worker.kill()
+                worker = self._spawn()
+                raise WorkerCrashed('代码执行进程异常退出，可能超出了 CPU 时间或内存限制')
+            except BaseException:
+                # 任务已发出但结果未读取，管道中可能残留本次结果，不能再交给下一个任务
+                worker.kill()
+                worker = self._spawn()
+                raise
+            finally:
+                if worker.jobs >= self.max_jobs:
+                    worker.stop()
+                    worker = self._spawn()
+                self._idle.put(worker)
+            self.completed += 1
+            return result
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        """结束全部空闲工作进程"""
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().stop()
+                except queue.Empty:
+                    break
+            self._started = False
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'idle': self._idle.qsize(),
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'crashes': self.crashes,
+            'rejected': self.rejected
+        }
+
+
+code_executor = CodeExecutor()
+
+
+def autostart():
+    """
+    在 AppConfig.ready 中调用：Web 服务进程启动时预先启动进程池，首个请求不再等待进程启动
+
+    只在 EXECUTOR_AUTOSTART_SERVERS 启动的进程和 runserver 实际提供服务的子进程中启动；
+    工作进程自身（同样执行 django.setup）、自动重载的监控进程、其他管理命令和脚本
+    在首次提交任务时才启动。
+    """
+    if not (EXECUTOR_ENABLED and EXECUTOR_AUTOSTART) or multiprocessing.parent_process() is not None:
+        return False
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program in ('manage.py', 'django-admin'):
+        if sys.argv[1:2] != ['runserver']:
+            return False
+        if os.environ.get('RUN_MAIN') != 'true' and '--noreload' not in sys.argv:
+            return False
+    elif program not in EXECUTOR_AUTOSTART_SERVERS:
+        return False
+    code_executor.start()
+    return True
+
+
+def _run_cached(code, key, ticker, version, timeout=None, block=False):
+    """按 (key, ticker, version) 查结果缓存，未命中时执行，返回 (meta, body)"""
+    cache_key = (key, ticker, version)
+    entry = result_cache.get(cache_key)
+    hit = entry is not None
+    if hit:
+        meta, body = entry
+        # 命中时没有编译，缓存结果中的编译信息属于首次执行
+        meta = {k: v for k, v in meta.items() if k not in ('compile_cache', 'compile_cache_stats')}
+    else:
+        if EXECUTOR_ENABLED:
+            success, meta, body = code_executor.submit(
+                code, ticker, timeout=timeout, key=key, block=block, version=version
+            )
+        else:
+            success, meta, body = encode_execution(execute_code(code, ticker, key, version))
+        if success and (meta.get('last_trade_date'), meta.get('row_count')) == _version_meta(version):
+            # 查询版本和加载序列之间数据可能又有变化，版本一致时才缓存
+            result_cache.put(cache_key, meta, body)
+        meta = dict(meta)
+
+    meta['result_cache'] = 'hit' if hit else 'miss'
+    meta['result_cache_stats'] = result_cache.stats()
+    return meta, body
+
+
+def run_code(code, ticker, timeout=None):
+    """
+    执行用户代码，返回结果 JSON 字节串
+
+    数据版本用一次索引查询得到，不加载序列；相同代码、股票和数据版本的成功结果
+    直接从 result_cache 返回；
+    meta 中记录编译缓存和结果缓存的命中情况。
+    EXECUTOR_ENABLED 为 False 时在当前进程内执行（无超时和资源限制）。
+
+    Raises:
+        ExecutionError: 排队已满、超时或工作进程崩溃
+    """
+    version = get_data_versions([ticker])[ticker]
+    meta, body = _run_cached(code, code_hash(code), ticker, version, timeout=timeout)
+    return attach_meta(body, meta)
+
+
+def run_batch(code, tickers, timeout=None, include_data=True):
+    """
+    对多只股票执行同一段代码，按完成顺序逐个产出结果，最后产出汇总
+
+    任务由与工作进程数量相同的线程提交到进程池（排队满时等待），单只股票超时或
+    崩溃只影响该股票。数据版本与 run_code 相同，对 stock_history 一次 GROUP BY 查询得到。
+    生成器被关闭（客户端断开）时取消尚未开始的任务。
+
+    Yields:
+        {'type': 'result', 'ticker', 'success', 'error', 'data', 'output', 'meta', 'elapsed'}，
+        最后一个为 {'type': 'summary', 'total', 'succeeded', 'failed', 'timeouts', 'cached', 'elapsed'}
+    """
+    key = code_hash(code)
+    versions = get_data_versions(tickers)
+    summary = {'type': 'summary', 'total': len(tickers), 'succeeded': 0, 'failed': 0, 'timeouts': 0, 'cached': 0}
+    started = time.monotonic()
+
+    def run_one(ticker):
+        begin = time.monotonic()
+        try:
+            meta, body = _run_cached(code, key, ticker, versions[ticker], timeout=timeout, block=True)
+            result = json.loads(body)
+            result['meta'] = meta
+        except ExecutionTimeout as e:
+            result = {'success': False, 'error': str(e), 'timeout': True}
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        result['elapsed'] = round(time.monotonic() - begin, 4)
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=code_executor.workers if EXECUTOR_ENABLED else 1)
+    try:
+        futures = {pool.submit(run_one, ticker): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            result = future.result()
+            if result['success']:
+                summary['succeeded'] += 1
+            else:
+                summary['failed'] += 1
+            if result.pop('timeout', False):
+                summary['timeouts'] += 1
+            if result.get('meta', {}).get('result_cache') == 'hit':
+                summary['cached'] += 1
+            if not include_data:
+                result.pop('data', None)
+            yield {'type': 'result', 'ticker': futures[future], **result}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    summary['elapsed'] = round(time.monotonic() - started, 3)
+    yield summary
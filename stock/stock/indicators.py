@@ -0,0 +1,195 @@
+"""
+向量化技术指标
+
+输入为 float64 数组，可以是一只股票的一维序列，也可以是（股票 x 交易日）的二维矩阵，
+沿最后一个轴（时间）计算，返回与输入形状相同的数组；窗口未满或无法计算的位置为 NaN
+（转换为 JSON 时为 null）。输入中间不应含 NaN，否则累积和与递推会把 NaN 传播到之后的所有值。
+
+窗口类指标用累积和或步长窗口视图一次算完，不再对每个点重新切片求和；
+EMA、Wilder 平滑等递推指标只在时间轴上循环一次，二维输入时每一步同时处理全部股票。
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _as_array(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def _pad_front(values, length):
+    """在时间轴前面补 NaN，使结果长度为 length"""
+    pad = np.full(values.shape[:-1] + (length - values.shape[-1],), np.nan)
+    return np.concatenate((pad, values), axis=-1)
+
+
+def _rolling(values, period, reducer):
+    """按步长窗口视图计算滚动统计量，窗口未满的位置为 NaN"""
+    values = _as_array(values)
+    n = values.shape[-1]
+    if period > n:
+        return np.full(values.shape, np.nan)
+    return _pad_front(reducer(sliding_window_view(values, period, axis=-1), axis=-1), n)
+
+
+def _smooth(values, alpha, start=0, initial=None):
+    """
+    指数平滑递推 y[i] = y[i-1] + alpha * (x[i] - y[i-1])
+
+    y[start] 为 initial（默认 x[start]），start 之前为 NaN。
+    一维输入用 Python 浮点数循环（比逐元素 NumPy 运算快），二维输入每步处理一列。
+    """
+    values = _as_array(values)
+    result = np.full(values.shape, np.nan)
+    n = values.shape[-1]
+    if start >= n:
+        return result
+    first = values[..., start] if initial is None else initial
+
+    if values.ndim == 1:
+        y = float(first)
+        out = [y]
+        for x in values[start + 1:].tolist():
+            y += alpha * (x - y)
+            out.append(y)
+        result[start:] = out
+        return result
+
+    result[..., start] = first
+    for i in range(start + 1, n):
+        result[..., i] = result[..., i - 1] + alpha * (values[..., i] - result[..., i - 1])
+    return result
+
+
+def sma(values, period=20):
+    """简单移动平均，用累积和计算，每个点 O(1)"""
+    values = _as_array(values)
+    n = values.shape[-1]
+    if period > n:
+        return np.full(values.shape, np.nan)
+    csum = np.cumsum(values, axis=-1)
+    sums = csum[..., period - 1:].copy()
+    sums[..., 1:] -= csum[..., :-period]
+    return _pad_front(sums / period, n)
+
+
+def ema(values, period=20):
+    """指数移动平均，第一天等于当天价格"""
+    return _smooth(values, 2 / (period + 1))
+
+
+def rolling_std(values, period=20):
+    """滚动总体标准差（与 np.std 相同），按步长窗口视图一次计算"""
+    return _rolling(values, period, np.std)
+
+
+def rolling_max(values, period=20):
+    """滚动最高值"""
+    return _rolling(values, period, np.max)
+
+
+def rolling_min(values, period=20):
+    """滚动最低值"""
+    return _rolling(values, period, np.min)
+
+
+def pct_change(values, periods=1):
+    """相对 periods 天前的涨跌幅（百分比）"""
+    values = _as_array(values)
+    n = values.shape[-1]
+    result = np.full(values.shape, np.nan)
+    if periods < n:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[..., periods:] = (values[..., periods:] / values[..., :-periods] - 1) * 100
+    return result
+
+
+def cross_over(a, b):
+    """a 上穿 b 的位置（前一天 a <= b，当天 a > b）"""
+    a, b = np.broadcast_arrays(_as_array(a), _as_array(b))
+    result = np.zeros(a.shape, dtype=bool)
+    result[..., 1:] = (a[..., :-1] <= b[..., :-1]) & (a[..., 1:] > b[..., 1:])
+    return result
+
+
+def cross_under(a, b):
+    """a 下穿 b 的位置"""
+    return cross_over(b, a)
+
+
+def bollinger_bands(values, period=20, std_dev=2):
+    """布林带，返回 (上轨, 中轨, 下轨)"""
+    middle = sma(values, period)
+    width = rolling_std(values, period) * std_dev
+    return middle + width, middle, middle - width
+
+
+def macd(values, fast=12, slow=26, signal=9):
+    """
+    MACD，返回 (MACD 线, 信号线, 柱状图)
+
+    MACD 线为快慢 EMA 之差，信号线为 MACD 线的 signal 日 EMA，柱状图为两者之差。
+    """
+    line = ema(values, fast) - ema(values, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def _wilder(values, period, start):
+    """Wilder 平滑：首个值为 values[start - period + 1:start + 1] 的均值，之后按 1/period 递推"""
+    values = _as_array(values)
+    if start >= values.shape[-1]:
+        return np.full(values.shape, np.nan)
+    initial = values[..., start - period + 1:start + 1].mean(axis=-1)
+    return _smooth(values, 1 / period, start=start, initial=initial)
+
+
+def rsi(values, period=14):
+    """
+    Wilder 相对强弱指标 (RSI)
+
+    涨跌幅分别用 Wilder 平滑（首个值为前 period 天的简单平均），
+    第 period 天起有值；区间内没有下跌时为 100。
+    """
+    values = _as_array(values)
+    changes = np.diff(values, axis=-1, prepend=values[..., :1])
+    gains = _wilder(np.maximum(changes, 0), period, period)
+    losses = _wilder(np.maximum(-changes, 0), period, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = 100 - 100 / (1 + gains / losses)
+    return np.where((losses == 0) & ~np.isnan(gains), 100.0, result)
+
+
+def true_range(high, low, close):
+    """真实波幅，第一天为当天最高价与最低价之差"""
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    prev_close = np.concatenate((close[..., :1], close[..., :-1]), axis=-1)
+    return np.maximum(high, prev_close) - np.minimum(low, prev_close)
+
+
+def atr(high, low, close, period=14):
+    """平均真实波幅 (ATR)，真实波幅的 Wilder 平滑，第 period - 1 天起有值"""
+    return _wilder(true_range(high, low, close), period, period - 1)
+
+
+def kdj(high, low, close, n=9, m1=3, m2=3):
+    """
+    随机指标 KDJ，返回 (K, D, J)
+
+    RSV 为收盘价在 n 日最高最低价区间中的位置（0-100），K 为 RSV 的 1/m1 平滑，
+    D 为 K 的 1/m2 平滑，K、D 初值为 50，J = 3K - 2D；第 n - 1 天起有值。
+    最高价等于最低价时 RSV 取 50。
+    """
+    close = _as_array(close)
+    highest = rolling_max(high, n)
+    lowest = rolling_min(low, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = (close - lowest) / (highest - lowest) * 100
+    rsv = np.where(highest == lowest, 50.0, rsv)
+
+    start = n - 1
+    if start >= close.shape[-1]:
+        empty = np.full(close.shape, np.nan)
+        return empty, empty.copy(), empty.copy()
+    k = _smooth(rsv, 1 / m1, start=start, initial=50 + (rsv[..., start] - 50) / m1)
+    d = _smooth(k, 1 / m2, start=start, initial=50 + (k[..., start] - 50) / m2)
+    return k, d, 3 * k - 2 * d
@@ -0,0 +1,136 @@
+"""
+多进程分片生成涨跌形态
+
+用法:
+    python manage.py build_patterns --days 3 5 --workers 8
+    python manage.py build_patterns --days 5 --since 2024-01-01
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from stock.pattern_index import mark_index_stale, rebuild_pattern_index
+from stock.patterns import (
+    SUPPORTED_DAYS, WRITE_BATCH_SIZE, get_all_tickers, iter_full_rows, iter_rows_since, write_patterns
+)
+
+
+def init_worker():
+    """子进程初始化：确保 Django 已加载，数据库连接在首次查询时各自建立"""
+    django.setup()
+
+
+def build_shard(shard_id, tickers, days_list, since, compact, batch_size):
+    """
+    在子进程中计算并写入一个分片的形态
+
+    每个子进程按批直接写库，父进程只接收统计数字，不持有任何分片的记录。
+
+    Returns:
+        (shard_id, written, compute_elapsed, write_elapsed)
+    """
+    start = time.perf_counter()
+    written = 0
+    write_elapsed = 0.0
+    pending = []
+
+    def flush():
+        nonlocal written, write_elapsed, pending
+        write_start = time.perf_counter()
+        written += write_patterns(pending, batch_size=batch_size)
+        write_elapsed += time.perf_counter() - write_start
+        pending = []
+
+    try:
+        for days in days_list:
+            if since is None:
+                patterns = iter_full_rows(tickers, days, compact=compact)
+            else:
+                patterns = iter_rows_since(tickers, days, since, compact=compact)
+            for row in patterns:
+                pending.append(row)
+                if len(pending) >= batch_size:
+                    flush()
+        flush()
+    finally:
+        connections.close_all()
+    return shard_id, written, time.perf_counter() - start - write_elapsed, write_elapsed
+
+
+class Command(BaseCommand):
+    help = '按股票分片、多进程并行生成涨跌形态数据'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, nargs='+', default=list(SUPPORTED_DAYS),
+                            help='统计天数，可指定多个（默认 3 5）')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='进程数（默认 CPU 核数）')
+        parser.add_argument('--since', type=str, default=None,
+                            help='只生成该日期（YYYY-MM-DD，含）之后的形态')
+        parser.add_argument('--shard-size', type=int, default=100,
+                            help='每个分片的股票数量（默认 100）')
+        parser.add_argument('--compact', action='store_true',
+                            help='紧凑存储：不保存形态详情，只保存三进制编码')
+        parser.add_argument('--batch-size', type=int, default=WRITE_BATCH_SIZE,
+                            help=f'每批写入的记录数量（默认 {WRITE_BATCH_SIZE}）')
+
+    def handle(self, *args, **options):
+        days_list = options['days']
+        for days in days_list:
+            if days not in SUPPORTED_DAYS:
+                raise CommandError('只支持3天或5天的统计')
+
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since 格式应为 YYYY-MM-DD')
+
+        workers = max(1, options['workers'])
+        shard_size = max(1, options['shard_size'])
+        batch_size = options['batch_size']
+
+        tickers = get_all_tickers()
+        shards = [tickers[i:i + shard_size] for i in range(0, len(tickers), shard_size)]
+        self.stdout.write(
+            f'共 {len(tickers)} 只股票，分为 {len(shards)} 个分片，{workers} 个进程，天数 {days_list}'
+        )
+
+        # 先标记索引过期：分片写入期间或某个分片失败时，新日期仍从表中读取
+        for days in days_list:
+            mark_index_stale(days, since)
+
+        # fork 前关闭父进程连接，避免子进程复用同一个数据库连接
+        connections.close_all()
+
+        total_rows = 0
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            futures = [
+                executor.submit(build_shard, shard_id, shard, days_list, since, options['compact'], batch_size)
+                for shard_id, shard in enumerate(shards)
+            ]
+            for done, future in enumerate(as_completed(futures), start=1):
+                shard_id, written, elapsed, write_elapsed = future.result()
+                total_rows += written
+                rate = written / elapsed if elapsed > 0 else 0
+                self.stdout.write(
+                    f'[{done}/{len(shards)}] 分片 {shard_id}: {len(shards[shard_id])} 只股票, '
+                    f'{written} 条形态, 计算 {elapsed:.2f}s ({rate:.0f} 条/秒), 写入 {write_elapsed:.2f}s'
+                )
+
+        for days in days_list:
+            index_rows = rebuild_pattern_index(days, since=since)
+            self.stdout.write(f'{days} 天形态位图索引已重建：{index_rows} 行')
+
+        total_elapsed = time.perf_counter() - started
+        throughput = total_rows / total_elapsed if total_elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'完成：共写入 {total_rows} 条形态，耗时 {total_elapsed:.2f}s，吞吐 {throughput:.0f} 条/秒'
+        ))
@@ -0,0 +1,35 @@
+"""
+生成周线/月线（stock_history_weekly / stock_history_monthly）
+
+用法:
+    python manage.py build_rollups                    # 增量：从每只股票已物化的最新周期开始
+    python manage.py build_rollups --period weekly --full
+    python manage.py build_rollups --ticker 600000 --ticker 000001
+
+导入新的 stock_history 数据后运行一次即可。
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from stock.rollups import ROLLUP_MODELS, build_rollups
+
+
+class Command(BaseCommand):
+    help = '把日线聚合为周线/月线并增量写入'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', nargs='+', choices=list(ROLLUP_MODELS), default=list(ROLLUP_MODELS),
+                            help='周期，默认 weekly monthly')
+        parser.add_argument('--ticker', action='append', dest='tickers', default=None,
+                            help='只处理指定股票，可重复；默认全部')
+        parser.add_argument('--full', action='store_true',
+                            help='重新聚合全部历史')
+
+    def handle(self, *args, **options):
+        for period in options['period']:
+            started = time.time()
+            written = build_rollups(period, tickers=options['tickers'], incremental=not options['full'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{period}: 写入 {written} 根 K 线，耗时 {time.time() - started:.1f}s'
+            ))
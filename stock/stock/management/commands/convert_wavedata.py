@@ -0,0 +1,47 @@
+"""
+把波浪数据 JSON 文件转换为二进制列式格式（<date>.wvd）
+
+用法:
+    python manage.py convert_wavedata
+    python manage.py convert_wavedata --date 2026-02-24 --force
+"""
+import os
+
+from django.core.management.base import BaseCommand
+
+from stock import wavedata
+
+
+class Command(BaseCommand):
+    help = '把波浪数据 JSON 文件转换为 mmap 读取的二进制格式'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', action='append', dest='dates', default=None,
+                            help='只转换指定日期（YYYY-MM-DD），可重复；默认转换全部')
+        parser.add_argument('--force', action='store_true',
+                            help='二进制文件已是最新时也重新生成')
+
+    def handle(self, *args, **options):
+        dates = options['dates']
+        if not dates:
+            dates = sorted(
+                f[:-len('.json')] for f in os.listdir(wavedata.WAVEDATA_DIR) if f.endswith('.json')
+            )
+
+        converted = skipped = failed = 0
+        for date_str in dates:
+            try:
+                path = wavedata.convert_wavedata_file(date_str, force=options['force'])
+            except (ValueError, OSError) as e:
+                failed += 1
+                self.stderr.write(f'{date_str}: 转换失败 - {e}')
+                continue
+            if path is None:
+                skipped += 1
+            else:
+                converted += 1
+                self.stdout.write(f'{date_str}: {path}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'完成：转换 {converted} 个，跳过 {skipped} 个，失败 {failed} 个'
+        ))
@@ -0,0 +1,40 @@
+"""
+刷新股票代码登记表（stock_ticker）
+
+用法:
+    python manage.py refresh_tickers                     # 全部股票
+    python manage.py refresh_tickers --ticker 600000     # 只刷新指定股票
+    python manage.py refresh_tickers --since 2024-06-03  # 只刷新该日期之后有日线的股票
+
+在 ORM 之外导入 stock_history 后运行本命令（导入新交易日时用 --since 导入的最早日期）；
+股票列表、选股矩阵和批量任务只读取登记表，不会再自行扫描 stock_history。
+删除股票或修改历史数据后不带参数运行，更新全部股票的行数和首末交易日。
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.universe import refresh_tickers, refresh_tickers_since
+
+
+class Command(BaseCommand):
+    help = '从 stock_history 统计每只股票的首末交易日和行数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ticker', action='append', dest='tickers', default=None,
+                            help='只刷新指定股票，可重复；默认全部')
+        parser.add_argument('--since', type=str, default=None,
+                            help='只刷新该日期（含）之后有日线的股票，格式 YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        if options['since']:
+            if options['tickers']:
+                raise CommandError('--ticker 和 --since 不能同时使用')
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since 格式应为 YYYY-MM-DD')
+            written = refresh_tickers_since(since)
+        else:
+            written = refresh_tickers(options['tickers'])
+        self.stdout.write(self.style.SUCCESS(f'完成：刷新 {written} 只股票'))
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(db_column='ticker', max_length=10)),
+                ('trade_date', models.DateField(db_column='trade_date')),
+                ('open_price', models.DecimalField(db_column='open_price', decimal_places=4, max_digits=10)),
+                ('high_price', models.DecimalField(db_column='high_price', decimal_places=4, max_digits=10)),
+                ('low_price', models.DecimalField(db_column='low_price', decimal_places=4, max_digits=10)),
+                ('close_price', models.DecimalField(db_column='close_price', decimal_places=4, max_digits=10)),
+                ('volume', models.DecimalField(db_column='volume', decimal_places=2, max_digits=15)),
+                ('change_price', models.DecimalField(db_column='change_price', decimal_places=6, max_digits=10, null=True)),
+                ('ma_1', models.DecimalField(db_column='ma_1', decimal_places=4, max_digits=10, null=True)),
+                ('ma_2', models.DecimalField(db_column='ma_2', decimal_places=4, max_digits=10, null=True)),
+                ('ma_3', models.DecimalField(db_column='ma_3', decimal_places=4, max_digits=10, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_column='updated_at')),
+            ],
+            options={
+                'verbose_name': '股票历史数据',
+                'verbose_name_plural': '股票历史数据',
+                'db_table': 'stock_history',
+                'ordering': ['-trade_date'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTrendPattern',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pattern_type', models.CharField(help_text='如: 333, 332等', max_length=20, verbose_name='形态类型')),
+                ('days', models.IntegerField(help_text='3天或5天', verbose_name='统计天数')),
+                ('ticker', models.CharField(max_length=10, verbose_name='股票代码')),
+                ('pattern_date', models.DateField(verbose_name='形态结束日期')),
+                ('pattern_detail', models.JSONField(help_text='存储每日涨跌详情', verbose_name='形态详情')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '股票涨跌形态',
+                'verbose_name_plural': '股票涨跌形态',
+                'db_table': 'stock_trend_pattern',
+                'managed': True,
+                'unique_together': {('ticker', 'pattern_date', 'days')},
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+def fill_pattern_codes(apps, schema_editor):
+    """为已有形态记录补齐三进制编码，每种形态一条 UPDATE"""
+    StockTrendPattern = apps.get_model('stock', 'StockTrendPattern')
+    pattern_types = StockTrendPattern.objects.filter(pattern_code__isnull=True).order_by().values_list(
+        'pattern_type', flat=True
+    ).distinct()
+    for pattern_type in list(pattern_types):
+        code = 0
+        for c in pattern_type:
+            code = code * 3 + ord(c) - ord('1')
+        StockTrendPattern.objects.filter(pattern_code__isnull=True, pattern_type=pattern_type).update(
+            pattern_code=code
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockPatternTicker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10, unique=True, verbose_name='股票代码')),
+                ('position', models.IntegerField(unique=True, verbose_name='位图下标')),
+            ],
+            options={
+                'verbose_name': '形态索引股票编号',
+                'verbose_name_plural': '形态索引股票编号',
+                'db_table': 'stock_pattern_ticker',
+                'managed': True,
+            },
+        ),
+        migrations.AddField(
+            model_name='stocktrendpattern',
+            name='pattern_code',
+            field=models.PositiveIntegerField(help_text='形态的三进制整数编码', null=True, verbose_name='形态编码'),
+        ),
+        migrations.AlterField(
+            model_name='stocktrendpattern',
+            name='pattern_detail',
+            field=models.JSONField(blank=True, help_text='存储每日涨跌详情，紧凑模式下为空，按需从历史数据推导', null=True, verbose_name='形态详情'),
+        ),
+        migrations.CreateModel(
+            name='StockPatternIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pattern_date', models.DateField(verbose_name='形态结束日期')),
+                ('days', models.IntegerField(verbose_name='统计天数')),
+                ('pattern_code', models.PositiveIntegerField(verbose_name='形态编码')),
+                ('ticker_count', models.IntegerField(verbose_name='股票数量')),
+                ('bitmap', models.BinaryField(help_text='按 StockPatternTicker.position 排列的位图', verbose_name='股票位图')),
+            ],
+            options={
+                'verbose_name': '形态位图索引',
+                'verbose_name_plural': '形态位图索引',
+                'db_table': 'stock_pattern_index',
+                'managed': True,
+                'indexes': [models.Index(fields=['days', 'pattern_code', 'pattern_date'], name='stock_patte_days_b6dde4_idx')],
+                'unique_together': {('pattern_date', 'days', 'pattern_code')},
+            },
+        ),
+        migrations.RunPython(fill_pattern_codes, migrations.RunPython.noop),
+    ]
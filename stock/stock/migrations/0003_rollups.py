@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0002_pattern_code_and_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHistoryMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10, verbose_name='股票代码')),
+                ('trade_date', models.DateField(help_text='周线为周一，月线为每月 1 日', verbose_name='周期开始日期')),
+                ('first_trade_date', models.DateField(verbose_name='周期内首个交易日')),
+                ('last_trade_date', models.DateField(verbose_name='周期内最后交易日')),
+                ('open_price', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='开盘价')),
+                ('high_price', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='最高价')),
+                ('low_price', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='最低价')),
+                ('close_price', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='收盘价')),
+                ('volume', models.DecimalField(decimal_places=2, max_digits=20, verbose_name='成交量')),
+                ('trade_days', models.IntegerField(verbose_name='交易天数')),
+            ],
+            options={
+                'verbose_name': '股票月线',
+                'verbose_name_plural': '股票月线',
+                'db_table': 'stock_history_monthly',
+                'abstract': False,
+                'managed': True,
+                'unique_together': {('ticker', 'trade_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StockHistoryWeekly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10, verbose_name='股票代码')),
+                ('trade_date', models.DateField(help_text='周线为周一，月线为每月 1 日', verbose_name='周期开始日期')),
+                ('first_trade_date', models.DateField(verbose_name='周期内首个交易日')),
+                ('last_trade_date', models.DateField(verbose_name='周期内最后交易日')),
+                ('open_price', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='开盘价')),
+                ('high_price', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='最高价')),
+                ('low_price', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='最低价')),
+                ('close_price', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='收盘价')),
+                ('volume', models.DecimalField(decimal_places=2, max_digits=20, verbose_name='成交量')),
+                ('trade_days', models.IntegerField(verbose_name='交易天数')),
+            ],
+            options={
+                'verbose_name': '股票周线',
+                'verbose_name_plural': '股票周线',
+                'db_table': 'stock_history_weekly',
+                'abstract': False,
+                'managed': True,
+                'unique_together': {('ticker', 'trade_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0003_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockTicker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10, unique=True, verbose_name='股票代码')),
+                ('first_trade_date', models.DateField(verbose_name='首个交易日')),
+                ('last_trade_date', models.DateField(verbose_name='最后交易日')),
+                ('row_count', models.IntegerField(verbose_name='数据行数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '股票代码',
+                'verbose_name_plural': '股票代码',
+                'db_table': 'stock_ticker',
+                'ordering': ['ticker'],
+                'managed': True,
+            },
+        ),
+    ]
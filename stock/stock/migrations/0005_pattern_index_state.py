@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0004_stock_ticker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockPatternIndexState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days', models.IntegerField(unique=True, verbose_name='统计天数')),
+                ('stale_since', models.DateField(blank=True, help_text='为空表示索引与 stock_trend_pattern 一致', null=True, verbose_name='未索引的最早形态日期')),
+                ('version', models.IntegerField(default=0, help_text='每次写入形态后加一，重建完成时据此判断期间是否又有新写入', verbose_name='写入版本')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='最近一次重建错误')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '形态位图索引状态',
+                'verbose_name_plural': '形态位图索引状态',
+                'db_table': 'stock_pattern_index_state',
+                'managed': True,
+            },
+        ),
+    ]
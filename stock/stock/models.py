@@ -1,62 +1,18 @@
-import json
-import os
-from datetime import datetime
 from django.db import models
-from django.core.cache import cache
 
-
-WAVEDATA_DIR = '/data/stock/wavedata/'
-
-
-def get_wavedata_path(date_str=None):
-    """
-    获取指定日期的波浪数据文件路径
-
-    Args:
-        date_str: 日期字符串，格式为 YYYY-MM-DD，默认为当天
-
-    Returns:
-        JSON文件路径，如果文件不存在则返回None
-    """
-    if date_str is None:
-        date_str = datetime.now().strftime('%Y-%m-%d')
-
-    file_path = os.path.join(WAVEDATA_DIR, f'{date_str}.json')
-
-    if os.path.exists(file_path):
-        return file_path
-    return None
-
-
-def load_wavedata(date_str=None):
-    """
-    从JSON文件加载波浪数据
-
-    Args:
-        date_str: 日期字符串，格式为 YYYY-MM-DD，默认为当天
-
-    Returns:
-        波浪数据字典，键为形态类型（如"111"），值为股票代码列表
-        如果文件不存在则返回空字典
-    """
-    file_path = get_wavedata_path(date_str)
-
-    if file_path:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading wavedata from {file_path}: {e}")
-    return {}
+# 波浪数据工具函数已移至 wavedata.py，这里保留导入以兼容旧代码
+from .wavedata import WAVEDATA_DIR, get_wavedata_path, load_wavedata  # noqa: F401
 
 
 class StockTrendPattern(models.Model):
     """股票涨跌形态模型"""
     pattern_type = models.CharField(max_length=20, verbose_name='形态类型', help_text='如: 333, 332等')
+    pattern_code = models.PositiveIntegerField(null=True, verbose_name='形态编码', help_text='形态的三进制整数编码')
     days = models.IntegerField(verbose_name='统计天数', help_text='3天或5天')
     ticker = models.CharField(max_length=10, verbose_name='股票代码')
     pattern_date = models.DateField(verbose_name='形态结束日期')
-    pattern_detail = models.JSONField(verbose_name='形态详情', help_text='存储每日涨跌详情')
+    pattern_detail = models.JSONField(null=True, blank=True, verbose_name='形态详情',
+                                      help_text='存储每日涨跌详情，紧凑模式下为空，按需从历史数据推导')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
 
     class Meta:
@@ -70,6 +26,61 @@ class StockTrendPattern(models.Model):
         return f"{self.ticker} - {self.pattern_type} ({self.days}天)"
 
 
+class StockPatternTicker(models.Model):
+    """形态位图索引的股票编号，只追加不修改，position 即位图中的比特下标"""
+    ticker = models.CharField(max_length=10, unique=True, verbose_name='股票代码')
+    position = models.IntegerField(unique=True, verbose_name='位图下标')
+
+    class Meta:
+        managed = True
+        db_table = 'stock_pattern_ticker'
+        verbose_name = '形态索引股票编号'
+        verbose_name_plural = '形态索引股票编号'
+
+    def __str__(self):
+        return f"{self.ticker} -> {self.position}"
+
+
+class StockPatternIndex(models.Model):
+    """按 (形态日期, 天数, 形态编码) 预计算的股票位图索引"""
+    pattern_date = models.DateField(verbose_name='形态结束日期')
+    days = models.IntegerField(verbose_name='统计天数')
+    pattern_code = models.PositiveIntegerField(verbose_name='形态编码')
+    ticker_count = models.IntegerField(verbose_name='股票数量')
+    bitmap = models.BinaryField(verbose_name='股票位图', help_text='按 StockPatternTicker.position 排列的位图')
+
+    class Meta:
+        managed = True
+        db_table = 'stock_pattern_index'
+        verbose_name = '形态位图索引'
+        verbose_name_plural = '形态位图索引'
+        unique_together = (('pattern_date', 'days', 'pattern_code'),)
+        indexes = [models.Index(fields=['days', 'pattern_code', 'pattern_date'])]
+
+    def __str__(self):
+        return f"{self.pattern_date} - {self.pattern_code} ({self.days}天)"
+
+
+class StockPatternIndexState(models.Model):
+    """位图索引的新鲜度：stale_since（含）之后的形态已写入表但可能尚未进入索引"""
+    days = models.IntegerField(unique=True, verbose_name='统计天数')
+    stale_since = models.DateField(null=True, blank=True, verbose_name='未索引的最早形态日期',
+                                   help_text='为空表示索引与 stock_trend_pattern 一致')
+    version = models.IntegerField(default=0, verbose_name='写入版本',
+                                  help_text='每次写入形态后加一，重建完成时据此判断期间是否又有新写入')
+    last_error = models.TextField(blank=True, default='', verbose_name='最近一次重建错误')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        managed = True
+        db_table = 'stock_pattern_index_state'
+        verbose_name = '形态位图索引状态'
+        verbose_name_plural = '形态位图索引状态'
+
+    def __str__(self):
+        return f"{self.days}天 (stale_since={self.stale_since})"
+
+
 class StockHistory(models.Model):
     """股票历史数据模型 - 映射到现有表"""
     ticker = models.CharField(max_length=10, db_column='ticker')
@@ -96,3 +107,63 @@ class StockHistory(models.Model):
 
     def __str__(self):
         return f"{self.ticker} - {self.trade_date}"
+
+
+class StockTicker(models.Model):
+    """股票代码登记表，记录每只股票在 stock_history 中的日期范围和行数"""
+    ticker = models.CharField(max_length=10, unique=True, verbose_name='股票代码')
+    first_trade_date = models.DateField(verbose_name='首个交易日')
+    last_trade_date = models.DateField(verbose_name='最后交易日')
+    row_count = models.IntegerField(verbose_name='数据行数')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        managed = True
+        db_table = 'stock_ticker'
+        verbose_name = '股票代码'
+        verbose_name_plural = '股票代码'
+        ordering = ['ticker']
+
+    def __str__(self):
+        return f"{self.ticker} ({self.first_trade_date} ~ {self.last_trade_date})"
+
+
+class StockRollup(models.Model):
+    """周线/月线 K 线，由日线聚合：首日开盘、末日收盘、最高、最低、成交量合计"""
+    ticker = models.CharField(max_length=10, verbose_name='股票代码')
+    trade_date = models.DateField(verbose_name='周期开始日期', help_text='周线为周一，月线为每月 1 日')
+    first_trade_date = models.DateField(verbose_name='周期内首个交易日')
+    last_trade_date = models.DateField(verbose_name='周期内最后交易日')
+    open_price = models.DecimalField(max_digits=10, decimal_places=4, verbose_name='开盘价')
+    high_price = models.DecimalField(max_digits=10, decimal_places=4, verbose_name='最高价')
+    low_price = models.DecimalField(max_digits=10, decimal_places=4, verbose_name='最低价')
+    close_price = models.DecimalField(max_digits=10, decimal_places=4, verbose_name='收盘价')
+    volume = models.DecimalField(max_digits=20, decimal_places=2, verbose_name='成交量')
+    trade_days = models.IntegerField(verbose_name='交易天数')
+
+    class Meta:
+        abstract = True
+        unique_together = (('ticker', 'trade_date'),)
+
+    def __str__(self):
+        return f"{self.ticker} - {self.trade_date}"
+
+
+class StockHistoryWeekly(StockRollup):
+    """周线"""
+
+    class Meta(StockRollup.Meta):
+        managed = True
+        db_table = 'stock_history_weekly'
+        verbose_name = '股票周线'
+        verbose_name_plural = '股票周线'
+
+
+class StockHistoryMonthly(StockRollup):
+    """月线"""
+
+    class Meta(StockRollup.Meta):
+        managed = True
+        db_table = 'stock_history_monthly'
+        verbose_name = '股票月线'
+        verbose_name_plural = '股票月线'
@@ -0,0 +1,460 @@
+"""
+涨跌形态位图索引
+
+每个 (pattern_date, days, pattern_code) 保存一份股票位图，比特下标来自只追加的
+StockPatternTicker 编号表。形态类型统计和按形态查股票都直接读索引，
+不再扫描 stock_trend_pattern；形态详情按需从 stock_history 推导。
+
+写入形态后先用 mark_index_stale 记录未索引的最早日期，索引重建完成前（或重建失败后）
+该日期之后的形态仍从 stock_trend_pattern 读取，更早的日期读索引。
+"""
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import chain, islice
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q, Sum
+
+from .models import StockPatternIndex, StockPatternIndexState, StockPatternTicker, StockTrendPattern
+from .patterns import (
+    LOOKBACK_MARGIN_DAYS, build_pattern_detail, decode_pattern, encode_pattern, encode_trends, iter_close_series
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_ticker_positions(tickers):
+    """
+    为尚未编号的股票分配位图下标，返回 {ticker: position}
+
+    build_patterns 和后台重建可能同时分配：插入时忽略冲突（股票或下标已被占用），
+    然后重新读取编号表，直到所有股票都有下标。
+    """
+    tickers = set(tickers)
+    while True:
+        positions = dict(StockPatternTicker.objects.values_list('ticker', 'position'))
+        missing = sorted(tickers - positions.keys())
+        if not missing:
+            return positions
+        start = max(positions.values(), default=-1)
+        StockPatternTicker.objects.bulk_create([
+            StockPatternTicker(ticker=ticker, position=start + i)
+            for i, ticker in enumerate(missing, start=1)
+        ], ignore_conflicts=True)
+
+
+def get_position_tickers():
+    """返回按位图下标排列的股票代码数组，空位为 None"""
+    positions = list(StockPatternTicker.objects.values_list('position', 'ticker'))
+    lookup = np.empty(max((p for p, _ in positions), default=-1) + 1, dtype=object)
+    for position, ticker in positions:
+        lookup[position] = ticker
+    return lookup
+
+
+def build_bitmap(positions, size):
+    """下标数组 -> 位图字节串（little 比特序，下标 p 位于第 p // 8 字节的第 p % 8 位）"""
+    mask = np.zeros(size, dtype=bool)
+    mask[positions] = True
+    return np.packbits(mask, bitorder='little').tobytes()
+
+
+def bitmap_positions(bitmap):
+    """位图字节串 -> 置位的下标数组"""
+    bits = np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8), bitorder='little')
+    return np.flatnonzero(bits)
+
+
+def _build_date_index(pattern_date, days, positions, codes, size):
+    """为一个形态日期构造所有形态编码的索引行"""
+    positions = np.asarray(positions, dtype=np.intp)
+    codes = np.asarray(codes, dtype=np.int64)
+    rows = []
+    for code in np.unique(codes):
+        selected = positions[codes == code]
+        rows.append(StockPatternIndex(
+            pattern_date=pattern_date,
+            days=days,
+            pattern_code=int(code),
+            ticker_count=len(selected),
+            bitmap=build_bitmap(selected, size)
+        ))
+    return rows
+
+
+def rebuild_pattern_index(days, since=None, batch_size=2000):
+    """
+    根据 stock_trend_pattern 重建位图索引
+
+    Args:
+        days: 统计天数
+        since: 只重建该日期（含）之后的索引，默认全部
+
+    Returns:
+        写入的索引行数
+
+    成功后清除 mark_index_stale 记录的过期标记（期间又有新写入时保留），
+    失败时把错误记录到 StockPatternIndexState.last_error 后重新抛出。
+    """
+    state = StockPatternIndexState.objects.filter(days=days).first()
+    version = state.version if state else 0
+    try:
+        written = _rebuild_pattern_index(days, since, batch_size)
+    except Exception as exc:
+        _record_rebuild(days, since, version, error=exc)
+        raise
+    _record_rebuild(days, since, version)
+    return written
+
+
+def _rebuild_pattern_index(days, since, batch_size):
+    queryset = StockTrendPattern.objects.filter(days=days)
+    if since is not None:
+        queryset = queryset.filter(pattern_date__gte=since)
+
+    tickers = queryset.order_by().values_list('ticker', flat=True).distinct()
+    ticker_positions = ensure_ticker_positions(list(tickers))
+    size = max(ticker_positions.values(), default=-1) + 1
+
+    rows = queryset.order_by('pattern_date').values_list('pattern_date', 'ticker', 'pattern_code', 'pattern_type')
+
+    written = 0
+    pending = []
+    with transaction.atomic():
+        stale = StockPatternIndex.objects.filter(days=days)
+        if since is not None:
+            stale = stale.filter(pattern_date__gte=since)
+        stale.delete()
+
+        current = None
+        positions, codes = [], []
+        for pattern_date, ticker, pattern_code, pattern_type in rows.iterator(chunk_size=10000):
+            if pattern_date != current:
+                if current is not None:
+                    pending.extend(_build_date_index(current, days, positions, codes, size))
+                current = pattern_date
+                positions, codes = [], []
+            positions.append(ticker_positions[ticker])
+            # 兼容引入编码字段之前写入的记录
+            codes.append(pattern_code if pattern_code is not None else encode_pattern(pattern_type))
+
+            if len(pending) >= batch_size:
+                StockPatternIndex.objects.bulk_create(pending, batch_size=batch_size)
+                written += len(pending)
+                pending = []
+        if current is not None:
+            pending.extend(_build_date_index(current, days, positions, codes, size))
+        StockPatternIndex.objects.bulk_create(pending, batch_size=batch_size)
+        written += len(pending)
+    return written
+
+
+def mark_index_stale(days, since=None):
+    """
+    记录 since（含）之后的形态已写入 stock_trend_pattern、尚未进入索引
+
+    Args:
+        since: 写入的最早形态日期，默认为表中最早的日期（全部过期）
+    """
+    if since is None:
+        since = StockTrendPattern.objects.filter(days=days).aggregate(first=Min('pattern_date'))['first']
+        if since is None:
+            return
+    with transaction.atomic():
+        state, _ = StockPatternIndexState.objects.select_for_update().get_or_create(days=days)
+        state.stale_since = since if state.stale_since is None else min(state.stale_since, since)
+        state.version += 1
+        state.save()
+
+
+def _record_rebuild(days, since, version, error=None):
+    with transaction.atomic():
+        state, _ = StockPatternIndexState.objects.select_for_update().get_or_create(days=days)
+        if error is not None:
+            state.last_error = f'{type(error).__name__}: {error}'
+        else:
+            state.last_error = ''
+            covered = since is None or state.stale_since is None or since <= state.stale_since
+            # 重建期间又有形态写入时无法确定是否已读到，保留标记等待下一次重建
+            if covered and state.version == version:
+                state.stale_since = None
+        state.save()
+
+
+def get_index_status(days):
+    """
+    返回索引状态
+
+    Returns:
+        {'stale_since': 'YYYY-MM-DD' 或 None, 'rebuild_error': 最近一次重建错误或 None,
+         'rebuilding': 是否有待执行的后台重建}
+    """
+    state = StockPatternIndexState.objects.filter(days=days).first()
+    return {
+        'stale_since': state.stale_since.strftime('%Y-%m-%d') if state and state.stale_since else None,
+        'rebuild_error': (state.last_error or None) if state else None,
+        'rebuilding': index_rebuilder.is_rebuilding(days),
+    }
+
+
+def get_index_stale_since(days):
+    """索引尚未覆盖的最早形态日期，索引完整时返回 None"""
+    return StockPatternIndexState.objects.filter(days=days).values_list('stale_since', flat=True).first()
+
+
+class IndexRebuilder:
+    """
+    在后台线程中重建位图索引
+
+    同一天数的多次请求合并为一次，从其中最早的日期开始重建（None 表示全部）；
+    重建在一个事务中完成。调度时先标记索引过期，重建完成前（或失败后）新日期从表中读取；
+    失败原因记录在 StockPatternIndexState.last_error，由 get_index_status 返回。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._running = None
+        self._thread = None
+
+    def schedule(self, days, since=None):
+        mark_index_stale(days, since)
+        with self._lock:
+            if days in self._pending:
+                current = self._pending[days]
+                since = None if current is None or since is None else min(current, since)
+            self._pending[days] = since
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='pattern-index-rebuild', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    self._running = None
+                    if not self._pending:
+                        self._thread = None
+                        return
+                    days, since = self._pending.popitem()
+                    self._running = days
+                try:
+                    rebuild_pattern_index(days, since=since)
+                except Exception:
+                    # 错误已记录到 StockPatternIndexState，过期标记保留，读取继续走表
+                    logger.exception('重建 %s 天形态位图索引失败', days)
+        finally:
+            connection.close()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def is_rebuilding(self, days):
+        """指定天数是否有待执行或正在执行的重建"""
+        with self._lock:
+            return days in self._pending or days == self._running
+
+
+index_rebuilder = IndexRebuilder()
+
+
+def has_pattern_index(days):
+    """是否已为指定天数建立位图索引"""
+    return StockPatternIndex.objects.filter(days=days).exists()
+
+
+def get_pattern_type_counts(days):
+    """
+    统计每种形态的出现次数，按次数降序
+
+    读索引；索引过期时 stale_since 之后的日期改从 stock_trend_pattern 统计。
+    """
+    stale_since = get_index_stale_since(days)
+    rows = StockPatternIndex.objects.filter(days=days)
+    if stale_since is not None:
+        rows = rows.filter(pattern_date__lt=stale_since)
+    counts = defaultdict(int)
+    for row in rows.values('pattern_code').annotate(count=Sum('ticker_count')).order_by():
+        counts[decode_pattern(row['pattern_code'], days)] += row['count']
+    if stale_since is not None:
+        recent = StockTrendPattern.objects.filter(days=days, pattern_date__gte=stale_since)
+        for row in recent.values('pattern_type').annotate(count=Count('id')).order_by():
+            counts[row['pattern_type']] += row['count']
+    return [
+        {'pattern_type': pattern_type, 'count': count}
+        for pattern_type, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def iter_pattern_dates(days, pattern_type, until=None, before=None, batch_size=50):
+    """
+    从索引按 pattern_date 倒序产出指定形态的股票
+
+    每次查询只读取 batch_size 个日期的位图（带 LIMIT），调用方停止迭代后不再查询，
+    避免一页数据就把全部位图读到客户端。
+
+    Args:
+        until: 只读取该日期（含）之前的索引
+        before: 只读取该日期（不含）之前的索引
+        batch_size: 每次查询读取的日期数量
+
+    Yields:
+        (pattern_date, tickers)，tickers 为升序的股票代码列表
+    """
+    lookup = get_position_tickers()
+    queryset = StockPatternIndex.objects.filter(days=days, pattern_code=encode_pattern(pattern_type))
+    if until is not None:
+        queryset = queryset.filter(pattern_date__lte=until)
+    if before is not None:
+        queryset = queryset.filter(pattern_date__lt=before)
+    while True:
+        rows = list(queryset.order_by('-pattern_date').values_list('pattern_date', 'bitmap')[:batch_size])
+        for pattern_date, bitmap in rows:
+            yield pattern_date, sorted(lookup[bitmap_positions(bitmap)].tolist())
+        if len(rows) < batch_size:
+            return
+        queryset = queryset.filter(pattern_date__lt=rows[-1][0])
+
+
+def format_pattern_cursor(ticker, pattern_date):
+    """生成翻页游标，格式为 YYYY-MM-DD:ticker"""
+    return f"{pattern_date.strftime('%Y-%m-%d')}:{ticker}"
+
+
+def parse_pattern_cursor(cursor):
+    """
+    解析翻页游标
+
+    Returns:
+        (pattern_date, ticker)，cursor 为空时返回 None
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    if not cursor:
+        return None
+    date_str, sep, ticker = cursor.partition(':')
+    if not sep or not ticker:
+        raise ValueError(cursor)
+    return datetime.strptime(date_str, '%Y-%m-%d').date(), ticker
+
+
+def iter_pattern_matches(days, pattern_type, after=None, with_detail=False, chunk_size=2000, limit=None):
+    """
+    按 (pattern_date 倒序, ticker 升序) 产出指定形态的匹配记录
+
+    已建立位图索引时读索引，否则按同样顺序读 stock_trend_pattern。索引过期时
+    stale_since（含）之后的日期先从表中读取，更早的日期再读索引。表查询按游标
+    分批执行，每批带 LIMIT，不会一次把全部剩余记录传到客户端。
+
+    Args:
+        after: 游标 (pattern_date, ticker)，只返回排在其后的记录
+        with_detail: 是否读取已保存的形态详情（仅对从表中读取的记录有效）
+        chunk_size: 表查询时每次从数据库读取的行数
+        limit: 最多产出的记录数，默认不限
+
+    Yields:
+        (ticker, pattern_date, detail)，detail 未保存时为 None
+    """
+    if limit is not None and limit <= 0:
+        return
+
+    if not has_pattern_index(days):
+        matches = _iter_table_matches(days, pattern_type, after, with_detail, chunk_size, limit)
+    else:
+        stale_since = get_index_stale_since(days)
+        matches = _iter_index_matches(days, pattern_type, after, before=stale_since)
+        if stale_since is not None and (after is None or after[0] >= stale_since):
+            recent = _iter_table_matches(days, pattern_type, after, with_detail, chunk_size, limit,
+                                         since=stale_since)
+            matches = chain(recent, matches)
+    yield from islice(matches, limit)
+
+
+def _iter_index_matches(days, pattern_type, after, before=None):
+    for pattern_date, tickers in iter_pattern_dates(days, pattern_type, until=after and after[0], before=before):
+        if after is not None and pattern_date == after[0]:
+            tickers = tickers[bisect_right(tickers, after[1]):]
+        for ticker in tickers:
+            yield ticker, pattern_date, None
+
+
+def _iter_table_matches(days, pattern_type, after, with_detail, chunk_size, limit, since=None):
+    fields = ('ticker', 'pattern_date', 'pattern_detail') if with_detail else ('ticker', 'pattern_date')
+    base = StockTrendPattern.objects.filter(days=days, pattern_type=pattern_type)
+    if since is not None:
+        base = base.filter(pattern_date__gte=since)
+    remaining = limit
+    while True:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        queryset = base
+        if after is not None:
+            after_date, after_ticker = after
+            queryset = queryset.filter(
+                Q(pattern_date__lt=after_date) | Q(pattern_date=after_date, ticker__gt=after_ticker)
+            )
+        rows = list(queryset.order_by('-pattern_date', 'ticker').values_list(*fields)[:size])
+        for row in rows:
+            yield row if with_detail else (*row, None)
+        if len(rows) < size:
+            return
+        if remaining is not None:
+            remaining -= len(rows)
+            if remaining <= 0:
+                return
+        after = (rows[-1][1], rows[-1][0])
+
+
+def iter_with_details(days, matches, batch_size=500):
+    """为匹配记录补齐未保存的形态详情，每批只查询一次 stock_history"""
+    matches = iter(matches)
+    while True:
+        batch = list(islice(matches, batch_size))
+        if not batch:
+            return
+        derived = derive_pattern_details(
+            days, [(ticker, pattern_date) for ticker, pattern_date, detail in batch if detail is None]
+        )
+        for ticker, pattern_date, detail in batch:
+            if detail is None:
+                detail = derived.get((ticker, pattern_date))
+            yield ticker, pattern_date, detail
+
+
+def derive_pattern_details(days, items):
+    """
+    从 stock_history 推导形态详情
+
+    Args:
+        days: 统计天数
+        items: (ticker, pattern_date) 列表
+
+    Returns:
+        {(ticker, pattern_date): detail}，历史数据不足的形态不在结果中
+    """
+    if not items:
+        return {}
+
+    wanted = defaultdict(list)
+    for ticker, pattern_date in items:
+        wanted[ticker].append(pattern_date)
+    first = min(pattern_date for _, pattern_date in items)
+    last = max(pattern_date for _, pattern_date in items)
+    since = first - timedelta(days=days * 2 + LOOKBACK_MARGIN_DAYS)
+
+    details = {}
+    for ticker, dates, closes in iter_close_series(sorted(wanted), since=since, until=last):
+        for pattern_date in wanted[ticker]:
+            end = bisect_left(dates, pattern_date)
+            if end >= len(dates) or dates[end] != pattern_date or end < days:
+                continue
+            window = closes[end - days:end + 1]
+            pattern = encode_trends(window).tobytes().decode()
+            details[(ticker, pattern_date)] = build_pattern_detail(window.tolist(), pattern)
+    return details
@@ -0,0 +1,324 @@
+"""
+涨跌形态批量生成引擎
+
+按股票分块一次性读取收盘价，用 NumPy 对整列收盘价做 diff/sign 计算
+所有 3 天/5 天滑动窗口的涨跌编码，再通过 bulk_create(update_conflicts=True)
+按 (ticker, pattern_date, days) 唯一键批量写入 StockTrendPattern。
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .models import StockHistory, StockTrendPattern
+from .universe import ticker_universe
+
+
+SUPPORTED_DAYS = (3, 5)
+
+# 每次查询读取的股票数量
+TICKER_CHUNK_SIZE = 200
+
+# 每批写入的记录数量
+WRITE_BATCH_SIZE = 2000
+
+# 增量模式按自然日回看时额外预留的天数，覆盖长假休市
+LOOKBACK_MARGIN_DAYS = 20
+
+# 涨: 3, 平: 1, 跌: 2，按 sign(diff) + 1 取值
+TREND_CODES = np.frombuffer(b'213', dtype=np.uint8)
+TREND_NAMES = {'3': '涨', '1': '平', '2': '跌'}
+
+# 三进制编码时 '1'/'2'/'3' 分别对应 0/1/2，首日为最高位
+TRIT_OFFSET = ord('1')
+
+
+def get_all_tickers():
+    """获取全部股票代码（升序），读取股票代码登记表而不扫描 stock_history"""
+    return list(ticker_universe.tickers())
+
+
+def get_last_pattern_dates(days, tickers=None):
+    """获取每只股票已写入的最新 pattern_date，返回 {ticker: date}"""
+    queryset = StockTrendPattern.objects.filter(days=days)
+    if tickers is not None:
+        queryset = queryset.filter(ticker__in=tickers)
+    return dict(
+        queryset.order_by().values('ticker').annotate(last=Max('pattern_date')).values_list('ticker', 'last')
+    )
+
+
+def iter_close_series(tickers, chunk_size=TICKER_CHUNK_SIZE, since=None, until=None):
+    """
+    分块读取收盘价序列
+
+    Args:
+        tickers: 股票代码列表
+        chunk_size: 每次查询的股票数量
+        since: 只读取该日期（含）之后的数据
+        until: 只读取该日期（含）之前的数据
+
+    Yields:
+        (ticker, dates, closes)，dates 为 date 列表，closes 为 float64 数组
+    """
+    for start in range(0, len(tickers), chunk_size):
+        chunk = tickers[start:start + chunk_size]
+        queryset = StockHistory.objects.filter(ticker__in=chunk)
+        if since is not None:
+            queryset = queryset.filter(trade_date__gte=since)
+        if until is not None:
+            queryset = queryset.filter(trade_date__lte=until)
+        rows = queryset.order_by('ticker', 'trade_date').values_list(
+            'ticker', 'trade_date', 'close_price'
+        )
+
+        current = None
+        dates, closes = [], []
+        for ticker, trade_date, close_price in rows.iterator(chunk_size=10000):
+            if ticker != current:
+                if current is not None:
+                    yield current, dates, np.array(closes, dtype=np.float64)
+                current = ticker
+                dates, closes = [], []
+            dates.append(trade_date)
+            closes.append(close_price)
+        if current is not None:
+            yield current, dates, np.array(closes, dtype=np.float64)
+
+
+def encode_trends(closes):
+    """
+    收盘价序列 -> 逐日涨跌编码
+
+    Returns:
+        长度为 len(closes) - 1 的 uint8 数组，元素为 '3'/'1'/'2' 的 ASCII 码
+    """
+    signs = np.sign(np.diff(closes)).astype(np.int8)
+    return TREND_CODES[signs + 1]
+
+
+def is_valid_pattern(pattern, days):
+    """检查形态字符串是否由 days 个 '1'/'2'/'3' 组成"""
+    return len(pattern) == days and all(c in TREND_NAMES for c in pattern)
+
+
+def encode_pattern(pattern):
+    """形态字符串 -> 三进制整数编码，如 '333' -> 26"""
+    code = 0
+    for c in pattern:
+        code = code * 3 + ord(c) - TRIT_OFFSET
+    return code
+
+
+def decode_pattern(code, days):
+    """三进制整数编码 -> 形态字符串"""
+    digits = []
+    for _ in range(days):
+        code, trit = divmod(code, 3)
+        digits.append(chr(trit + TRIT_OFFSET))
+    return ''.join(reversed(digits))
+
+
+def encode_patterns(patterns, days):
+    """形态字符串数组的向量化三进制编码"""
+    trits = np.ascontiguousarray(patterns, dtype=f'U{days}').view(np.uint32).reshape(-1, days)
+    weights = 3 ** np.arange(days - 1, -1, -1, dtype=np.int64)
+    return (trits.astype(np.int64) - TRIT_OFFSET) @ weights
+
+
+def compute_patterns(closes, days, start=None):
+    """
+    计算所有 days 天滑动窗口的涨跌形态
+
+    Args:
+        closes: 收盘价数组
+        days: 统计天数
+        start: 只返回结束下标 >= start 的窗口，默认全部
+
+    Returns:
+        (end_idx, patterns)：窗口结束位置（对应 closes 下标）和形态字符串数组
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(closes) <= days:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=f'U{days}')
+
+    codes = encode_trends(closes)
+    windows = np.ascontiguousarray(sliding_window_view(codes, days))
+    patterns = windows.view(f'S{days}').ravel().astype(f'U{days}')
+    end_idx = np.arange(days, len(closes))
+
+    if start is not None and start > days:
+        offset = start - days
+        end_idx = end_idx[offset:]
+        patterns = patterns[offset:]
+    return end_idx, patterns
+
+
+def build_pattern_detail(window_closes, pattern):
+    """构造形态详情，window_closes 为 days+1 个收盘价"""
+    detail = []
+    for j, code in enumerate(pattern):
+        close, next_close = window_closes[j], window_closes[j + 1]
+        detail.append({
+            'day': j + 1,
+            'close': close,
+            'next_close': next_close,
+            'diff': next_close - close,
+            'trend': TREND_NAMES[code],
+            'code': code
+        })
+    return detail
+
+
+def build_pattern_rows(ticker, dates, closes, days, start=None, compact=False):
+    """
+    把一只股票的形态计算结果转换为 StockTrendPattern 实例列表
+
+    compact 为 True 时不保存 pattern_detail，需要时再从历史数据推导
+    """
+    end_idx, patterns = compute_patterns(closes, days, start=start)
+    codes = encode_patterns(patterns, days)
+    close_list = closes.tolist()
+    rows = []
+    for end, pattern, code in zip(end_idx.tolist(), patterns.tolist(), codes.tolist()):
+        detail = None if compact else build_pattern_detail(close_list[end - days:end + 1], pattern)
+        rows.append(StockTrendPattern(
+            ticker=ticker,
+            pattern_date=dates[end],
+            days=days,
+            pattern_type=pattern,
+            pattern_code=code,
+            pattern_detail=detail
+        ))
+    return rows
+
+
+def write_patterns(rows, batch_size=WRITE_BATCH_SIZE):
+    """按唯一键批量写入（存在则更新）"""
+    if not rows:
+        return 0
+    options = {
+        'update_conflicts': True,
+        'update_fields': ['pattern_type', 'pattern_code', 'pattern_detail'],
+        'batch_size': batch_size,
+    }
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不支持指定冲突字段
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['ticker', 'pattern_date', 'days']
+    with transaction.atomic():
+        StockTrendPattern.objects.bulk_create(rows, **options)
+    return len(rows)
+
+
+def write_pattern_stream(rows, batch_size=WRITE_BATCH_SIZE):
+    """把可迭代的 StockTrendPattern 实例按批写入，返回写入数量"""
+    written = 0
+    pending = []
+    for row in rows:
+        pending.append(row)
+        if len(pending) >= batch_size:
+            written += write_patterns(pending, batch_size=batch_size)
+            pending = []
+    written += write_patterns(pending, batch_size=batch_size)
+    return written
+
+
+def iter_full_rows(tickers, days, chunk_size=TICKER_CHUNK_SIZE, compact=False):
+    """全量模式：每只股票从头计算所有窗口"""
+    for ticker, dates, closes in iter_close_series(tickers, chunk_size=chunk_size):
+        yield from build_pattern_rows(ticker, dates, closes, days, compact=compact)
+
+
+def iter_rows_since(tickers, days, since, chunk_size=TICKER_CHUNK_SIZE, compact=False):
+    """
+    只计算结束日期 >= since 的窗口
+
+    每只股票只读取 since 之前少量的回看数据；回看数据不足 days 天
+    （如长期停牌）的股票再单独读取完整历史。
+    """
+    lookback = since - timedelta(days=days * 2 + LOOKBACK_MARGIN_DAYS)
+    retry = []
+    for ticker, dates, closes in iter_close_series(tickers, chunk_size=chunk_size, since=lookback):
+        start = bisect_left(dates, since)
+        if start == len(dates):
+            continue
+        if start < days:
+            retry.append(ticker)
+            continue
+        yield from build_pattern_rows(ticker, dates, closes, days, start=start, compact=compact)
+
+    for ticker, dates, closes in iter_close_series(retry, chunk_size=chunk_size):
+        start = bisect_left(dates, since)
+        yield from build_pattern_rows(ticker, dates, closes, days, start=start, compact=compact)
+
+
+def iter_incremental_rows(tickers, days, last_dates, chunk_size=TICKER_CHUNK_SIZE, compact=False):
+    """
+    增量模式：只计算最新 pattern_date 之后的新窗口
+
+    尚无形态的股票计算完整历史，其余股票按最新日期分组读取。
+    """
+    fresh = [t for t in tickers if t not in last_dates]
+    yield from iter_full_rows(fresh, days, chunk_size=chunk_size, compact=compact)
+
+    groups = defaultdict(list)
+    for ticker in tickers:
+        if ticker in last_dates:
+            groups[last_dates[ticker]].append(ticker)
+
+    for last_date, group in groups.items():
+        yield from iter_rows_since(group, days, last_date + timedelta(days=1),
+                                   chunk_size=chunk_size, compact=compact)
+
+
+def generate_patterns(days, tickers=None, incremental=False, compact=False,
+                      chunk_size=TICKER_CHUNK_SIZE, batch_size=WRITE_BATCH_SIZE):
+    """
+    生成指定天数的涨跌形态
+
+    Args:
+        days: 统计天数（3 或 5）
+        tickers: 股票代码列表，默认全部股票
+        incremental: 为 True 时只生成每只股票最新 pattern_date 之后的新形态
+        compact: 为 True 时不保存 pattern_detail
+        chunk_size: 每次查询的股票数量
+        batch_size: 每批写入的记录数量
+
+    Returns:
+        统计字典：tickers、written、created、updated，以及本次写入的
+        最早形态日期 first_date（用于增量重建位图索引）
+    """
+    if tickers is None:
+        tickers = get_all_tickers()
+
+    before = StockTrendPattern.objects.filter(days=days).count()
+
+    if incremental:
+        last_dates = get_last_pattern_dates(days)
+        rows = iter_incremental_rows(tickers, days, last_dates, chunk_size=chunk_size, compact=compact)
+    else:
+        rows = iter_full_rows(tickers, days, chunk_size=chunk_size, compact=compact)
+
+    first_date = None
+
+    def track(rows):
+        nonlocal first_date
+        for row in rows:
+            if first_date is None or row.pattern_date < first_date:
+                first_date = row.pattern_date
+            yield row
+
+    written = write_pattern_stream(track(rows), batch_size=batch_size)
+
+    created = StockTrendPattern.objects.filter(days=days).count() - before
+    return {
+        'tickers': len(tickers),
+        'written': written,
+        'created': created,
+        'updated': written - created,
+        'first_date': first_date
+    }
@@ -0,0 +1,53 @@
+"""
+紧凑数值列编码
+
+把若干等长的数值列编码为小端 float32：
+  - base64：每列一个 base64 字符串，放在 JSON 中返回
+  - 二进制：application/octet-stream，布局为
+        头部长度(u32 小端) + JSON 头部(UTF-8) + 补齐到 4 字节 + 各列依次排列
+    JSON 头部的 columns 给出列名顺序，每列 count 个 float32，缺失值为 NaN
+"""
+import base64
+import json
+import struct
+
+import numpy as np
+
+
+COLUMN_DTYPE = '<f4'
+
+
+def column_bytes(values, dtype=COLUMN_DTYPE):
+    """数值列 -> 小端字节串，None 转为 NaN"""
+    return np.asarray(
+        [np.nan if v is None else v for v in values] if isinstance(values, list) else values,
+        dtype=np.float64
+    ).astype(dtype).tobytes()
+
+
+def encode_base64_columns(columns, dtype=COLUMN_DTYPE):
+    """{列名: 数值列} -> {列名: base64 字符串}"""
+    return {
+        name: base64.b64encode(column_bytes(values, dtype)).decode('ascii')
+        for name, values in columns.items()
+    }
+
+
+def pack_columns(header, columns, dtype=COLUMN_DTYPE):
+    """
+    打包为二进制响应体
+
+    Args:
+        header: 额外的 JSON 头部字段
+        columns: {列名: 数值列}，各列等长
+    """
+    names = list(columns)
+    count = len(columns[names[0]]) if names else 0
+    head = json.dumps(
+        {**header, 'dtype': dtype, 'count': count, 'columns': names},
+        ensure_ascii=False
+    ).encode('utf-8')
+    padding = b' ' * (-(4 + len(head)) % 4)
+    parts = [struct.pack('<I', len(head) + len(padding)), head, padding]
+    parts.extend(column_bytes(columns[name], dtype) for name in names)
+    return b''.join(parts)
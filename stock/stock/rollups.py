@@ -0,0 +1,251 @@
+"""
+周线/月线/N 日 K 线聚合
+
+日线按周期分组后聚合为首开、末收、最高、最低、成交量合计。周线和月线物化到
+stock_history_weekly / stock_history_monthly，按 (ticker, trade_date) 唯一键增量维护；
+接口按索引范围读取，最后一个已物化周期之后的数据用一次范围查询读取日线实时聚合。
+N 日 K 线从股票首个交易日起每 N 个交易日一根，按查询范围读取日线计算。
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .downsample import aggregate_ohlc
+from .models import StockHistory, StockHistoryMonthly, StockHistoryWeekly
+from .patterns import LOOKBACK_MARGIN_DAYS, TICKER_CHUNK_SIZE, WRITE_BATCH_SIZE, get_all_tickers
+from .series import date_strings, load_price_series
+
+
+ROLLUP_MODELS = {
+    'weekly': StockHistoryWeekly,
+    'monthly': StockHistoryMonthly,
+}
+
+# stock_history 字段 -> 聚合使用的列名
+OHLCV_COLUMNS = (
+    ('open_price', 'open'),
+    ('high_price', 'high'),
+    ('low_price', 'low'),
+    ('close_price', 'close'),
+    ('volume', 'volume'),
+)
+
+# datetime64[D] 的 0 日（1970-01-01）是周四，加 3 后对 7 取余即为 weekday（周一为 0）
+EPOCH_WEEKDAY = 3
+
+
+def period_starts(dates, period):
+    """datetime64[D] 数组 -> 每个日期所在周（周一）或月（1 日）的开始日期"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if period == 'weekly':
+        return dates - (dates.astype(np.int64) + EPOCH_WEEKDAY) % 7
+    if period == 'monthly':
+        return dates.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(period)
+
+
+def period_end(day, period):
+    """日期所在周（周日）或月（月末）的最后一天"""
+    start = np.datetime64(period_starts([day], period)[0], 'D')
+    if period == 'weekly':
+        return (start + 6).item()
+    return ((start.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1).item()
+
+
+def group_bars(dates, columns, keys):
+    """
+    按分组键聚合日线，keys 与 dates 等长且相同分组连续
+
+    Returns:
+        {'trade_date', 'first_trade_date', 'last_trade_date', 'trade_days',
+         'open', 'high', 'low', 'close', 'volume'}，trade_date 为每组的分组键
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    keys = np.asarray(keys)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.empty(0, np.intp)
+    ends, bars = aggregate_ohlc(
+        columns['open'], columns['high'], columns['low'], columns['close'], columns['volume'], starts
+    )
+    return {
+        'trade_date': keys[starts],
+        'first_trade_date': dates[starts],
+        'last_trade_date': dates[ends],
+        'trade_days': ends - starts + 1,
+        **bars
+    }
+
+
+def period_bars(dates, columns, period):
+    """把日线聚合为周线或月线"""
+    return group_bars(dates, columns, period_starts(dates, period))
+
+
+def nday_bars(dates, columns, n):
+    """从第一个交易日起每 n 个交易日聚合为一根 K 线，trade_date 为每根的首个交易日"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    bars = group_bars(dates, columns, np.arange(len(dates)) // n)
+    bars['trade_date'] = bars['first_trade_date']
+    return bars
+
+
+def serialize_bars(bars):
+    """聚合结果 -> 接口返回的字典列表，字段与 stock_history 一致"""
+    fields = [(field, bars[name].tolist()) for field, name in OHLCV_COLUMNS]
+    return [
+        {'trade_date': trade_date, **{field: values[i] for field, values in fields}}
+        for i, trade_date in enumerate(date_strings(bars['trade_date']))
+    ]
+
+
+def build_rollup_rows(model, ticker, bars):
+    """聚合结果 -> 周线/月线模型实例列表"""
+    return [
+        model(
+            ticker=ticker,
+            trade_date=trade_date,
+            first_trade_date=first_trade_date,
+            last_trade_date=last_trade_date,
+            trade_days=trade_days,
+            open_price=open_price,
+            high_price=high_price,
+            low_price=low_price,
+            close_price=close_price,
+            volume=volume
+        )
+        for trade_date, first_trade_date, last_trade_date, trade_days, open_price, high_price, low_price,
+        close_price, volume in zip(
+            bars['trade_date'].tolist(), bars['first_trade_date'].tolist(), bars['last_trade_date'].tolist(),
+            bars['trade_days'].tolist(), bars['open'].tolist(), bars['high'].tolist(), bars['low'].tolist(),
+            bars['close'].tolist(), bars['volume'].tolist()
+        )
+    ]
+
+
+def write_rollups(model, rows, batch_size=WRITE_BATCH_SIZE):
+    """按 (ticker, trade_date) 唯一键批量写入（存在则更新）"""
+    if not rows:
+        return 0
+    options = {
+        'update_conflicts': True,
+        'update_fields': [
+            'first_trade_date', 'last_trade_date', 'trade_days',
+            'open_price', 'high_price', 'low_price', 'close_price', 'volume'
+        ],
+        'batch_size': batch_size,
+    }
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不支持指定冲突字段
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['ticker', 'trade_date']
+    with transaction.atomic():
+        model.objects.bulk_create(rows, **options)
+    return len(rows)
+
+
+def get_last_rollup_dates(period, tickers=None):
+    """每只股票已物化的最新周期开始日期，返回 {ticker: date}"""
+    queryset = ROLLUP_MODELS[period].objects.all()
+    if tickers is not None:
+        queryset = queryset.filter(ticker__in=tickers)
+    return dict(
+        queryset.order_by().values('ticker').annotate(last=Max('trade_date')).values_list('ticker', 'last')
+    )
+
+
+def iter_rollup_rows(period, tickers, since=None, chunk_size=TICKER_CHUNK_SIZE):
+    """分块读取 since（含）之后的日线并聚合为周线/月线模型实例"""
+    model = ROLLUP_MODELS[period]
+    for start in range(0, len(tickers), chunk_size):
+        chunk = tickers[start:start + chunk_size]
+        for ticker, series in load_price_series(chunk, start=since).items():
+            if len(series):
+                yield from build_rollup_rows(model, ticker, period_bars(series.dates, series.columns, period))
+
+
+def build_rollups(period, tickers=None, incremental=True, chunk_size=TICKER_CHUNK_SIZE,
+                  batch_size=WRITE_BATCH_SIZE):
+    """
+    生成周线或月线
+
+    增量模式下每只股票从已物化的最新周期开始重新聚合（该周期可能尚未结束），
+    尚无数据的股票聚合完整历史。
+
+    Returns:
+        写入的 K 线数量
+    """
+    model = ROLLUP_MODELS[period]
+    if tickers is None:
+        tickers = get_all_tickers()
+
+    groups = {None: list(tickers)}
+    if incremental:
+        last_dates = get_last_rollup_dates(period, tickers)
+        groups = {}
+        for ticker in tickers:
+            groups.setdefault(last_dates.get(ticker), []).append(ticker)
+
+    written = 0
+    pending = []
+    for since, group in groups.items():
+        for row in iter_rollup_rows(period, group, since=since, chunk_size=chunk_size):
+            pending.append(row)
+            if len(pending) >= batch_size:
+                written += write_rollups(model, pending, batch_size=batch_size)
+                pending = []
+    written += write_rollups(model, pending, batch_size=batch_size)
+    return written
+
+
+def get_rollup_bars(ticker, period, start_date, end_date):
+    """
+    读取一只股票在日期范围内的周线/月线
+
+    已物化的周期按 (ticker, trade_date) 索引范围读取；最新已物化周期（可能尚未结束）
+    到 end_date 所在周期结束之间的日线用一次范围查询读取后实时聚合。trade_date 为
+    周期开始日期，返回开始日期在 start_date 所在周期到 end_date 之间的全部周期，
+    每个周期都是完整的（包括 start_date、end_date 所在的周期）。
+
+    Returns:
+        接口返回的字典列表
+    """
+    model = ROLLUP_MODELS[period]
+    first = period_starts([start_date], period)[0].item()
+    latest = model.objects.filter(ticker=ticker).order_by('-trade_date').values_list('trade_date', flat=True).first()
+    live_since = first if latest is None else max(first, latest)
+
+    data = []
+    if first < live_since:
+        stored = model.objects.filter(
+            ticker=ticker, trade_date__gte=first, trade_date__lt=min(live_since, end_date + timedelta(days=1))
+        ).order_by('trade_date').values_list('trade_date', *[field for field, _ in OHLCV_COLUMNS])
+        for trade_date, *values in stored:
+            data.append({
+                'trade_date': trade_date.strftime('%Y-%m-%d'),
+                **{field: float(value) for (field, _), value in zip(OHLCV_COLUMNS, values)}
+            })
+
+    if live_since <= end_date:
+        # 与已物化周期相同，end_date 所在周期也返回整个周期，不在 end_date 处截断
+        series = load_price_series([ticker], start=live_since, end=period_end(end_date, period))[ticker]
+        data.extend(serialize_bars(period_bars(series.dates, series.columns, period)))
+    return data
+
+
+def get_nday_bars(ticker, n, start_date, end_date):
+    """
+    读取一只股票在日期范围内的 N 日 K 线
+
+    分组从股票首个交易日起计算，不随查询范围变化；返回首个交易日在范围内的 K 线。
+    用 (ticker, trade_date) 索引统计 start_date 之前的交易日数确定分组位置，
+    只读取 start_date 之后到 end_date 所在 K 线结束的日线。
+    """
+    before = StockHistory.objects.filter(ticker=ticker, trade_date__lt=start_date).order_by().count()
+    # 范围内第一根 K 线前面不完整的部分属于上一根，跳过
+    skip = -before % n
+    # 最后一根 K 线可能延伸到 end_date 之后的 n - 1 个交易日
+    until = end_date + timedelta(days=n * 2 + LOOKBACK_MARGIN_DAYS)
+    series = load_price_series([ticker], start=start_date, end=until)[ticker]
+    bars = nday_bars(series.dates[skip:], {name: values[skip:] for name, values in series.columns.items()}, n)
+    hi = np.searchsorted(bars['trade_date'], np.datetime64(end_date, 'D'), 'right')
+    return serialize_bars({key: values[:hi] for key, values in bars.items()})
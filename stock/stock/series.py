@@ -0,0 +1,323 @@
+"""
+股票价格序列批量读取与缓存
+
+一次 ticker__in 查询读取多只股票的指定列，单次遍历按股票分组，
+供各个图表接口共用，避免逐只股票查询（N+1）。
+
+series_store 按股票缓存完整的只读 K 线数组（日期/OHLCV/均线），
+stock 和 visualization 两个应用的价格接口都从这里读取。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import StockHistory
+
+
+# 进程内序列缓存的内存上限（字节）
+SERIES_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# 缓存项超过该时间（秒）后访问时检查该股票是否有新交易日
+SERIES_CHECK_INTERVAL = 60
+
+# 是否使用 django.core.cache 作为跨进程的二级缓存，以及过期时间（秒）
+SERIES_SHARED_CACHE = False
+SERIES_SHARED_TIMEOUT = 3600
+
+
+def _to_float(value):
+    return float(value) if value is not None else None
+
+
+def load_series(tickers, fields=('close_price',), start=None, end=None):
+    """
+    批量读取多只股票的价格序列
+
+    Args:
+        tickers: 股票代码列表
+        fields: 需要读取的 StockHistory 数值字段
+        start: 开始日期（含），默认不限
+        end: 结束日期（含），默认不限
+
+    Returns:
+        {ticker: {'dates': [date, ...], field: [float, ...], ...}}，按 tickers 顺序，
+        没有数据的股票对应空列表
+    """
+    series = {ticker: {'dates': [], **{field: [] for field in fields}} for ticker in tickers}
+    if not tickers:
+        return series
+
+    queryset = StockHistory.objects.filter(ticker__in=tickers)
+    if start is not None:
+        queryset = queryset.filter(trade_date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(trade_date__lte=end)
+    rows = queryset.order_by('ticker', 'trade_date').values_list('ticker', 'trade_date', *fields)
+
+    current = None
+    for row in rows:
+        if row[0] != current:
+            current = row[0]
+            columns = [series[current]['dates']] + [series[current][field] for field in fields]
+        columns[0].append(row[1])
+        for column, value in zip(columns[1:], row[2:]):
+            column.append(_to_float(value))
+    return series
+
+
+# K 线相关字段及返回时使用的列名
+PRICE_COLUMNS = (
+    ('open_price', 'open'),
+    ('high_price', 'high'),
+    ('low_price', 'low'),
+    ('close_price', 'close'),
+    ('volume', 'volume'),
+    ('ma_1', 'ma1'),
+    ('ma_2', 'ma2'),
+    ('ma_3', 'ma3'),
+)
+
+# 涨 - 红色, 平 - 灰色, 跌 - 绿色，按 sign(diff) 取值（-1 取最后一个）
+TREND_COLORS = np.array(['#909399', '#ef232a', '#14b143'])
+
+
+def _column_array(values):
+    """Decimal/None 列 -> float64 数组，None 转为 NaN"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except TypeError:
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def trend_colors(closes):
+    """按收盘价涨跌着色，第一天为灰色"""
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(closes) == 0:
+        return np.empty(0, dtype=TREND_COLORS.dtype)
+    signs = np.sign(np.diff(closes)).astype(np.intp)
+    return np.concatenate((TREND_COLORS[:1], TREND_COLORS[signs]))
+
+
+def pct_changes(closes):
+    """涨跌幅（百分比），第一天及无法计算的值为 NaN"""
+    closes = np.asarray(closes, dtype=np.float64)
+    changes = np.full(len(closes), np.nan)
+    if len(closes) > 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes[1:] = (closes[1:] - closes[:-1]) / closes[:-1] * 100
+        changes[~np.isfinite(changes)] = np.nan
+    return changes
+
+
+def to_json_list(values):
+    """float 数组 -> 列表，NaN 转为 None"""
+    return [None if v != v else v for v in np.asarray(values, dtype=np.float64).tolist()]
+
+
+class PriceSeries:
+    """
+    单只股票的完整 K 线序列（只读）
+
+    dates 为 datetime64[D] 数组，columns 为 {列名: float64 数组}，列名见 PRICE_COLUMNS
+    """
+
+    def __init__(self, ticker, dates, columns):
+        self.ticker = ticker
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.columns = dict(columns)
+        self.dates.flags.writeable = False
+        for values in self.columns.values():
+            values.flags.writeable = False
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __reduce__(self):
+        # 经 django.core.cache 反序列化后重新设置只读
+        return PriceSeries, (self.ticker, self.dates, self.columns)
+
+    @property
+    def last_date(self):
+        return self.dates[-1].item() if len(self.dates) else None
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    def window(self, start=None, end=None, limit=None):
+        """
+        按日期范围截取，返回 (dates, columns) 视图
+
+        Args:
+            start: 开始日期（含）
+            end: 结束日期（含）
+            limit: 只保留范围内最近的 limit 天
+        """
+        lo = np.searchsorted(self.dates, np.datetime64(start, 'D'), 'left') if start is not None else 0
+        hi = np.searchsorted(self.dates, np.datetime64(end, 'D'), 'right') if end is not None else len(self.dates)
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return self.dates[lo:hi], {name: values[lo:hi] for name, values in self.columns.items()}
+
+
+def date_strings(dates):
+    """datetime64 数组 -> 'YYYY-MM-DD' 字符串列表"""
+    return np.datetime_as_string(dates, unit='D').tolist()
+
+
+def load_price_series(tickers, start=None, end=None):
+    """一次查询读取多只股票 start 到 end（含）之间的 K 线序列，默认完整历史，返回 {ticker: PriceSeries}"""
+    fields = [field for field, _ in PRICE_COLUMNS]
+    raw = load_series(tickers, fields, start=start, end=end)
+    return {
+        ticker: PriceSeries(ticker, data['dates'], {name: _column_array(data[field]) for field, name in PRICE_COLUMNS})
+        for ticker, data in raw.items()
+    }
+
+
+class SeriesStore:
+    """
+    按股票缓存 PriceSeries 的读穿透缓存
+
+    进程内按 LRU 淘汰，总内存不超过 memory_budget；缓存项超过 check_interval 秒后
+    再次访问时用 (ticker, trade_date) 索引查询 MAX(trade_date)，有新交易日则重新加载。
+    shared 为 True 时使用 django.core.cache 作为跨进程二级缓存。
+    """
+
+    def __init__(self, memory_budget=SERIES_MEMORY_BUDGET, check_interval=SERIES_CHECK_INTERVAL,
+                 shared=SERIES_SHARED_CACHE, shared_timeout=SERIES_SHARED_TIMEOUT):
+        self.memory_budget = memory_budget
+        self.check_interval = check_interval
+        self.shared = shared
+        self.shared_timeout = shared_timeout
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+    @staticmethod
+    def _shared_key(ticker):
+        return f'stock_series:{ticker}'
+
+    def _lookup(self, ticker, now):
+        """取进程内缓存项，返回 (series, 是否需要检查新交易日)"""
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None:
+                return None, False
+            self._entries.move_to_end(ticker)
+            series, checked_at = entry
+            return series, now - checked_at >= self.check_interval
+
+    def _store(self, series, checked_at):
+        with self._lock:
+            old = self._entries.pop(series.ticker, None)
+            if old is not None:
+                self._nbytes -= old[0].nbytes
+            self._entries[series.ticker] = (series, checked_at)
+            self._nbytes += series.nbytes
+            while self._nbytes > self.memory_budget and len(self._entries) > 1:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+                self.evictions += 1
+        if self.shared:
+            cache.set(self._shared_key(series.ticker), (series, checked_at), self.shared_timeout)
+
+    def get_many(self, tickers):
+        """
+        读取多只股票的序列，未缓存或已过期的股票合并为一次查询加载
+
+        Returns:
+            {ticker: PriceSeries}，按 tickers 顺序，没有数据的股票为空序列
+        """
+        now = time.time()
+        result = {}
+        stale = []
+        for ticker in tickers:
+            series, needs_check = self._lookup(ticker, now)
+            if series is None and self.shared:
+                shared = cache.get(self._shared_key(ticker))
+                if shared is not None:
+                    self.shared_hits += 1
+                    series, checked_at = shared
+                    needs_check = now - checked_at >= self.check_interval
+                    self._store(series, checked_at)
+            if series is None:
+                self.misses += 1
+                continue
+            if needs_check:
+                stale.append(series)
+            else:
+                self.hits += 1
+            result[ticker] = series
+
+        if stale:
+            latest = dict(
+                StockHistory.objects.filter(ticker__in=[s.ticker for s in stale])
+                .order_by().values('ticker').annotate(last=Max('trade_date')).values_list('ticker', 'last')
+            )
+            for series in stale:
+                if latest.get(series.ticker) == series.last_date:
+                    self.hits += 1
+                    self._store(series, now)
+                else:
+                    self.reloads += 1
+                    del result[series.ticker]
+
+        missing = [ticker for ticker in tickers if ticker not in result]
+        if missing:
+            for ticker, series in load_price_series(missing).items():
+                # 没有数据的股票不缓存，避免无效代码占用缓存项
+                if len(series):
+                    self._store(series, now)
+                result[ticker] = series
+        return {ticker: result[ticker] for ticker in tickers}
+
+    def get(self, ticker):
+        """读取单只股票的序列"""
+        return self.get_many([ticker])[ticker]
+
+    def invalidate(self, tickers=None):
+        """使指定股票（默认全部）的缓存失效，同时清除二级缓存中的对应项"""
+        with self._lock:
+            if tickers is None:
+                tickers = list(self._entries)
+            for ticker in tickers:
+                entry = self._entries.pop(ticker, None)
+                if entry is not None:
+                    self._nbytes -= entry[0].nbytes
+        if self.shared:
+            cache.delete_many([self._shared_key(ticker) for ticker in tickers])
+
+    def stats(self):
+        """返回缓存统计"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'nbytes': self._nbytes,
+                'memory_budget': self.memory_budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+                'evictions': self.evictions,
+                'shared_hits': self.shared_hits
+            }
+
+
+series_store = SeriesStore()
+
+
+def invalidate_series(sender, instance, **kwargs):
+    """StockHistory 保存/删除后使对应股票的序列缓存和自定义代码结果缓存失效"""
+    from .executor import result_cache
+
+    series_store.invalidate([instance.ticker])
+    result_cache.invalidate([instance.ticker])
@@ -0,0 +1,97 @@
+"""
+测试公共工具
+
+stock_history 不受 Django 管理，测试库中不会自动建表：StockHistoryMixin 在测试类开始前
+建表、结束后删表。各模块的进程内缓存（序列、代码列表、结果缓存）在每个测试前清空。
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection
+
+from stock.models import StockHistory
+
+
+def make_prices(n, seed=0):
+    """生成随机游走的 (最高, 最低, 收盘) 价"""
+    rng = np.random.default_rng(seed)
+    closes = 10 * np.cumprod(1 + rng.normal(0, 0.02, n))
+    spread = closes * rng.uniform(0, 0.03, n)
+    return closes + spread, closes - spread, closes
+
+
+def trading_days(start, count):
+    """从 start 起的 count 个工作日"""
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def make_history(tickers, count=60, start=date(2024, 1, 1), seed=0):
+    """
+    为每只股票写入 count 个工作日的日线，收盘价为随机游走（保留两位小数，会出现平盘）
+
+    Returns:
+        交易日列表
+    """
+    days = trading_days(start, count)
+    rows = []
+    for i, ticker in enumerate(tickers):
+        highs, lows, closes = make_prices(count, seed=seed + i)
+        for day, high, low, close in zip(days, highs, lows, closes):
+            rows.append(StockHistory(
+                ticker=ticker,
+                trade_date=day,
+                open_price=Decimal(f'{close:.2f}'),
+                high_price=Decimal(f'{high:.2f}'),
+                low_price=Decimal(f'{low:.2f}'),
+                close_price=Decimal(f'{close:.2f}'),
+                volume=Decimal(1000 + i),
+            ))
+    StockHistory.objects.bulk_create(rows)
+    return days
+
+
+def reset_caches():
+    """清空进程内缓存，避免测试之间互相影响"""
+    from stock.executor import result_cache
+    from stock.series import series_store
+    from stock.universe import ticker_universe
+
+    series_store.invalidate()
+    ticker_universe.invalidate()
+    result_cache.clear()
+
+
+class StockHistoryMixin:
+    """在测试库中创建 stock_history 表"""
+
+    @classmethod
+    def setUpClass(cls):
+        # 在 TestCase 开启事务之前建表（SQLite 不能在事务中修改表结构）
+        with connection.schema_editor() as editor:
+            editor.create_model(StockHistory)
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._drop_history_table()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._drop_history_table()
+
+    @classmethod
+    def _drop_history_table(cls):
+        with connection.schema_editor() as editor:
+            editor.delete_model(StockHistory)
+
+    def setUp(self):
+        super().setUp()
+        reset_caches()
@@ -0,0 +1,49 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from stock.downsample import downsample_ohlc, lttb_indices
+
+from .base import make_prices
+
+
+class DownsampleTests(SimpleTestCase):
+
+    def test_lttb_selects_endpoints_and_peaks(self):
+        y = np.zeros(1000)
+        y[417] = 10
+        indices = lttb_indices(y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertTrue((np.diff(indices) > 0).all())
+        self.assertIn(417, indices)
+
+    def test_lttb_returns_all_points(self):
+        self.assertEqual(lttb_indices(np.arange(10.0), 10).tolist(), list(range(10)))
+        self.assertEqual(lttb_indices(np.arange(10.0), 2).tolist(), list(range(10)))
+
+    def test_downsample_ohlc(self):
+        highs, lows, closes = make_prices(103)
+        opens = np.roll(closes, 1)
+        volumes = np.arange(103, dtype=np.float64)
+        ends, columns = downsample_ohlc(opens, highs, lows, closes, volumes, 10)
+
+        starts = np.append(0, ends[:-1] + 1)
+        self.assertLessEqual(len(ends), 10)
+        self.assertEqual(ends[-1], 102)
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            self.assertEqual(columns['open'][i], opens[start])
+            self.assertEqual(columns['close'][i], closes[end])
+            self.assertEqual(columns['high'][i], highs[start:end + 1].max())
+            self.assertEqual(columns['low'][i], lows[start:end + 1].min())
+            self.assertEqual(columns['volume'][i], volumes[start:end + 1].sum())
+
+    def test_downsample_ohlc_short_input(self):
+        highs, lows, closes = make_prices(5)
+        ends, columns = downsample_ohlc(closes, highs, lows, closes, closes, 10)
+        self.assertEqual(ends.tolist(), list(range(5)))
+        np.testing.assert_array_equal(columns['high'], highs)
+
+        ends, columns = downsample_ohlc([], [], [], [], [], 10)
+        self.assertEqual(len(ends), 0)
+        self.assertEqual(len(columns['close']), 0)
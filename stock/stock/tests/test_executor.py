@@ -0,0 +1,269 @@
+import json
+from datetime import timedelta
+from unittest import SkipTest, mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from stock import executor
+from stock.executor import (
+    EXECUTOR_TIMEOUT, CodeExecutor, ExecutionTimeout, PriceFrame, encode_execution, execute_code, restricted_import,
+    result_cache, run_code
+)
+from stock.models import StockHistory
+
+from .base import StockHistoryMixin, make_history
+
+
+CHART_CODE = 'chart_data = {"dates": frame.date_strings(), "series": [{"data": frame.close}]}'
+
+
+class RestrictedImportTests(SimpleTestCase):
+
+    def test_allowed_modules(self):
+        import math
+        import numpy.linalg
+
+        self.assertIs(restricted_import('math'), math)
+        self.assertIs(restricted_import('numpy.linalg', fromlist=('norm',)), numpy.linalg)
+
+    def test_blocked_modules(self):
+        for name in ('os', 'subprocess', 'django.db', 'numpyx'):
+            with self.assertRaises(ImportError):
+                restricted_import(name)
+        with self.assertRaises(ImportError):
+            restricted_import('math', level=1)
+
+
+class CodeExecutorTests(StockHistoryMixin, TransactionTestCase):
+    """在真实的工作进程中执行；工作进程看不到未提交的数据，所以使用 TransactionTestCase"""
+
+    @classmethod
+    def setUpClass(cls):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise SkipTest('工作进程无法访问内存中的测试库，需要为 SQLite 配置 TEST NAME')
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        make_history(['600000'], count=30)
+        self.executor = CodeExecutor(workers=1, max_pending=1, timeout=10)
+        patcher = mock.patch.object(executor, 'code_executor', self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        # stock_history 不受 Django 管理，不会被 TransactionTestCase 清空
+        StockHistory.objects.all().delete()
+        super().tearDown()
+
+    def run_json(self, code, **kwargs):
+        return json.loads(run_code(code, '600000', **kwargs))
+
+    def test_runs_in_worker(self):
+        result = self.run_json(CHART_CODE)
+        self.assertTrue(result['success'], result)
+        self.assertEqual(len(result['data']['dates']), 30)
+        self.assertEqual(result['meta']['row_count'], 30)
+        self.assertEqual(self.executor.stats()['completed'], 1)
+
+    def test_import_allow_list(self):
+        result = self.run_json('import math\nimport numpy as np\n' + CHART_CODE)
+        self.assertTrue(result['success'], result)
+
+        result = self.run_json('import os\n' + CHART_CODE)
+        self.assertFalse(result['success'])
+        self.assertIn('os', result['error'])
+
+    def test_timeout_replaces_worker(self):
+        with self.assertRaises(ExecutionTimeout):
+            run_code('while True:\n    pass', '600000', timeout=1)
+        self.assertEqual(self.executor.stats()['timeouts'], 1)
+        self.assertEqual(self.executor.stats()['idle'], 1)
+
+        result = self.run_json(CHART_CODE)
+        self.assertTrue(result['success'], result)
+
+
+class PriceFrameTests(StockHistoryMixin, TestCase):
+    """用户代码命名空间中的 frame、np 和 indicators（在当前进程内执行）"""
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history(['600000'], count=40)
+        self.closes = [float(close) for close in StockHistory.objects.filter(ticker='600000').order_by(
+            'trade_date').values_list('close_price', flat=True)]
+
+    def test_frame_columns(self):
+        frame = PriceFrame.load('600000')
+        self.assertEqual(len(frame), 40)
+        self.assertEqual(frame.close.tolist(), self.closes)
+        self.assertEqual(frame.date_strings()[0], self.days[0].strftime('%Y-%m-%d'))
+        self.assertEqual(frame.tail(5).close.tolist(), self.closes[-5:])
+        window = frame.window(start=self.days[10], end=self.days[19])
+        self.assertEqual(window.close.tolist(), self.closes[10:20])
+        with self.assertRaises(ValueError):
+            frame.close[0] = 0
+
+    def test_namespace(self):
+        code = '\n'.join([
+            'ma = indicators.sma(frame.close, 5)',
+            'chart_data = {"dates": frame.date_strings(), "series": [{"data": ma}], "last": np.round(ma[-1], 4)}',
+            'print(ticker, len(frame))',
+        ])
+        result = execute_code(code, '600000')
+        self.assertTrue(result['success'], result)
+        self.assertEqual(result['output'], '600000 40\n')
+        self.assertAlmostEqual(float(result['data']['last']), round(sum(self.closes[-5:]) / 5, 4))
+
+        body = json.loads(encode_execution(result)[2])
+        self.assertEqual(body['data']['series'][0]['data'][:4], [None] * 4)
+
+    def test_missing_chart_data(self):
+        result = execute_code('x = frame.close.max()', '600000')
+        self.assertFalse(result['success'])
+        self.assertIn('chart_data', result['error'])
+
+
+class ResultCacheTests(StockHistoryMixin, TestCase):
+    """编译缓存和按 (源码, 股票, 数据版本) 缓存的执行结果（在当前进程内执行）"""
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history(['600000', '600519'], count=20)
+        patcher = mock.patch.object(executor, 'EXECUTOR_ENABLED', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # 编译缓存是进程级的，每个测试使用不同的源码
+        self.code = f'# {self.id()}\n{CHART_CODE}'
+
+    def meta(self, ticker='600000', code=None):
+        return json.loads(run_code(code or self.code, ticker))['meta']
+
+    def test_result_cache_hit(self):
+        first = self.meta()
+        self.assertEqual((first['result_cache'], first['compile_cache']), ('miss', 'miss'))
+        second = self.meta()
+        self.assertEqual(second['result_cache'], 'hit')
+        self.assertNotIn('compile_cache', second)
+        self.assertEqual(second['row_count'], 20)
+
+        # 另一只股票的结果未缓存，但编译结果可以复用
+        other = self.meta('600519')
+        self.assertEqual((other['result_cache'], other['compile_cache']), ('miss', 'hit'))
+
+    def test_new_trading_day(self):
+        self.meta()
+        make_history(['600000'], count=1, start=self.days[-1] + timedelta(days=3))
+        meta = self.meta()
+        self.assertEqual(meta['result_cache'], 'miss')
+        self.assertEqual(meta['row_count'], 21)
+
+    def test_backfill_changes_version(self):
+        self.meta()
+        # 绕过 ORM 删除中间一天，模拟外部导入修改历史数据：最后交易日不变，行数变化
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM stock_history WHERE ticker = %s AND trade_date = %s',
+                           ['600000', self.days[5]])
+        meta = self.meta()
+        self.assertEqual(meta['result_cache'], 'miss')
+        self.assertEqual(meta['row_count'], 19)
+        self.assertEqual(meta['last_trade_date'], self.days[-1].isoformat())
+
+    def test_orm_save_clears_results(self):
+        self.meta()
+        self.meta('600519')
+        row = StockHistory.objects.get(ticker='600000', trade_date=self.days[-1])
+        row.close_price = row.close_price + 1
+        row.save()
+        self.assertEqual(result_cache.stats()['entries'], 1)
+        self.assertEqual(self.meta()['result_cache'], 'miss')
+
+    def test_failures_not_cached(self):
+        code = f'# {self.id()}\nraise ValueError("bad")'
+        for _ in range(2):
+            result = json.loads(run_code(code, '600000'))
+            self.assertFalse(result['success'])
+            self.assertEqual(result['meta']['result_cache'], 'miss')
+
+
+class BatchTests(StockHistoryMixin, TransactionTestCase):
+    """批量执行接口（在当前进程内执行）；任务在线程池中使用各自的数据库连接，所以使用 TransactionTestCase"""
+    url = '/stock/api/run-custom-code/batch/'
+
+    def setUp(self):
+        super().setUp()
+        make_history(['000001', '600000', '600519'], count=15)
+        patcher = mock.patch.object(executor, 'EXECUTOR_ENABLED', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.code = f'# {self.id()}\nif ticker == "600519":\n    x = 1 / 0\n{CHART_CODE}'
+
+    def tearDown(self):
+        StockHistory.objects.all().delete()
+        super().tearDown()
+
+    def post(self, **payload):
+        return self.client.post(self.url, json.dumps({'code': self.code, **payload}), content_type='application/json')
+
+    def stream(self, **payload):
+        response = self.post(**payload)
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        items = [json.loads(line) for line in lines]
+        return {item['ticker']: item for item in items[:-1]}, items[-1]
+
+    def test_results_and_summary(self):
+        results, summary = self.stream(tickers=['600000', '600519', '000001', '600000'])
+        self.assertEqual(set(results), {'600000', '600519', '000001'})
+        self.assertEqual(len(results['600000']['data']['dates']), 15)
+        self.assertFalse(results['600519']['success'])
+        self.assertEqual(results['600519']['error'], 'division by zero')
+        self.assertEqual(
+            {key: summary[key] for key in ('type', 'total', 'succeeded', 'failed', 'timeouts', 'cached')},
+            {'type': 'summary', 'total': 3, 'succeeded': 2, 'failed': 1, 'timeouts': 0, 'cached': 0}
+        )
+
+        _, summary = self.stream(tickers='all')
+        self.assertEqual((summary['total'], summary['cached']), (3, 2))
+
+    def test_without_data(self):
+        results, _ = self.stream(tickers=['600000'], include_data=False)
+        self.assertTrue(results['600000']['success'])
+        self.assertNotIn('data', results['600000'])
+
+    def test_timeouts_counted(self):
+        original = executor._run_cached
+
+        def run_cached(code, key, ticker, version, **kwargs):
+            if ticker == '000001':
+                raise ExecutionTimeout('代码执行超时')
+            return original(code, key, ticker, version, **kwargs)
+
+        with mock.patch.object(executor, '_run_cached', side_effect=run_cached):
+            results, summary = self.stream(tickers=['000001', '600000'], timeout=1)
+        self.assertFalse(results['000001']['success'])
+        self.assertNotIn('timeout', results['000001'])
+        self.assertEqual((summary['failed'], summary['timeouts']), (1, 1))
+
+    def test_sse(self):
+        response = self.post(tickers=['600000'], format='sse')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = b''.join(response.streaming_content).decode().split('\n\n')
+        self.assertTrue(events[0].startswith('event: result\ndata: '))
+        self.assertTrue(events[1].startswith('event: summary\ndata: '))
+
+    def test_validation(self):
+        invalid = [
+            {'tickers': ['600000'], 'timeout': 0},
+            {'tickers': ['600000'], 'timeout': 'nan'},
+            {'tickers': ['600000'], 'timeout': EXECUTOR_TIMEOUT + 1},
+            {'tickers': ['600000'], 'include_data': 'false'},
+            {'tickers': '600000'},
+            {'tickers': ['600000'], 'format': 'csv'},
+        ]
+        for payload in invalid:
+            self.assertEqual(self.post(**payload).status_code, 400, payload)
+        with mock.patch('stock.views.EXECUTOR_BATCH_MAX_TICKERS', 2):
+            self.assertEqual(self.post(tickers=['000001', '600000', '600519']).status_code, 400)
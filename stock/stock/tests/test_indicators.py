@@ -0,0 +1,138 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from stock import indicators
+
+from .base import make_prices
+
+
+# ---- 逐点循环的参考实现 ----
+
+def reference_sma(values, period):
+    return [np.nan if i < period - 1 else sum(values[i - period + 1:i + 1]) / period for i in range(len(values))]
+
+
+def reference_ema(values, period):
+    alpha = 2 / (period + 1)
+    result = []
+    for i, x in enumerate(values):
+        result.append(x if i == 0 else result[-1] + alpha * (x - result[-1]))
+    return result
+
+
+def reference_wilder(values, period, start):
+    result = [np.nan] * len(values)
+    if start >= len(values):
+        return result
+    avg = sum(values[start - period + 1:start + 1]) / period
+    result[start] = avg
+    for i in range(start + 1, len(values)):
+        avg = (avg * (period - 1) + values[i]) / period
+        result[i] = avg
+    return result
+
+
+def reference_rsi(values, period):
+    changes = [0.0] + [values[i] - values[i - 1] for i in range(1, len(values))]
+    gains = reference_wilder([max(c, 0) for c in changes], period, period)
+    losses = reference_wilder([max(-c, 0) for c in changes], period, period)
+    result = []
+    for gain, loss in zip(gains, losses):
+        if np.isnan(gain):
+            result.append(np.nan)
+        elif loss == 0:
+            result.append(100.0)
+        else:
+            result.append(100 - 100 / (1 + gain / loss))
+    return result
+
+
+def reference_atr(highs, lows, closes, period):
+    ranges = []
+    for i in range(len(closes)):
+        prev_close = closes[i - 1] if i else closes[0]
+        ranges.append(max(highs[i], prev_close) - min(lows[i], prev_close))
+    return reference_wilder(ranges, period, period - 1)
+
+
+def reference_kdj(highs, lows, closes, n, m1, m2):
+    k_values, d_values, j_values = [], [], []
+    k = d = 50.0
+    for i in range(len(closes)):
+        if i < n - 1:
+            k_values.append(np.nan)
+            d_values.append(np.nan)
+            j_values.append(np.nan)
+            continue
+        highest, lowest = max(highs[i - n + 1:i + 1]), min(lows[i - n + 1:i + 1])
+        rsv = 50.0 if highest == lowest else (closes[i] - lowest) / (highest - lowest) * 100
+        k = k + (rsv - k) / m1
+        d = d + (k - d) / m2
+        k_values.append(k)
+        d_values.append(d)
+        j_values.append(3 * k - 2 * d)
+    return k_values, d_values, j_values
+
+
+class IndicatorTests(SimpleTestCase):
+    """向量化指标与逐点循环的结果一致"""
+
+    def setUp(self):
+        self.highs, self.lows, self.closes = make_prices(300)
+
+    def assertSeriesEqual(self, actual, expected):
+        np.testing.assert_allclose(actual, np.asarray(expected, dtype=np.float64), rtol=1e-9, equal_nan=True)
+
+    def test_sma(self):
+        for period in (1, 5, 20):
+            self.assertSeriesEqual(indicators.sma(self.closes, period), reference_sma(self.closes.tolist(), period))
+
+    def test_ema(self):
+        self.assertSeriesEqual(indicators.ema(self.closes, 12), reference_ema(self.closes.tolist(), 12))
+
+    def test_rsi(self):
+        self.assertSeriesEqual(indicators.rsi(self.closes, 14), reference_rsi(self.closes.tolist(), 14))
+
+    def test_rsi_without_losses(self):
+        result = indicators.rsi(np.arange(1, 31, dtype=np.float64), 14)
+        self.assertTrue(np.isnan(result[:14]).all())
+        self.assertTrue((result[14:] == 100).all())
+
+    def test_atr(self):
+        expected = reference_atr(self.highs.tolist(), self.lows.tolist(), self.closes.tolist(), 14)
+        self.assertSeriesEqual(indicators.atr(self.highs, self.lows, self.closes, 14), expected)
+
+    def test_kdj(self):
+        expected = reference_kdj(self.highs.tolist(), self.lows.tolist(), self.closes.tolist(), 9, 3, 3)
+        for actual, values in zip(indicators.kdj(self.highs, self.lows, self.closes), expected):
+            self.assertSeriesEqual(actual, values)
+
+    def test_matrix_matches_rows(self):
+        rows = [make_prices(120, seed=seed) for seed in range(4)]
+        highs, lows, closes = (np.vstack(columns) for columns in zip(*rows))
+        funcs = [
+            lambda h, l, c: indicators.sma(c, 20),
+            lambda h, l, c: indicators.ema(c, 20),
+            lambda h, l, c: indicators.rsi(c, 14),
+            lambda h, l, c: indicators.atr(h, l, c, 14),
+            lambda h, l, c: indicators.kdj(h, l, c)[0],
+        ]
+        for func in funcs:
+            matrix = func(highs, lows, closes)
+            self.assertEqual(matrix.shape, closes.shape)
+            for i in range(len(closes)):
+                self.assertSeriesEqual(matrix[i], func(highs[i], lows[i], closes[i]))
+
+    def test_empty_input(self):
+        empty = np.empty(0)
+        for result in (indicators.sma(empty, 5), indicators.ema(empty, 5), indicators.rsi(empty),
+                       indicators.atr(empty, empty, empty), *indicators.kdj(empty, empty, empty)):
+            self.assertEqual(result.shape, (0,))
+
+    def test_short_input(self):
+        highs, lows, closes = make_prices(5)
+        for result in (indicators.sma(closes, 20), indicators.rsi(closes, 14),
+                       indicators.atr(highs, lows, closes, 14), *indicators.kdj(highs, lows, closes, 9)):
+            self.assertEqual(result.shape, (5,))
+            self.assertTrue(np.isnan(result).all())
+        self.assertSeriesEqual(indicators.ema(closes, 20), reference_ema(closes.tolist(), 20))
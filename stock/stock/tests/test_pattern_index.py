@@ -0,0 +1,216 @@
+from collections import Counter
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from stock import pattern_index
+from stock.models import StockHistory, StockPatternTicker, StockTrendPattern
+from stock.pattern_index import (
+    ensure_ticker_positions, format_pattern_cursor, get_index_status, get_pattern_type_counts, has_pattern_index,
+    iter_pattern_matches, mark_index_stale, parse_pattern_cursor, rebuild_pattern_index
+)
+from stock.patterns import generate_patterns
+
+from .base import StockHistoryMixin, make_history, trading_days
+
+
+def table_matches(days, pattern_type):
+    """按 (pattern_date 倒序, ticker 升序) 直接从表中读取的匹配记录"""
+    rows = StockTrendPattern.objects.filter(days=days, pattern_type=pattern_type).values_list('ticker', 'pattern_date')
+    return sorted(rows, key=lambda row: (-row[1].toordinal(), row[0]))
+
+
+def table_counts(days):
+    return Counter(StockTrendPattern.objects.filter(days=days).values_list('pattern_type', flat=True))
+
+
+class PatternIndexTests(StockHistoryMixin, TestCase):
+    tickers = ['000001', '000002', '600000', '600519', '688001']
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history(self.tickers, count=30)
+        generate_patterns(3, tickers=self.tickers)
+        rebuild_pattern_index(3)
+
+    def append_days(self, count=4):
+        """追加交易日并增量生成形态，返回本次写入的最早形态日期"""
+        new_days = trading_days(self.days[-1], count + 1)[1:]
+        StockHistory.objects.bulk_create([
+            StockHistory(ticker=ticker, trade_date=day, open_price=1, high_price=1, low_price=1,
+                         close_price=10 + (i + j) % 3, volume=1)
+            for j, ticker in enumerate(self.tickers) for i, day in enumerate(new_days)
+        ])
+        return generate_patterns(3, tickers=self.tickers, incremental=True)['first_date']
+
+    def assertMatchesTable(self, days=3):
+        pattern_types = table_counts(days)
+        self.assertTrue(pattern_types)
+        for pattern_type in pattern_types:
+            matches = [(ticker, pattern_date) for ticker, pattern_date, _ in iter_pattern_matches(days, pattern_type)]
+            self.assertEqual(matches, table_matches(days, pattern_type), pattern_type)
+        counts = {item['pattern_type']: item['count'] for item in get_pattern_type_counts(days)}
+        self.assertEqual(counts, dict(table_counts(days)))
+
+    def test_index_matches_table(self):
+        self.assertTrue(has_pattern_index(3))
+        self.assertMatchesTable()
+        self.assertEqual(get_index_status(3), {'stale_since': None, 'rebuild_error': None, 'rebuilding': False})
+
+    def test_cursor_and_limit(self):
+        pattern_type = table_counts(3).most_common(1)[0][0]
+        expected = table_matches(3, pattern_type)
+        after = expected[2]
+        matches = iter_pattern_matches(3, pattern_type, after=(after[1], after[0]), limit=3)
+        self.assertEqual([row[:2] for row in matches], expected[3:6])
+
+    def test_stale_dates_served_from_table(self):
+        first_date = self.append_days()
+        mark_index_stale(3, first_date)
+        self.assertEqual(get_index_status(3)['stale_since'], first_date.strftime('%Y-%m-%d'))
+        self.assertMatchesTable()
+
+        # 游标落在未索引日期和已索引日期时都能接上
+        for pattern_type in table_counts(3):
+            expected = table_matches(3, pattern_type)
+            for position in range(len(expected) - 1):
+                ticker, pattern_date = expected[position]
+                matches = iter_pattern_matches(3, pattern_type, after=(pattern_date, ticker), limit=2)
+                self.assertEqual([row[:2] for row in matches], expected[position + 1:position + 3])
+
+        rebuild_pattern_index(3, since=first_date)
+        self.assertIsNone(get_index_status(3)['stale_since'])
+        self.assertMatchesTable()
+
+    def test_failed_rebuild_is_recorded(self):
+        first_date = self.append_days()
+        mark_index_stale(3, first_date)
+        with mock.patch.object(pattern_index, '_build_date_index', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                rebuild_pattern_index(3, since=first_date)
+
+        status = get_index_status(3)
+        self.assertEqual(status['rebuild_error'], 'RuntimeError: boom')
+        self.assertEqual(status['stale_since'], first_date.strftime('%Y-%m-%d'))
+        self.assertMatchesTable()
+
+        rebuild_pattern_index(3, since=first_date)
+        self.assertEqual(get_index_status(3), {'stale_since': None, 'rebuild_error': None, 'rebuilding': False})
+
+    def test_write_during_rebuild_keeps_stale(self):
+        first_date = self.append_days()
+        mark_index_stale(3, first_date)
+        original = pattern_index._rebuild_pattern_index
+
+        def rebuild_with_concurrent_write(*args):
+            written = original(*args)
+            mark_index_stale(3, first_date)
+            return written
+
+        with mock.patch.object(pattern_index, '_rebuild_pattern_index', side_effect=rebuild_with_concurrent_write):
+            rebuild_pattern_index(3, since=first_date)
+        self.assertEqual(get_index_status(3)['stale_since'], first_date.strftime('%Y-%m-%d'))
+
+    def test_partial_rebuild_keeps_earlier_stale_dates(self):
+        first_date = self.append_days()
+        mark_index_stale(3, self.days[10])
+        rebuild_pattern_index(3, since=first_date)
+        self.assertEqual(get_index_status(3)['stale_since'], self.days[10].strftime('%Y-%m-%d'))
+
+
+class TickerPositionTests(TestCase):
+
+    def test_positions_are_stable(self):
+        first = ensure_ticker_positions(['600000', '000001'])
+        self.assertEqual(first, {'000001': 0, '600000': 1})
+        second = ensure_ticker_positions(['600519', '000001'])
+        self.assertEqual(second, {'000001': 0, '600000': 1, '600519': 2})
+
+    def test_concurrent_assignment(self):
+        ensure_ticker_positions(['000001'])
+        manager = StockPatternTicker.objects
+        original = manager.bulk_create
+        raced = []
+
+        def bulk_create_after_other_process(rows, **kwargs):
+            # 模拟另一个进程在读取编号表之后抢先占用了同一个下标
+            if not raced:
+                raced.append(True)
+                StockPatternTicker.objects.create(ticker='300750', position=1)
+            return original(rows, **kwargs)
+
+        with mock.patch.object(manager, 'bulk_create', side_effect=bulk_create_after_other_process):
+            positions = ensure_ticker_positions(['600000', '600519'])
+
+        self.assertEqual(positions, {'000001': 0, '300750': 1, '600519': 2, '600000': 3})
+        self.assertEqual(len(set(positions.values())), len(positions))
+
+
+class PatternCursorTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        cursor = format_pattern_cursor('600000', date(2024, 1, 2))
+        self.assertEqual(cursor, '2024-01-02:600000')
+        self.assertEqual(parse_pattern_cursor(cursor), (date(2024, 1, 2), '600000'))
+
+    def test_empty(self):
+        self.assertIsNone(parse_pattern_cursor(''))
+        self.assertIsNone(parse_pattern_cursor(None))
+
+    def test_invalid(self):
+        for cursor in ('2024-01-02', '2024-01-02:', 'x:600000', '2024-13-01:600000'):
+            with self.assertRaises(ValueError):
+                parse_pattern_cursor(cursor)
+
+
+class PatternPagingTests(StockHistoryMixin, TestCase):
+    """按游标翻页读完的结果与直接查表一致，表查询和索引两条路径相同"""
+    tickers = ['000001', '000002', '600000', '600519', '688001', '300750']
+
+    def setUp(self):
+        super().setUp()
+        make_history(self.tickers, count=25)
+        generate_patterns(3, tickers=self.tickers, compact=True)
+
+    def fetch_all(self, pattern_type, limit, **params):
+        url = f'/stock/api/patterns/3/{pattern_type}/'
+        rows, cursor = [], None
+        while True:
+            query = {'limit': limit, **params}
+            if cursor:
+                query['cursor'] = cursor
+            data = self.client.get(url, query).json()
+            self.assertTrue(data['success'])
+            rows.extend(data['data'])
+            if not data['has_more']:
+                self.assertIsNone(data['next_cursor'])
+                return rows
+            self.assertEqual(len(data['data']), limit)
+            cursor = data['next_cursor']
+
+    def assertPagesMatchTable(self):
+        for pattern_type in table_counts(3):
+            expected = table_matches(3, pattern_type)
+            rows = self.fetch_all(pattern_type, limit=4, detail='0')
+            self.assertEqual([(row['ticker'], row['pattern_date']) for row in rows],
+                             [(ticker, day.strftime('%Y-%m-%d')) for ticker, day in expected])
+
+    def test_table_paging(self):
+        self.assertFalse(has_pattern_index(3))
+        self.assertPagesMatchTable()
+
+    def test_index_paging(self):
+        rebuild_pattern_index(3)
+        self.assertPagesMatchTable()
+
+    def test_detail_derived_from_history(self):
+        pattern_type = table_counts(3).most_common(1)[0][0]
+        table_rows = self.fetch_all(pattern_type, limit=5)
+        rebuild_pattern_index(3)
+        self.assertEqual(self.fetch_all(pattern_type, limit=5), table_rows)
+        self.assertTrue(all(row['detail'] for row in table_rows))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/stock/api/patterns/3/333/', {'cursor': 'bad'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,98 @@
+import itertools
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from stock.models import StockHistory, StockTrendPattern
+from stock.patterns import decode_pattern, encode_pattern, encode_patterns, generate_patterns, is_valid_pattern
+
+from .base import StockHistoryMixin, make_history, trading_days
+
+
+def pattern_rows(days):
+    return set(StockTrendPattern.objects.filter(days=days).values_list('ticker', 'pattern_date', 'pattern_type'))
+
+
+def reference_pattern(closes):
+    """逐日比较收盘价得到形态字符串"""
+    return ''.join('3' if b > a else '2' if b < a else '1' for a, b in zip(closes, closes[1:]))
+
+
+class GeneratePatternsTests(StockHistoryMixin, TestCase):
+    tickers = ['000001', '600000', '600519']
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history(self.tickers, count=40)
+
+    def test_full_generation(self):
+        stats = generate_patterns(3, tickers=self.tickers)
+        self.assertEqual(stats['written'], len(self.tickers) * (40 - 3))
+        self.assertEqual(stats['created'], stats['written'])
+        self.assertEqual(stats['first_date'], self.days[3])
+
+        closes = [float(c) for c in StockHistory.objects.filter(ticker='600000').order_by('trade_date')
+                  .values_list('close_price', flat=True)]
+        row = StockTrendPattern.objects.get(ticker='600000', days=3, pattern_date=self.days[10])
+        self.assertEqual(row.pattern_type, reference_pattern(closes[7:11]))
+        self.assertEqual([item['close'] for item in row.pattern_detail], closes[7:10])
+
+    def test_full_generation_is_idempotent(self):
+        generate_patterns(5, tickers=self.tickers)
+        stats = generate_patterns(5, tickers=self.tickers)
+        self.assertEqual(stats['created'], 0)
+        self.assertEqual(stats['updated'], stats['written'])
+
+    def test_incremental_matches_full(self):
+        generate_patterns(3, tickers=self.tickers)
+
+        # 追加新交易日和一只新股票
+        new_days = trading_days(self.days[-1], 6)[1:]
+        rows = []
+        for ticker in self.tickers:
+            rows.extend(StockHistory(
+                ticker=ticker, trade_date=day, open_price=1, high_price=1, low_price=1,
+                close_price=10 + i % 3, volume=1
+            ) for i, day in enumerate(new_days))
+        StockHistory.objects.bulk_create(rows)
+        make_history(['300750'], count=20, seed=9)
+
+        tickers = self.tickers + ['300750']
+        stats = generate_patterns(3, tickers=tickers, incremental=True)
+        self.assertEqual(stats['written'], len(self.tickers) * len(new_days) + (20 - 3))
+        self.assertEqual(stats['created'], stats['written'])
+        self.assertEqual(stats['first_date'], self.days[3])
+
+        incremental = pattern_rows(3)
+        StockTrendPattern.objects.all().delete()
+        generate_patterns(3, tickers=tickers)
+        self.assertEqual(incremental, pattern_rows(3))
+
+    def test_incremental_without_new_days(self):
+        generate_patterns(3, tickers=self.tickers)
+        stats = generate_patterns(3, tickers=self.tickers, incremental=True)
+        self.assertEqual(stats['written'], 0)
+        self.assertIsNone(stats['first_date'])
+
+
+class PatternCodeTests(SimpleTestCase):
+    """形态字符串的三进制编码"""
+
+    def test_known_codes(self):
+        self.assertEqual(encode_pattern('111'), 0)
+        self.assertEqual(encode_pattern('333'), 26)
+        self.assertEqual(encode_pattern('332'), 25)
+        self.assertEqual(decode_pattern(25, 3), '332')
+
+    def test_round_trip(self):
+        for days in (3, 5):
+            patterns = [''.join(p) for p in itertools.product('123', repeat=days)]
+            codes = [encode_pattern(p) for p in patterns]
+            self.assertEqual(codes, list(range(3 ** days)))
+            self.assertEqual([decode_pattern(code, days) for code in codes], patterns)
+            self.assertEqual(encode_patterns(np.array(patterns), days).tolist(), codes)
+
+    def test_is_valid_pattern(self):
+        self.assertTrue(is_valid_pattern('3312', 4))
+        self.assertFalse(is_valid_pattern('334', 3))
+        self.assertFalse(is_valid_pattern('33', 3))
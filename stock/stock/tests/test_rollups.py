@@ -0,0 +1,81 @@
+from datetime import date
+
+from django.test import TestCase
+
+from stock.models import StockHistoryWeekly
+from stock.rollups import (
+    build_rollups, get_nday_bars, get_rollup_bars, nday_bars, period_bars, period_end, period_starts, serialize_bars
+)
+from stock.series import date_strings, load_price_series
+
+from .base import StockHistoryMixin, make_history
+
+
+class RollupTests(StockHistoryMixin, TestCase):
+    tickers = ['600000', '600519']
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history(self.tickers, count=90)
+        self.series = load_price_series(['600000'])['600000']
+
+    def reference_period(self, period, start_date, end_date):
+        """由完整历史聚合，保留开始日期在 start_date 所在周期到 end_date 之间的周期"""
+        bars = serialize_bars(period_bars(self.series.dates, self.series.columns, period))
+        first = date_strings(period_starts([start_date], period))[0]
+        return [bar for bar in bars if first <= bar['trade_date'] <= end_date.strftime('%Y-%m-%d')]
+
+    def reference_nday(self, n, start_date, end_date):
+        bars = serialize_bars(nday_bars(self.series.dates, self.series.columns, n))
+        return [bar for bar in bars
+                if start_date.strftime('%Y-%m-%d') <= bar['trade_date'] <= end_date.strftime('%Y-%m-%d')]
+
+    def assertBarsEqual(self, bars, expected):
+        self.assertEqual([bar['trade_date'] for bar in bars], [bar['trade_date'] for bar in expected])
+        for bar, reference in zip(bars, expected):
+            for field, value in reference.items():
+                if field != 'trade_date':
+                    self.assertAlmostEqual(bar[field], value, places=4, msg=(bar['trade_date'], field))
+
+    def check_periods(self):
+        ranges = [(self.days[0], self.days[-1]), (self.days[7], self.days[40]), (self.days[33], self.days[33])]
+        for period in ('weekly', 'monthly'):
+            for start_date, end_date in ranges:
+                self.assertBarsEqual(get_rollup_bars('600000', period, start_date, end_date),
+                                     self.reference_period(period, start_date, end_date))
+
+    def test_live_only(self):
+        self.check_periods()
+
+    def test_materialized(self):
+        self.assertGreater(build_rollups('weekly'), 0)
+        build_rollups('monthly')
+        self.check_periods()
+
+    def test_materialized_prefix(self):
+        build_rollups('weekly')
+        build_rollups('monthly')
+        # 只物化了前半段，后半段实时聚合
+        StockHistoryWeekly.objects.filter(trade_date__gt=self.days[30]).delete()
+        self.check_periods()
+
+    def test_incremental_build(self):
+        build_rollups('weekly')
+        make_history(['300750'], count=10, start=self.days[-1], seed=5)
+        build_rollups('weekly', tickers=['300750'], incremental=True)
+        expected = serialize_bars(period_bars(
+            *load_price_series(['300750'])['300750'].window(), 'weekly'
+        ))
+        self.assertEqual(StockHistoryWeekly.objects.filter(ticker='300750').count(), len(expected))
+
+    def test_nday_bars(self):
+        for n in (2, 3, 5):
+            for start, end in ((0, 89), (1, 50), (7, 8), (44, 89), (88, 89)):
+                start_date, end_date = self.days[start], self.days[end]
+                self.assertBarsEqual(get_nday_bars('600000', n, start_date, end_date),
+                                     self.reference_nday(n, start_date, end_date))
+
+    def test_period_end(self):
+        self.assertEqual(period_end(date(2024, 1, 3), 'weekly'), date(2024, 1, 7))
+        self.assertEqual(period_end(date(2024, 2, 10), 'monthly'), date(2024, 2, 29))
+        self.assertEqual(period_end(date(2024, 12, 31), 'monthly'), date(2024, 12, 31))
@@ -0,0 +1,74 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from stock.models import StockHistory, StockTicker
+from stock.universe import get_ticker_info, refresh_tickers, refresh_tickers_since, ticker_universe
+
+from .base import StockHistoryMixin, make_history
+
+
+class TickerUniverseTests(StockHistoryMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history(['000001', '600000', '600519'], count=10)
+
+    def test_empty_registry_is_initialized(self):
+        self.assertFalse(StockTicker.objects.exists())
+        self.assertEqual(ticker_universe.tickers(), ['000001', '600000', '600519'])
+        info = get_ticker_info(['600000'])['600000']
+        self.assertEqual(info, {'first_trade_date': self.days[0], 'last_trade_date': self.days[-1], 'row_count': 10})
+        self.assertEqual(ticker_universe.search('600'), ['600000', '600519'])
+
+    def test_reads_only_the_registry(self):
+        ticker_universe.tickers()
+        make_history(['300750'], count=5, start=self.days[-1], seed=3)
+        ticker_universe.invalidate()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertNotIn('300750', ticker_universe.tickers())
+        self.assertFalse(any('stock_history' in query['sql'] for query in queries.captured_queries))
+
+        etag = ticker_universe.etag()
+        self.assertEqual(refresh_tickers_since(self.days[-1]), 4)
+        self.assertIn('300750', ticker_universe.tickers())
+        self.assertNotEqual(ticker_universe.etag(), etag)
+
+    def test_delisting_with_new_listing(self):
+        ticker_universe.tickers()
+        etag = ticker_universe.etag()
+        StockHistory.objects.filter(ticker='600519').delete()
+        make_history(['688001'], count=10, seed=4)
+        refresh_tickers()
+        self.assertEqual(ticker_universe.tickers(), ['000001', '600000', '688001'])
+        self.assertNotEqual(ticker_universe.etag(), etag)
+
+    def test_orm_save_refreshes_ticker(self):
+        ticker_universe.tickers()
+        with self.captureOnCommitCallbacks(execute=True):
+            StockHistory.objects.create(
+                ticker='300750', trade_date=self.days[0], open_price=1, high_price=1, low_price=1,
+                close_price=1, volume=1
+            )
+        self.assertIn('300750', ticker_universe.tickers())
+
+    def test_refresh_command(self):
+        make_history(['300750'], count=3, start=self.days[-1], seed=3)
+        call_command('refresh_tickers', since=self.days[-1].strftime('%Y-%m-%d'), stdout=StringIO())
+        self.assertEqual(sorted(StockTicker.objects.values_list('ticker', flat=True)),
+                         ['000001', '300750', '600000', '600519'])
+        with self.assertRaises(CommandError):
+            call_command('refresh_tickers', since='2024/01/01')
+
+    def test_stock_list_etag(self):
+        response = self.client.get('/api/stocks/list')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/stocks/list', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        make_history(['300750'], count=3, start=self.days[-1], seed=3)
+        refresh_tickers(['300750'])
+        self.assertEqual(self.client.get('/api/stocks/list', HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from stock.wavedata import WavedataFile, write_wavedata_binary
+
+
+class WavedataBinaryTests(SimpleTestCase):
+    """二进制波浪数据写入后读出与原数据一致"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, '2024-01-02.wvd')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ticker_lists(self):
+        data = {'333': ['600000', '000001'], '12': ['300750'], '2': []}
+        write_wavedata_binary(data, self.path)
+        wavedata = WavedataFile(self.path)
+        self.assertEqual(wavedata.to_dict(), data)
+        self.assertEqual(wavedata.counts(), {'333': 2, '12': 1, '2': 0})
+        self.assertEqual(wavedata.items('999'), [])
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+
+    def test_ticker_objects(self):
+        data = {
+            '333': [{'ticker': '600000', 'change_price_delta': 1.5}, {'ticker': '000001'}],
+            '222': [{'ticker': '688001', 'change_price_delta': -0.25}],
+        }
+        write_wavedata_binary(data, self.path)
+        self.assertEqual(WavedataFile(self.path).to_dict(), data)
+
+    def test_unsupported_fields(self):
+        with self.assertRaises(ValueError):
+            write_wavedata_binary({'333': [{'ticker': '600000', 'name': 'x'}]}, self.path)
+        self.assertFalse(os.path.exists(self.path))
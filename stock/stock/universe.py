@@ -0,0 +1,172 @@
+"""
+股票代码登记表
+
+stock_ticker 保存每只股票的首末交易日和行数；ticker_universe 把代码列表缓存在内存中，
+用于股票列表、前缀搜索和批量任务，不再对 stock_history 做 SELECT DISTINCT 全表扫描。
+
+登记表由写入 stock_history 的一方维护：通过 ORM 保存/删除日线时自动刷新对应股票；
+在 ORM 之外导入数据后调用 refresh_tickers / refresh_tickers_since，或运行
+manage.py refresh_tickers --since 导入的最早日期。ticker_universe 只读取登记表，
+按登记表的行数和 MAX(updated_at) 判断是否需要重新加载，不再扫描 stock_history。
+"""
+import hashlib
+import threading
+import time
+from bisect import bisect_left
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+
+from .models import StockHistory, StockTicker
+
+
+# 内存中的代码列表超过该时间（秒）后访问时检查登记表是否有变化
+UNIVERSE_CHECK_INTERVAL = 30
+
+# 前缀搜索默认返回的最大数量
+UNIVERSE_SEARCH_LIMIT = 20
+
+
+def refresh_tickers(tickers=None):
+    """
+    从 stock_history 重新统计股票的首末交易日和行数并写入登记表
+
+    Args:
+        tickers: 只刷新指定股票（走 (ticker, trade_date) 索引），默认全部；
+                 全部刷新时删除 stock_history 中已不存在的股票
+
+    Returns:
+        写入的股票数量
+    """
+    queryset = StockHistory.objects.all()
+    if tickers is not None:
+        queryset = queryset.filter(ticker__in=tickers)
+    stats = queryset.order_by().values('ticker').annotate(
+        first=Min('trade_date'), last=Max('trade_date'), rows=Count('trade_date')
+    )
+    rows = [
+        StockTicker(ticker=row['ticker'], first_trade_date=row['first'],
+                    last_trade_date=row['last'], row_count=row['rows'])
+        for row in stats
+    ]
+
+    options = {
+        'update_conflicts': True,
+        'update_fields': ['first_trade_date', 'last_trade_date', 'row_count', 'updated_at'],
+    }
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不支持指定冲突字段
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['ticker']
+
+    present = {row.ticker for row in rows}
+    with transaction.atomic():
+        if rows:
+            StockTicker.objects.bulk_create(rows, **options)
+        stale = StockTicker.objects.exclude(ticker__in=present)
+        if tickers is not None:
+            stale = stale.filter(ticker__in=tickers)
+        stale.delete()
+    ticker_universe.invalidate()
+    return len(rows)
+
+
+def refresh_tickers_since(since):
+    """
+    刷新 since（含）之后有日线的股票，供导入程序在写入一批交易日后调用
+
+    Returns:
+        写入的股票数量
+    """
+    tickers = StockHistory.objects.filter(trade_date__gte=since).order_by().values_list(
+        'ticker', flat=True
+    ).distinct()
+    return refresh_tickers(list(tickers))
+
+
+class TickerUniverse:
+    """
+    内存中的股票代码列表
+
+    只读取登记表：超过 check_interval 秒后访问时用登记表的 COUNT/MAX(updated_at)
+    判断是否需要重新加载，ETag 也由这两个值生成。登记表为空时（尚未初始化）
+    从 stock_history 完整刷新一次。
+    """
+
+    def __init__(self, check_interval=UNIVERSE_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        # 初始化登记表时 refresh_tickers 会再调用 invalidate
+        self._lock = threading.RLock()
+        self._tickers = None
+        self._version = None
+        self._etag = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _current_version():
+        state = StockTicker.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        return state['count'], state['updated']
+
+    def _load(self):
+        now = time.time()
+        if self._tickers is not None and now - self._checked_at < self.check_interval:
+            return
+        version = self._current_version()
+        if version[0] == 0:
+            refresh_tickers()
+            version = self._current_version()
+        if self._tickers is None or version != self._version:
+            self._tickers = list(StockTicker.objects.order_by('ticker').values_list('ticker', flat=True))
+            self._version = version
+            self._etag = hashlib.md5(f'{version[0]}:{version[1]}'.encode()).hexdigest()
+        self._checked_at = now
+
+    def tickers(self):
+        """全部股票代码（升序）"""
+        with self._lock:
+            self._load()
+            return self._tickers
+
+    def etag(self):
+        """登记表版本（行数和 MAX(updated_at)）的摘要，用于 HTTP ETag"""
+        with self._lock:
+            self._load()
+            return self._etag
+
+    def search(self, prefix, limit=UNIVERSE_SEARCH_LIMIT):
+        """按前缀查找股票代码，返回至多 limit 个"""
+        tickers = self.tickers()
+        start = bisect_left(tickers, prefix)
+        matches = []
+        for ticker in tickers[start:start + limit]:
+            if not ticker.startswith(prefix):
+                break
+            matches.append(ticker)
+        return matches
+
+    def invalidate(self):
+        """丢弃内存中的代码列表，下次访问时重新读取登记表"""
+        with self._lock:
+            self._tickers = None
+            self._version = None
+
+
+ticker_universe = TickerUniverse()
+
+
+def get_ticker_info(tickers=None):
+    """读取登记表，返回 {ticker: {'first_trade_date', 'last_trade_date', 'row_count'}}"""
+    queryset = StockTicker.objects.all()
+    if tickers is not None:
+        queryset = queryset.filter(ticker__in=tickers)
+    return {
+        ticker: {'first_trade_date': first, 'last_trade_date': last, 'row_count': rows}
+        for ticker, first, last, rows in queryset.values_list(
+            'ticker', 'first_trade_date', 'last_trade_date', 'row_count'
+        )
+    }
+
+
+def refresh_ticker_registry(sender, instance, **kwargs):
+    """StockHistory 保存/删除后，在事务提交时刷新该股票的登记信息"""
+    transaction.on_commit(partial(refresh_tickers, [instance.ticker]))
@@ -14,6 +14,7 @@ urlpatterns = [
     # 波浪数据相关URL - 从JSON文件读取
     path('api/pattern-tickers/<str:pattern_type>/', views.get_pattern_tickers, name='pattern_tickers'),
     path('api/available-dates/', views.get_available_dates, name='available_dates'),
+    path('api/wavedata-cache-stats/', views.get_wavedata_cache_stats, name='wavedata_cache_stats'),
 
     # 形态图表相关URL
     path('chart/<str:pattern_type>/', views.pattern_chart_page, name='pattern_chart_page'),
@@ -24,4 +25,5 @@ urlpatterns = [
     path('api/stock-price-data/<str:ticker>/', views.get_stock_price_data, name='stock_price_data'),
     path('api/custom-chart-data/', views.get_custom_chart_data, name='custom_chart_data'),
     path('api/run-custom-code/', views.run_custom_code, name='run_custom_code'),
+    path('api/run-custom-code/batch/', views.run_custom_code_batch, name='run_custom_code_batch'),
 ]
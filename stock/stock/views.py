@@ -1,16 +1,33 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.db.models import Count, F, Case, When, Value
 from django.views.decorators.csrf import csrf_exempt
 from decimal import Decimal
 from datetime import datetime
-import os
+from itertools import islice
 import json
-import traceback
-from contextlib import redirect_stdout
-import io
-from .models import StockHistory, StockTrendPattern, WAVEDATA_DIR, load_wavedata
-from django.db import transaction
+import math
+from .models import StockTrendPattern
+from .series import date_strings, pct_changes, series_store, to_json_list, trend_colors
+from .payload import COLUMN_DTYPE, encode_base64_columns, pack_columns
+from .downsample import downsample_ohlc, lttb_indices
+from .universe import ticker_universe
+from .executor import EXECUTOR_BATCH_MAX_TICKERS, EXECUTOR_TIMEOUT, ExecutorBusy, run_batch, run_code
+from .wavedata import load_wavedata_pattern, load_wavedata_summary, wavedata_cache, wavedata_dates
+from .patterns import SUPPORTED_DAYS, generate_patterns, is_valid_pattern
+from .pattern_index import (
+    format_pattern_cursor, get_index_status, get_pattern_type_counts, has_pattern_index, index_rebuilder,
+    iter_pattern_matches, iter_with_details, parse_pattern_cursor
+)
+
+
+# get_patterns_by_type 每页默认/最大记录数
+PATTERN_PAGE_SIZE = 1000
+MAX_PATTERN_PAGE_SIZE = 10000
+
+# get_stock_price_data 默认/最多返回的交易日数
+PRICE_DATA_DAYS = 1000
+MAX_PRICE_DATA_DAYS = 5000
 
 
 def analyze_trend_pattern(close_prices):
@@ -30,112 +47,132 @@ def analyze_trend_pattern(close_prices):
 
 
 def generate_trend_patterns(request, days):
-    """生成指定天数的涨跌形态数据"""
-    if days not in [3, 5]:
+    """
+    生成指定天数的涨跌形态数据
+
+    参数 mode=incremental 时只处理每只股票最新形态日期之后的新交易日；
+    参数 storage=compact 时不保存形态详情，只保存三进制编码。
+    位图索引在后台线程中重建，需要同步完成时使用 manage.py build_patterns；
+    重建完成前新日期从表中读取，index 字段返回索引状态（含上一次重建的错误）
+    """
+    if days not in SUPPORTED_DAYS:
         return JsonResponse({'error': '只支持3天或5天的统计'}, status=400)
 
-    # 获取所有股票
-    tickers = StockHistory.objects.values('ticker').distinct()
-
-    created_count = 0
-    updated_count = 0
-
-    with transaction.atomic():
-        for ticker_dict in tickers:
-            ticker = ticker_dict['ticker']
-
-            # 获取该股票最近的交易数据，按日期升序排列
-            history = StockHistory.objects.filter(
-                ticker=ticker
-            ).order_by('trade_date')
-
-            # 滑动窗口分析
-            data_list = list(history)
-            for i in range(len(data_list) - days):
-                window = data_list[i:i + days + 1]  # 需要days+1天数据来计算days天的涨跌
-                close_prices = [float(d.close_price) for d in window]
-
-                pattern = analyze_trend_pattern(close_prices[:days + 1])
-
-                # 构造详情
-                detail = []
-                for j in range(days):
-                    diff = close_prices[j + 1] - close_prices[j]
-                    trend_type = "涨" if diff > 0 else ("平" if diff == 0 else "跌")
-                    detail.append({
-                        'day': j + 1,
-                        'close': close_prices[j],
-                        'next_close': close_prices[j + 1],
-                        'diff': float(diff),
-                        'trend': trend_type,
-                        'code': pattern[j]
-                    })
-
-                # 创建或更新记录
-                pattern_date = window[days].trade_date
-                obj, created = StockTrendPattern.objects.update_or_create(
-                    ticker=ticker,
-                    pattern_date=pattern_date,
-                    days=days,
-                    defaults={
-                        'pattern_type': pattern,
-                        'pattern_detail': detail
-                    }
-                )
+    mode = request.GET.get('mode', 'full')
+    if mode not in ('full', 'incremental'):
+        return JsonResponse({'error': 'mode 只支持 full 或 incremental'}, status=400)
 
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
+    storage = request.GET.get('storage', 'full')
+    if storage not in ('full', 'compact'):
+        return JsonResponse({'error': 'storage 只支持 full 或 compact'}, status=400)
+
+    stats = generate_patterns(days, incremental=(mode == 'incremental'), compact=(storage == 'compact'))
+
+    # 只重建本次写入涉及的日期，在后台完成，不阻塞请求
+    if stats['written']:
+        index_rebuilder.schedule(days, since=stats['first_date'])
 
     return JsonResponse({
         'success': True,
         'message': f'成功生成{days}天涨跌形态数据',
-        'created': created_count,
-        'updated': updated_count
+        'mode': mode,
+        'storage': storage,
+        'created': stats['created'],
+        'updated': stats['updated'],
+        'index_rebuild': 'scheduled' if stats['written'] else 'skipped',
+        'index': get_index_status(days)
     })
 
 
+def _pattern_item(ticker, pattern_date, detail, pattern_type, with_detail):
+    """构造单条形态记录"""
+    item = {
+        'ticker': ticker,
+        'pattern_type': pattern_type,
+        'pattern_date': pattern_date.strftime('%Y-%m-%d')
+    }
+    if with_detail:
+        item['detail'] = detail
+    return item
+
+
 def get_patterns_by_type(request, days, pattern_type):
-    """获取指定形态的所有股票"""
-    patterns = StockTrendPattern.objects.filter(
-        days=days,
-        pattern_type=pattern_type
-    ).select_related().order_by('-pattern_date')
-
-    data = []
-    for p in patterns:
-        data.append({
-            'ticker': p.ticker,
-            'pattern_type': p.pattern_type,
-            'pattern_date': p.pattern_date.strftime('%Y-%m-%d'),
-            'detail': p.pattern_detail
-        })
+    """
+    获取指定形态的股票，按 (pattern_date 倒序, ticker 升序) 游标分页
+
+    参数:
+        cursor: 上一页返回的 next_cursor
+        limit: 每页数量，默认 1000，最大 10000
+        detail: 默认附带每日涨跌详情（未保存的详情按需从历史数据推导），为 0 时不返回详情
+        format: 为 ndjson 时以流式 NDJSON 返回全部（cursor 之后的）记录，忽略 limit
+    """
+    if not is_valid_pattern(pattern_type, days):
+        return JsonResponse({'error': f'形态类型应为{days}位的1/2/3组合'}, status=400)
+
+    try:
+        after = parse_pattern_cursor(request.GET.get('cursor'))
+        limit = int(request.GET.get('limit', PATTERN_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'cursor 或 limit 参数格式错误'}, status=400)
+    limit = max(1, min(limit, MAX_PATTERN_PAGE_SIZE))
+
+    with_detail = request.GET.get('detail') != '0'
+    ndjson = request.GET.get('format') == 'ndjson'
+    matches = iter_pattern_matches(
+        days, pattern_type, after=after, with_detail=with_detail, limit=None if ndjson else limit + 1
+    )
+    if with_detail:
+        matches = iter_with_details(days, matches)
+
+    if ndjson:
+        def stream():
+            while True:
+                batch = list(islice(matches, 500))
+                if not batch:
+                    return
+                yield ''.join(
+                    json.dumps(_pattern_item(*row, pattern_type, with_detail), ensure_ascii=False) + '\n'
+                    for row in batch
+                )
+
+        return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+    rows = list(islice(matches, limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    data = [_pattern_item(*row, pattern_type, with_detail) for row in rows]
 
     return JsonResponse({
         'success': True,
         'days': days,
         'pattern_type': pattern_type,
         'count': len(data),
-        'data': data
+        'data': data,
+        'has_more': has_more,
+        'next_cursor': format_pattern_cursor(rows[-1][0], rows[-1][1]) if has_more else None,
+        'index': get_index_status(days)
     })
 
 
 def get_all_pattern_types(request, days):
-    """获取所有形态类型及其统计"""
-    if days not in [3, 5]:
+    """获取所有形态类型及其统计，优先从位图索引读取"""
+    if days not in SUPPORTED_DAYS:
         return JsonResponse({'error': '只支持3天或5天的统计'}, status=400)
 
-    patterns = StockTrendPattern.objects.filter(days=days).values(
-        'pattern_type'
-    ).annotate(
-        count=Count('id')
-    ).order_by('-count')
+    if has_pattern_index(days):
+        patterns = get_pattern_type_counts(days)
+    else:
+        patterns = list(StockTrendPattern.objects.filter(days=days).values(
+            'pattern_type'
+        ).annotate(
+            count=Count('id')
+        ).order_by('-count'))
 
     return JsonResponse({
         'success': True,
         'days': days,
-        'patterns': list(patterns)
+        'patterns': patterns,
+        'index': get_index_status(days)
     })
 
 
@@ -145,42 +182,22 @@ def trend_pattern_visualization(request):
 
 
 def trend_pattern_data(request):
-    """获取可视化页面数据 - 从JSON文件读取"""
+    """获取可视化页面数据 - 读取预先生成的形态汇总"""
     date_str = request.GET.get('date')
 
-    # 从JSON文件加载波浪数据
-    wavedata = load_wavedata(date_str)
+    summary = load_wavedata_summary(date_str)
 
-    if not wavedata:
+    if not summary or not summary['patterns']:
         return JsonResponse({
             'success': False,
             'error': '未找到波浪数据文件'
         })
 
-    # 转换为前端需要的格式
-    pattern_data = []
-    for pattern_type, tickers in wavedata.items():
-        # 统计涨跌平数量
-        up_count = pattern_type.count('3')
-        down_count = pattern_type.count('2')
-        flat_count = pattern_type.count('1')
-
-        pattern_data.append({
-            'pattern_type': pattern_type,
-            'count': len(tickers),
-            'up_count': up_count,
-            'down_count': down_count,
-            'flat_count': flat_count
-        })
-
-    # 按数量排序
-    pattern_data.sort(key=lambda x: x['count'], reverse=True)
-
     return JsonResponse({
         'success': True,
         'date': date_str or datetime.now().strftime('%Y-%m-%d'),
-        'patterns': pattern_data,
-        'total_stocks': sum(len(v) for v in wavedata.values())
+        'patterns': summary['patterns'],
+        'total_stocks': summary['total_stocks']
     })
 
 
@@ -188,16 +205,14 @@ def get_pattern_tickers(request, pattern_type):
     """获取指定形态的股票代码列表"""
     date_str = request.GET.get('date')
 
-    wavedata = load_wavedata(date_str)
+    tickers = load_wavedata_pattern(date_str, pattern_type)
 
-    if not wavedata:
+    if tickers is None:
         return JsonResponse({
             'success': False,
             'error': '未找到波浪数据文件'
         })
 
-    tickers = wavedata.get(pattern_type, [])
-
     return JsonResponse({
         'success': True,
         'pattern_type': pattern_type,
@@ -208,16 +223,18 @@ def get_pattern_tickers(request, pattern_type):
 
 
 def get_available_dates(request):
-    """获取可用的波浪数据日期列表"""
+    """
+    获取可用的波浪数据日期列表
+
+    参数 from/to（YYYY-MM-DD）限定日期范围，latest 始终为全部日期中的最新日期
+    """
     try:
-        files = os.listdir(WAVEDATA_DIR)
-        # 提取日期部分 (YYYY-MM-DD.json)
-        dates = sorted([f.replace('.json', '') for f in files if f.endswith('.json')])
+        dates = wavedata_dates.dates(request.GET.get('from'), request.GET.get('to'))
 
         return JsonResponse({
             'success': True,
             'dates': dates,
-            'latest': dates[-1] if dates else None
+            'latest': wavedata_dates.latest()
         })
     except Exception as e:
         return JsonResponse({
@@ -226,6 +243,30 @@ def get_available_dates(request):
         })
 
 
+def get_wavedata_cache_stats(request):
+    """获取波浪数据缓存的命中统计"""
+    return JsonResponse({
+        'success': True,
+        'stats': wavedata_cache.stats()
+    })
+
+
+def _parse_date(value):
+    """解析 YYYY-MM-DD 日期参数，为空时返回 None"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _parse_max_points(request):
+    """解析降采样参数 max_points，未指定或不大于 0 时返回 None"""
+    value = request.GET.get('max_points')
+    if not value:
+        return None
+    max_points = int(value)
+    return max_points if max_points > 0 else None
+
+
 def pattern_chart_page(request, pattern_type):
     """形态图表页面"""
     date_str = request.GET.get('date', datetime.now().strftime('%Y-%m-%d'))
@@ -237,18 +278,31 @@ def pattern_chart_page(request, pattern_type):
 
 
 def get_pattern_chart_data(request, pattern_type):
-    """获取指定形态的股票收盘价数据"""
+    """
+    获取指定形态的股票收盘价数据
+
+    参数 start/end（YYYY-MM-DD）限定价格数据的日期范围，默认全部历史；
+    参数 max_points 时每只股票用 LTTB 降采样到至多 max_points 个点
+    """
     date_str = request.GET.get('date')
-    wavedata = load_wavedata(date_str)
+    try:
+        start = _parse_date(request.GET.get('start'))
+        end = _parse_date(request.GET.get('end'))
+        max_points = _parse_max_points(request)
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': '日期格式应为 YYYY-MM-DD，max_points 应为整数'
+        }, status=400)
 
-    if not wavedata:
+    tickers_data = load_wavedata_pattern(date_str, pattern_type)
+
+    if tickers_data is None:
         return JsonResponse({
             'success': False,
             'error': '未找到波浪数据文件'
         })
 
-    tickers_data = wavedata.get(pattern_type, [])
-
     # 从对象数组中提取股票代码列表
     tickers = [item['ticker'] for item in tickers_data]
 
@@ -256,21 +310,15 @@ def get_pattern_chart_data(request, pattern_type):
     max_tickers = 50
     selected_tickers = tickers[:max_tickers]
 
-    # 获取每个股票的收盘价数据
+    # 从序列缓存读取所有选中股票的收盘价，未缓存的股票合并为一次查询
     chart_data = {}
-
-    for ticker in selected_tickers:
-        history = StockHistory.objects.filter(
-            ticker=ticker
-        ).order_by('trade_date')
-
-        dates = [h.trade_date.strftime('%Y-%m-%d') for h in history]
-        closes = [float(h.close_price) for h in history]
-
-        chart_data[ticker] = {
-            'dates': dates,
-            'closes': closes
-        }
+    for ticker, series in series_store.get_many(selected_tickers).items():
+        dates, columns = series.window(start=start, end=end)
+        closes = columns['close']
+        if max_points:
+            selected = lttb_indices(closes, max_points)
+            dates, closes = dates[selected], closes[selected]
+        chart_data[ticker] = {'dates': date_strings(dates), 'closes': to_json_list(closes)}
 
     return JsonResponse({
         'success': True,
@@ -288,68 +336,73 @@ def strategy_watch_page(request):
 
 
 def get_stock_price_data(request, ticker):
-    """获取指定股票的价格数据（用于策略观察）"""
+    """
+    获取指定股票的价格数据（用于策略观察）
+
+    参数:
+        days: 返回截至 end 的最近多少个交易日，默认 1000，最大 5000
+        end: 截止日期（YYYY-MM-DD），默认最新
+        max_points: 把 K 线按桶聚合到至多 max_points 根
+        format: json（默认）、base64 或 binary。紧凑格式下数值列为小端 float32，
+                缺失值为 NaN，不返回 colors（可由 changes 的符号得到）
+    """
     try:
-        # 获取该股票最近的交易数据
-        history = StockHistory.objects.filter(
-            ticker=ticker
-        ).order_by('trade_date')[:1000]  # 最多返回1000天数据
+        # 获取该股票截至 end 的最近 days 个交易日
+        days = min(max(int(request.GET.get('days', PRICE_DATA_DAYS)), 1), MAX_PRICE_DATA_DAYS)
+        end = _parse_date(request.GET.get('end'))
+        dates, columns = series_store.get(ticker).window(end=end, limit=days)
 
-        if not history.exists():
+        if not len(dates):
             return JsonResponse({
                 'success': False,
                 'error': f'未找到股票 {ticker} 的数据'
             })
 
-        data_list = list(history)
-
-        # 构建返回数据
-        dates = [h.trade_date.strftime('%Y-%m-%d') for h in data_list]
-        opens = [float(h.open_price) for h in data_list]
-        highs = [float(h.high_price) for h in data_list]
-        lows = [float(h.low_price) for h in data_list]
-        closes = [float(h.close_price) for h in data_list]
-        volumes = [float(h.volume) for h in data_list]
-
-        # 获取 MA 数据
-        ma1 = [float(h.ma_1) if h.ma_1 is not None else None for h in data_list]
-        ma2 = [float(h.ma_2) if h.ma_2 is not None else None for h in data_list]
-        ma3 = [float(h.ma_3) if h.ma_3 is not None else None for h in data_list]
-
-        # 计算涨跌颜色（根据收盘价）
-        colors = []
-        for i in range(1, len(closes)):
-            if closes[i] > closes[i-1]:
-                colors.append('#ef232a')  # 涨 - 红色
-            elif closes[i] < closes[i-1]:
-                colors.append('#14b143')  # 跌 - 绿色
-            else:
-                colors.append('#909399')  # 平 - 灰色
-
-        # 第一天没有涨跌比较，用灰色
-        colors.insert(0, '#909399')
-
-        # 计算涨跌幅（百分比）
-        changes = [None]  # 第一天没有涨跌幅
-        for i in range(1, len(closes)):
-            change = ((closes[i] - closes[i-1]) / closes[i-1]) * 100
-            changes.append(change)
+        # 可选降采样：K 线按桶聚合，保留每个桶的最高/最低价，均线取桶内最后一天
+        max_points = _parse_max_points(request)
+        if max_points:
+            ends, bars = downsample_ohlc(
+                columns['open'], columns['high'], columns['low'], columns['close'], columns['volume'], max_points
+            )
+            dates = dates[ends]
+            columns = {**bars, 'ma1': columns['ma1'][ends], 'ma2': columns['ma2'][ends], 'ma3': columns['ma3'][ends]}
+
+        date_strs = date_strings(dates)
+        changes = pct_changes(columns['close'])
+        numeric = {**columns, 'changes': changes}
+
+        fmt = request.GET.get('format', 'json')
+        if fmt == 'binary':
+            return HttpResponse(
+                pack_columns({'ticker': ticker, 'dates': date_strs}, numeric),
+                content_type='application/octet-stream'
+            )
+        if fmt == 'base64':
+            return JsonResponse({
+                'success': True,
+                'ticker': ticker,
+                'format': 'base64',
+                'dtype': COLUMN_DTYPE,
+                'count': len(date_strs),
+                'dates': date_strs,
+                'columns': encode_base64_columns(numeric)
+            })
 
         return JsonResponse({
             'success': True,
             'ticker': ticker,
             'data': {
-                'dates': dates,
-                'open': opens,
-                'high': highs,
-                'low': lows,
-                'close': closes,
-                'volume': volumes,
-                'colors': colors,
-                'ma1': ma1,
-                'ma2': ma2,
-                'ma3': ma3,
-                'changes': changes
+                'dates': date_strs,
+                'open': columns['open'].tolist(),
+                'high': columns['high'].tolist(),
+                'low': columns['low'].tolist(),
+                'close': columns['close'].tolist(),
+                'volume': columns['volume'].tolist(),
+                'colors': trend_colors(columns['close']).tolist(),
+                'ma1': to_json_list(columns['ma1']),
+                'ma2': to_json_list(columns['ma2']),
+                'ma3': to_json_list(columns['ma3']),
+                'changes': to_json_list(changes)
             }
         })
 
@@ -360,7 +413,6 @@ def get_stock_price_data(request, ticker):
         })
 
 
-
 @csrf_exempt
 def get_custom_chart_data(request):
     """接收自定义处理后的曲线数据"""
@@ -395,7 +447,11 @@ def get_custom_chart_data(request):
 
 @csrf_exempt
 def run_custom_code(request):
-    """执行用户自定义的 Python 代码"""
+    """
+    执行用户自定义的 Python 代码
+
+    代码在预启动的工作进程中执行，受墙钟超时、CPU 时间和内存限制
+    """
     if request.method != 'POST':
         return JsonResponse({
             'success': False,
@@ -419,90 +475,98 @@ def run_custom_code(request):
                 'error': '股票代码不能为空'
             })
 
-        # 构建执行环境
-        stdout_capture = io.StringIO()
-
-        # 准备命名空间
-        namespace = {
-            '__name__': '__main__',
-            '__builtins__': {
-                '__import__': __import__,
-                'print': lambda *args: stdout_capture.write(' '.join(str(a) for a in args) + '\\n'),
-                'len': len,
-                'sum': sum,
-                'max': max,
-                'min': min,
-                'abs': abs,
-                'round': round,
-                'float': float,
-                'int': int,
-                'list': list,
-                'range': range,
-                'enumerate': enumerate,
-                'sorted': sorted,
-                'zip': zip,
-                'None': None,
-                'True': True,
-                'False': False,
-                'str': str,
-                'bool': bool,
-            }
-        }
-
-        # 将股票代码和模型导入命名空间
-        namespace['ticker'] = ticker
-        namespace['StockHistory'] = StockHistory
-
-        try:
-            # 执行用户代码
-            with redirect_stdout(stdout_capture):
-                exec(code, namespace)
-
-            # 获取输出
-            output = stdout_capture.getvalue()
-
-            # 尝试从命名空间获取结果
-            chart_data = namespace.get('chart_data')
-
-            if chart_data is None:
-                return JsonResponse({
-                    'success': False,
-                    'error': '代码执行后未定义 chart_data 变量。请在代码末尾定义 chart_data 字典，格式为 {"dates": [...], "series": [...]}',
-                    'output': output
-                })
-
-            # 验证数据格式
-            if 'dates' not in chart_data:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'chart_data 缺少 dates 字段',
-                    'output': output
-                })
-
-            if 'series' not in chart_data:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'chart_data 缺少 series 字段',
-                    'output': output
-                })
-
-            return JsonResponse({
-                'success': True,
-                'data': chart_data,
-                'output': output
-            })
+        # 工作进程已编码为 JSON，直接返回字节串
+        return HttpResponse(run_code(code, ticker), content_type='application/json')
 
-        except Exception as e:
-            error_trace = traceback.format_exc()
-            return JsonResponse({
-                'success': False,
-                'error': str(e),
-                'traceback': error_trace,
-                'output': stdout_capture.getvalue()
-            })
+    except ExecutorBusy as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=503)
 
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': str(e)
         })
+
+
+def _batch_stream(items, fmt):
+    """把批量执行结果编码为 NDJSON 行或 SSE 事件"""
+    for item in items:
+        line = json.dumps(item, ensure_ascii=False)
+        if fmt == 'sse':
+            yield f"event: {item['type']}\ndata: {line}\n\n"
+        else:
+            yield line + '\n'
+
+
+@csrf_exempt
+def run_custom_code_batch(request):
+    """
+    对多只股票批量执行用户自定义代码，流式返回每只股票的结果
+
+    POST JSON:
+        code: 用户代码
+        tickers: 股票代码列表，或 "all" 表示全部股票
+        format: ndjson（默认）或 sse
+        timeout: 单只股票的超时（秒），大于 0 且不超过 EXECUTOR_TIMEOUT，默认 EXECUTOR_TIMEOUT
+        include_data: JSON 布尔值，为 false 时不返回 chart_data，只返回成功与否和输出
+
+    每只股票一行（SSE 为 result 事件），最后一行（summary 事件）为汇总
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'error': '只支持 POST 请求'
+        })
+
+    try:
+        data = json.loads(request.body)
+        code = data.get('code', '')
+        tickers = data.get('tickers') or []
+        fmt = data.get('format', 'ndjson')
+        timeout = data.get('timeout')
+        timeout = EXECUTOR_TIMEOUT if timeout is None else float(timeout)
+        include_data = data.get('include_data', True)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': f'参数格式错误: {e}'}, status=400)
+
+    # NaN 与任何数比较都为 False，同样被拒绝
+    if not math.isfinite(timeout) or not 0 < timeout <= EXECUTOR_TIMEOUT:
+        return JsonResponse({
+            'success': False,
+            'error': f'timeout 应大于 0 且不超过 {EXECUTOR_TIMEOUT} 秒'
+        }, status=400)
+
+    if not isinstance(include_data, bool):
+        return JsonResponse({'success': False, 'error': 'include_data 应为 true 或 false'}, status=400)
+
+    if not code:
+        return JsonResponse({
+            'success': False,
+            'error': '代码不能为空'
+        })
+
+    if fmt not in ('ndjson', 'sse'):
+        return JsonResponse({'success': False, 'error': 'format 只支持 ndjson 或 sse'}, status=400)
+
+    if tickers == 'all':
+        tickers = ticker_universe.tickers()
+    elif not isinstance(tickers, list) or not tickers:
+        return JsonResponse({'success': False, 'error': 'tickers 应为股票代码列表或 "all"'}, status=400)
+    tickers = list(dict.fromkeys(str(ticker) for ticker in tickers))
+
+    if len(tickers) > EXECUTOR_BATCH_MAX_TICKERS:
+        return JsonResponse({
+            'success': False,
+            'error': f'股票数量不能超过 {EXECUTOR_BATCH_MAX_TICKERS}'
+        }, status=400)
+
+    items = run_batch(code, tickers, timeout=timeout, include_data=include_data)
+    content_type = 'text/event-stream' if fmt == 'sse' else 'application/x-ndjson'
+    response = StreamingHttpResponse(_batch_stream(items, fmt), content_type=content_type)
+    response['Cache-Control'] = 'no-cache'
+    # 禁止 nginx 缓冲，结果逐条到达客户端
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,612 @@
+"""
+波浪数据文件读取与缓存
+
+/data/stock/wavedata/<date>.json 文件较大且写入后很少变化，这里按日期做
+进程内 LRU 缓存，每次读取前用文件 mtime/大小校验是否过期；可选使用
+django.core.cache 作为跨进程的二级缓存。
+
+每个日期另有 <date>.summary 汇总文件，保存各形态的股票数量和涨跌平统计，
+记录生成时数据文件的 mtime/大小，数据文件变化后自动重建。
+
+同目录下的 <date>.wvd 为二进制列式格式（见 write_wavedata_binary），存在且不
+旧于 JSON 文件时优先通过 mmap 读取，单个形态的查询只访问该形态的记录。
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from django.core.cache import cache
+
+
+WAVEDATA_DIR = '/data/stock/wavedata/'
+
+# 进程内最多缓存的日期数
+WAVEDATA_CACHE_SIZE = 32
+
+# 进程内最多缓存的形态汇总数（汇总很小，可以多保留）
+WAVEDATA_SUMMARY_CACHE_SIZE = 1024
+
+# 日期索引两次检查目录 mtime 的最小间隔（秒）；启用文件监听时仍按此间隔检查，作为漏掉事件时的兜底
+WAVEDATA_DATES_CHECK_INTERVAL = 5
+
+# 安装了 watchdog 时是否自动监听目录变化
+WAVEDATA_DATES_WATCH = True
+
+# 是否使用 django.core.cache 作为二级缓存，以及二级缓存的过期时间（秒）
+WAVEDATA_SHARED_CACHE = False
+WAVEDATA_SHARED_TIMEOUT = 24 * 3600
+
+
+def get_wavedata_path(date_str=None):
+    """
+    获取指定日期的波浪数据文件路径
+
+    Args:
+        date_str: 日期字符串，格式为 YYYY-MM-DD，默认为当天
+
+    Returns:
+        JSON文件路径，如果文件不存在则返回None
+    """
+    if date_str is None:
+        date_str = datetime.now().strftime('%Y-%m-%d')
+
+    file_path = os.path.join(WAVEDATA_DIR, f'{date_str}.json')
+
+    if os.path.exists(file_path):
+        return file_path
+    return None
+
+
+def read_wavedata_file(file_path):
+    """解析波浪数据文件，出错时返回空字典"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Error loading wavedata from {file_path}: {e}")
+    return {}
+
+
+# 二进制格式:
+#   文件头   magic(4s) ticker 宽度(u16) 标志(u16) 形态数量(u32)
+#   形态表   每个形态一项: 形态编码(S16) 记录起始字节偏移(u64) 记录数(u32)
+#   记录区   定长记录: ticker(S<宽度>) change_price_delta(f8，缺失为 NaN)
+BINARY_MAGIC = b'WVD1'
+BINARY_HEADER = struct.Struct('<4sHHI')
+BINARY_TABLE_DTYPE = np.dtype([('code', 'S16'), ('offset', '<u8'), ('count', '<u4')])
+
+# 标志位：记录为 {'ticker', 'change_price_delta'} 对象，否则为股票代码字符串
+FLAG_OBJECT_ITEMS = 1
+
+
+def _record_dtype(ticker_width):
+    return np.dtype([('ticker', f'S{ticker_width}'), ('delta', '<f8')])
+
+
+def get_wavedata_binary_path(date_str):
+    """二进制格式文件路径"""
+    return os.path.join(WAVEDATA_DIR, f'{date_str}.wvd')
+
+
+def write_wavedata_binary(data, file_path):
+    """
+    把波浪数据字典写成二进制格式（先写临时文件再替换）
+
+    Raises:
+        ValueError: 数据中包含二进制格式无法表示的字段
+    """
+    items = [item for tickers in data.values() for item in tickers]
+    if all(isinstance(item, str) for item in items):
+        flags = 0
+        tickers = items
+    elif all(isinstance(item, dict) and 'ticker' in item
+             and set(item) <= {'ticker', 'change_price_delta'} for item in items):
+        flags = FLAG_OBJECT_ITEMS
+        tickers = [item['ticker'] for item in items]
+    else:
+        raise ValueError('只支持股票代码字符串或 {ticker, change_price_delta} 对象')
+
+    if any(len(code.encode('ascii')) > BINARY_TABLE_DTYPE['code'].itemsize for code in data):
+        raise ValueError('形态编码过长')
+    ticker_width = max((len(t.encode('ascii')) for t in tickers), default=1)
+    record_dtype = _record_dtype(ticker_width)
+
+    records = np.zeros(len(items), dtype=record_dtype)
+    records['ticker'] = tickers
+    if flags & FLAG_OBJECT_ITEMS:
+        records['delta'] = [
+            np.nan if item.get('change_price_delta') is None else item['change_price_delta']
+            for item in items
+        ]
+    else:
+        records['delta'] = np.nan
+
+    table = np.zeros(len(data), dtype=BINARY_TABLE_DTYPE)
+    offset = BINARY_HEADER.size + table.nbytes
+    for i, (code, pattern_items) in enumerate(data.items()):
+        table[i] = (code.encode('ascii'), offset, len(pattern_items))
+        offset += len(pattern_items) * record_dtype.itemsize
+
+    tmp_path = f'{file_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, ticker_width, flags, len(data)))
+        f.write(table.tobytes())
+        f.write(records.tobytes())
+    os.replace(tmp_path, file_path)
+
+
+class WavedataFile:
+    """通过 mmap 读取的二进制波浪数据，只在需要时访问记录区"""
+
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, ticker_width, self.flags, pattern_count = BINARY_HEADER.unpack_from(self._mm, 0)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f'不是波浪数据二进制文件: {file_path}')
+        self._record_dtype = _record_dtype(ticker_width)
+        table = np.frombuffer(self._mm, dtype=BINARY_TABLE_DTYPE, count=pattern_count,
+                              offset=BINARY_HEADER.size)
+        self._table = {
+            code.decode('ascii'): (int(offset), int(count))
+            for code, offset, count in table.tolist()
+        }
+        self._dict = None
+
+    def counts(self):
+        """每个形态的股票数量，只读取形态表"""
+        return {code: count for code, (_, count) in self._table.items()}
+
+    def items(self, pattern_type):
+        """单个形态的股票列表，格式与 JSON 文件一致"""
+        if pattern_type not in self._table:
+            return []
+        offset, count = self._table[pattern_type]
+        records = np.frombuffer(self._mm, dtype=self._record_dtype, count=count, offset=offset)
+        tickers = [t.decode('ascii') for t in records['ticker'].tolist()]
+        if not self.flags & FLAG_OBJECT_ITEMS:
+            return tickers
+        result = []
+        for ticker, delta in zip(tickers, records['delta'].tolist()):
+            item = {'ticker': ticker}
+            if delta == delta:
+                item['change_price_delta'] = delta
+            result.append(item)
+        return result
+
+    def to_dict(self):
+        """完整的波浪数据字典（首次调用时构造）"""
+        if self._dict is None:
+            self._dict = {code: self.items(code) for code in self._table}
+        return self._dict
+
+
+class JsonWavedata:
+    """JSON 格式波浪数据，接口与 WavedataFile 一致"""
+
+    def __init__(self, data):
+        self._dict = data
+
+    def counts(self):
+        return {code: len(items) for code, items in self._dict.items()}
+
+    def items(self, pattern_type):
+        return self._dict.get(pattern_type, [])
+
+    def to_dict(self):
+        return self._dict
+
+
+def get_wavedata_summary_path(date_str):
+    """形态汇总文件路径"""
+    return os.path.join(WAVEDATA_DIR, f'{date_str}.summary')
+
+
+def build_wavedata_summary(counts):
+    """
+    根据每个形态的股票数量构造汇总
+
+    Returns:
+        {'patterns': [...], 'total_stocks': n}，patterns 按数量降序
+    """
+    patterns = [
+        {
+            'pattern_type': pattern_type,
+            'count': count,
+            'up_count': pattern_type.count('3'),
+            'down_count': pattern_type.count('2'),
+            'flat_count': pattern_type.count('1')
+        }
+        for pattern_type, count in counts.items()
+    ]
+    patterns.sort(key=lambda x: x['count'], reverse=True)
+    return {
+        'patterns': patterns,
+        'total_stocks': sum(counts.values())
+    }
+
+
+def _summary_source(key):
+    file_path, (mtime_ns, size) = key
+    return {'file': os.path.basename(file_path), 'mtime_ns': mtime_ns, 'size': size}
+
+
+def read_wavedata_summary(date_str, key):
+    """读取汇总文件，与当前数据文件不匹配或读取失败时返回 None"""
+    try:
+        with open(get_wavedata_summary_path(date_str), 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+    except (ValueError, OSError):
+        return None
+    if summary.get('source') != _summary_source(key):
+        return None
+    return {'patterns': summary['patterns'], 'total_stocks': summary['total_stocks']}
+
+
+def write_wavedata_summary(date_str, key, summary):
+    """写入汇总文件，目录不可写时忽略"""
+    file_path = get_wavedata_summary_path(date_str)
+    tmp_path = f'{file_path}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': _summary_source(key), **summary}, f, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
+    except OSError as e:
+        print(f"Error writing wavedata summary to {file_path}: {e}")
+
+
+class WavedataCache:
+    """
+    波浪数据的 LRU 缓存
+
+    以日期为键，缓存项记录文件的 (mtime_ns, size)，文件被改写后自动失效。
+    返回的字典在多个请求间共享，调用方不要修改。
+    """
+
+    def __init__(self, max_entries=WAVEDATA_CACHE_SIZE, shared=WAVEDATA_SHARED_CACHE,
+                 shared_timeout=WAVEDATA_SHARED_TIMEOUT):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.shared_timeout = shared_timeout
+        self._entries = OrderedDict()
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        self.summary_hits = 0
+        self.summary_builds = 0
+
+    def _resolve(self, date_str):
+        """选择要读取的文件，返回 (path, is_binary, stamp)，都不存在时返回 None"""
+        candidates = []
+        for path, is_binary in ((get_wavedata_binary_path(date_str), True),
+                                (os.path.join(WAVEDATA_DIR, f'{date_str}.json'), False)):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            candidates.append((path, is_binary, (st.st_mtime_ns, st.st_size)))
+        if not candidates:
+            return None
+        # 二进制文件比 JSON 旧时说明 JSON 已被重新生成，回退读取 JSON
+        if len(candidates) == 2 and candidates[0][2][0] < candidates[1][2][0]:
+            return candidates[1]
+        return candidates[0]
+
+    def get_source(self, date_str=None):
+        """
+        读取指定日期的波浪数据源
+
+        Returns:
+            WavedataFile 或 JsonWavedata，文件不存在时返回 None
+        """
+        if date_str is None:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+
+        resolved = self._resolve(date_str)
+        if resolved is None:
+            with self._lock:
+                self._entries.pop(date_str, None)
+            return None
+        file_path, is_binary, stamp = resolved
+        key = (file_path, stamp)
+
+        with self._lock:
+            entry = self._entries.get(date_str)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(date_str)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        if is_binary:
+            source = WavedataFile(file_path)
+        else:
+            data = None
+            shared_key = f'wavedata:{date_str}:{stamp[0]}:{stamp[1]}'
+            if self.shared:
+                data = cache.get(shared_key)
+                if data is not None:
+                    self.shared_hits += 1
+            if data is None:
+                data = read_wavedata_file(file_path)
+                if self.shared and data:
+                    cache.set(shared_key, data, self.shared_timeout)
+            source = JsonWavedata(data)
+
+        with self._lock:
+            self._entries[date_str] = (key, source)
+            self._entries.move_to_end(date_str)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return source
+
+    def get(self, date_str=None):
+        """读取指定日期的完整波浪数据，文件不存在时返回空字典"""
+        source = self.get_source(date_str)
+        return source.to_dict() if source is not None else {}
+
+    def get_summary(self, date_str=None, rebuild=False):
+        """
+        读取指定日期的形态汇总
+
+        依次查找进程内缓存、汇总文件，都没有或已过期时从数据文件重建并写回汇总文件。
+
+        Args:
+            rebuild: 为 True 时忽略已有汇总，强制重建
+
+        Returns:
+            {'patterns': [...], 'total_stocks': n}，数据文件不存在时返回 None
+        """
+        if date_str is None:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+
+        resolved = self._resolve(date_str)
+        if resolved is None:
+            with self._lock:
+                self._summaries.pop(date_str, None)
+            return None
+        file_path, is_binary, stamp = resolved
+        key = (file_path, stamp)
+
+        if not rebuild:
+            with self._lock:
+                entry = self._summaries.get(date_str)
+                if entry is not None and entry[0] == key:
+                    self._summaries.move_to_end(date_str)
+                    self.summary_hits += 1
+                    return entry[1]
+
+        summary = None if rebuild else read_wavedata_summary(date_str, key)
+        if summary is None:
+            source = self.get_source(date_str)
+            if source is None:
+                return None
+            summary = build_wavedata_summary(source.counts())
+            write_wavedata_summary(date_str, key, summary)
+            with self._lock:
+                self.summary_builds += 1
+
+        with self._lock:
+            self._summaries[date_str] = (key, summary)
+            self._summaries.move_to_end(date_str)
+            while len(self._summaries) > WAVEDATA_SUMMARY_CACHE_SIZE:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def clear(self):
+        """清空进程内缓存（不影响二级缓存和汇总文件）"""
+        with self._lock:
+            self._entries.clear()
+            self._summaries.clear()
+
+    def stats(self):
+        """返回缓存命中统计"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'shared_hits': self.shared_hits,
+                'summary_entries': len(self._summaries),
+                'summary_hits': self.summary_hits,
+                'summary_builds': self.summary_builds
+            }
+
+
+wavedata_cache = WavedataCache()
+
+
+WAVEDATA_FILE_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})\.(?:json|wvd)$')
+
+
+class WavedataDateIndex:
+    """
+    波浪数据可用日期索引
+
+    缓存排序后的日期列表，目录 mtime 变化时才重新 listdir；检查间隔内直接使用缓存。
+    安装了 watchdog 时首次查询会启动目录监听，数据文件变化后立即标记过期；
+    按间隔检查 mtime 仍然保留，监听线程退出或漏掉事件时作为兜底。
+    """
+
+    def __init__(self, check_interval=WAVEDATA_DATES_CHECK_INTERVAL, watch=WAVEDATA_DATES_WATCH):
+        self.check_interval = check_interval
+        self.watch = watch
+        self._watch_tried = False
+        self._dates = []
+        self._dir = None
+        self._dir_mtime = None
+        self._checked_at = 0.0
+        self._dirty = True
+        self._observer = None
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        dates = set()
+        for name in os.listdir(WAVEDATA_DIR):
+            match = WAVEDATA_FILE_RE.match(name)
+            if match:
+                dates.add(match.group(1))
+        return sorted(dates)
+
+    def _ensure_fresh(self):
+        if self.watch and not self._watch_tried:
+            self._watch_tried = True
+            self.start_watcher()
+
+        now = time.monotonic()
+        with self._lock:
+            if self._dir != WAVEDATA_DIR:
+                self._dirty = True
+            elif now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                if os.stat(WAVEDATA_DIR).st_mtime_ns != self._dir_mtime:
+                    self._dirty = True
+            if not self._dirty:
+                return
+            self._dir = WAVEDATA_DIR
+            self._dir_mtime = os.stat(WAVEDATA_DIR).st_mtime_ns
+            self._dates = self._scan()
+            self._checked_at = now
+            self._dirty = False
+
+    def invalidate(self):
+        """标记索引过期，下次查询时重新扫描目录"""
+        with self._lock:
+            self._dirty = True
+
+    def dates(self, start=None, end=None):
+        """返回 [start, end] 范围内的日期（YYYY-MM-DD 字符串，升序）"""
+        self._ensure_fresh()
+        dates = self._dates
+        lo = bisect_left(dates, start) if start else 0
+        hi = bisect_right(dates, end) if end else len(dates)
+        return dates[lo:hi]
+
+    def latest(self, end=None):
+        """返回最新日期，指定 end 时返回不晚于 end 的最新日期"""
+        self._ensure_fresh()
+        dates = self._dates
+        hi = bisect_right(dates, end) if end else len(dates)
+        return dates[hi - 1] if hi else None
+
+    def start_watcher(self):
+        """
+        启动目录监听（需要 watchdog），成功返回 True
+
+        只有 YYYY-MM-DD.json / .wvd 数据文件的变化才标记过期（.summary、临时文件等忽略），
+        扫描仍在下次查询时进行。
+        """
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        index = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = (event.src_path, getattr(event, 'dest_path', ''))
+                if any(WAVEDATA_FILE_RE.match(os.path.basename(os.fsdecode(p))) for p in paths if p):
+                    index.invalidate()
+
+        observer = Observer()
+        try:
+            observer.schedule(Handler(), WAVEDATA_DIR, recursive=False)
+        except OSError:
+            return False
+        observer.daemon = True
+        observer.start()
+        with self._lock:
+            self._observer = observer
+            self._dirty = True
+        return True
+
+
+wavedata_dates = WavedataDateIndex()
+
+
+def load_wavedata(date_str=None):
+    """
+    从JSON文件加载波浪数据（经过缓存）
+
+    Args:
+        date_str: 日期字符串，格式为 YYYY-MM-DD，默认为当天
+
+    Returns:
+        波浪数据字典，键为形态类型（如"111"），值为股票代码列表
+        如果文件不存在则返回空字典
+    """
+    return wavedata_cache.get(date_str)
+
+
+def load_wavedata_pattern(date_str, pattern_type):
+    """
+    读取单个形态的股票列表
+
+    Returns:
+        股票列表，形态不存在时为空列表；数据文件不存在时返回 None
+    """
+    source = wavedata_cache.get_source(date_str)
+    if source is None:
+        return None
+    return source.items(pattern_type)
+
+
+def load_wavedata_counts(date_str=None):
+    """
+    读取每个形态的股票数量
+
+    Returns:
+        {形态类型: 股票数量}，数据文件不存在时返回 None
+    """
+    source = wavedata_cache.get_source(date_str)
+    if source is None:
+        return None
+    return source.counts()
+
+
+def load_wavedata_summary(date_str=None):
+    """
+    读取形态汇总（各形态股票数量、涨跌平统计和股票总数）
+
+    Returns:
+        {'patterns': [...], 'total_stocks': n}，数据文件不存在时返回 None
+    """
+    return wavedata_cache.get_summary(date_str)
+
+
+def convert_wavedata_file(date_str, force=False):
+    """
+    把指定日期的 JSON 波浪数据转换为二进制格式
+
+    Returns:
+        写入的二进制文件路径；已是最新或 JSON 文件不存在时返回 None
+    """
+    json_path = os.path.join(WAVEDATA_DIR, f'{date_str}.json')
+    binary_path = get_wavedata_binary_path(date_str)
+    if not os.path.exists(json_path):
+        return None
+    if not force and os.path.exists(binary_path) and \
+            os.stat(binary_path).st_mtime_ns >= os.stat(json_path).st_mtime_ns:
+        return None
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    write_wavedata_binary(data, binary_path)
+    # 数据源切换为二进制文件，同时重建汇总
+    wavedata_cache.get_summary(date_str, rebuild=True)
+    return binary_path
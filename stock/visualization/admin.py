@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import DailyMarketStats
 
-# Register your models here.
+
+@admin.register(DailyMarketStats)
+class DailyMarketStatsAdmin(admin.ModelAdmin):
+    list_display = ['trade_date', 'total_count', 'up_count', 'down_count', 'flat_count',
+                    'avg_up_percent', 'avg_down_percent', 'updated_at']
+    date_hierarchy = 'trade_date'
@@ -0,0 +1,126 @@
+"""
+原始 SQL 查询结果编码
+
+按 cursor.description 的列类型为每一列选择一次转换函数，整列转换，
+不再逐行 dict(zip()) 后逐个值 isinstance 判断；结果可返回为行（字典列表）
+或列（{列名: 数组}）两种形状。安装了 orjson 时 JSON 序列化使用 orjson。
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 返回形状：rows 为字典列表，columns 为 {列名: 数组}
+RESULT_SHAPES = ('rows', 'columns')
+
+# Django 字段类型 -> 转换函数
+FIELD_CONVERTERS = {
+    'DecimalField': float,
+    'DateField': date.isoformat,
+    'DateTimeField': datetime.isoformat,
+}
+
+
+def _value_converter(value):
+    """无法从列类型判断时按值的 Python 类型选择转换函数"""
+    if isinstance(value, Decimal):
+        return float
+    if isinstance(value, datetime):
+        return datetime.isoformat
+    if isinstance(value, date):
+        return date.isoformat
+    return None
+
+
+def column_converters(description, columns):
+    """
+    为每一列选择转换函数，不需要转换的列为 None
+
+    优先使用数据库后端的类型映射（MySQL 返回字段类型编码）；后端不提供类型
+    （如 SQLite）或映射失败时，按该列第一个非空值的类型判断。
+    """
+    converters = []
+    for desc, values in zip(description, columns):
+        try:
+            field_type = connection.introspection.data_types_reverse[desc[1]]
+        except (KeyError, AttributeError, TypeError):
+            field_type = None
+        if field_type in FIELD_CONVERTERS:
+            converters.append(FIELD_CONVERTERS[field_type])
+            continue
+        sample = next((v for v in values if v is not None), None)
+        converters.append(_value_converter(sample))
+    return converters
+
+
+def convert_column(values, converter):
+    """整列转换，None 保持不变"""
+    if converter is None:
+        return list(values)
+    # 先按无空值整列转换，遇到 None 再逐个判断（None in values 对 Decimal 列反而更慢）
+    try:
+        return list(map(converter, values))
+    except TypeError:
+        return [None if v is None else converter(v) for v in values]
+
+
+def fetch_columns(cursor):
+    """
+    读取游标的全部结果并按列转换
+
+    Returns:
+        (names, columns)：列名列表和对应的值列表
+    """
+    names = [desc[0] for desc in cursor.description]
+    rows = cursor.fetchall()
+    raw = list(zip(*rows)) if rows else [()] * len(names)
+    converters = column_converters(cursor.description, raw)
+    return names, [convert_column(values, converter) for values, converter in zip(raw, converters)]
+
+
+def columns_to_rows(names, columns):
+    """列 -> 字典列表"""
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def rows_to_columns(rows, names):
+    """字典列表 -> {列名: 数组}"""
+    return {name: [row[name] for row in rows] for name in names}
+
+
+def fetch_encoded(cursor, shape='rows'):
+    """读取游标结果，返回字典列表（rows）或 {列名: 数组}（columns）"""
+    names, columns = fetch_columns(cursor)
+    if shape == 'columns':
+        return dict(zip(names, columns))
+    return columns_to_rows(names, columns)
+
+
+def dumps(data):
+    """序列化为 JSON 字节串，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(data, default=DjangoJSONEncoder().default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+class FastJsonResponse(HttpResponse):
+    """与 JsonResponse 用法相同，使用 dumps 序列化"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+def get_result_shape(request):
+    """读取 shape 参数，非法值按 rows 处理"""
+    shape = request.GET.get('shape', 'rows')
+    return shape if shape in RESULT_SHAPES else 'rows'
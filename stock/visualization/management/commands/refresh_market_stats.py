@@ -0,0 +1,44 @@
+"""
+物化每日市场涨跌统计（daily_market_stats）
+
+用法:
+    python manage.py refresh_market_stats                # 从已物化的最新交易日增量刷新
+    python manage.py refresh_market_stats --since 2021-01-01
+    python manage.py refresh_market_stats --full         # 重新计算全部交易日
+
+导入新的 stock_history 数据后运行一次即可。
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+from stock.models import StockHistory
+
+from visualization.market_stats import get_last_stats_date, refresh_daily_stats
+
+
+class Command(BaseCommand):
+    help = '按交易日物化每日市场涨跌统计'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', default=None,
+                            help='从指定日期（YYYY-MM-DD）开始重新计算，默认从已物化的最新交易日开始')
+        parser.add_argument('--until', default=None,
+                            help='计算到指定日期（YYYY-MM-DD），默认不限')
+        parser.add_argument('--full', action='store_true',
+                            help='重新计算全部交易日')
+
+    def handle(self, *args, **options):
+        try:
+            since = datetime.strptime(options['since'], '%Y-%m-%d').date() if options['since'] else None
+            until = datetime.strptime(options['until'], '%Y-%m-%d').date() if options['until'] else None
+        except ValueError:
+            raise CommandError('日期格式应为 YYYY-MM-DD')
+        if options['full']:
+            since = StockHistory.objects.aggregate(first=Min('trade_date'))['first']
+
+        written = refresh_daily_stats(since, until)
+        self.stdout.write(self.style.SUCCESS(
+            f'完成：写入 {written} 个交易日，最新交易日 {get_last_stats_date()}'
+        ))
@@ -0,0 +1,149 @@
+"""
+每日市场涨跌统计
+
+过去的交易日统计不会再变化，按交易日物化到 daily_market_stats，
+接口按主键范围读取；尚未物化的日期（包括已物化日期之间的缺口）和当天
+仍从 stock_history 实时聚合。
+"""
+from datetime import datetime, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from stock.models import StockHistory
+
+from .encoding import fetch_columns
+from .models import DailyMarketStats
+
+
+STATS_FIELDS = (
+    'total_count', 'up_count', 'down_count', 'flat_count', 'avg_up_percent', 'avg_down_percent'
+)
+
+# 每批写入的记录数量
+WRITE_BATCH_SIZE = 1000
+
+DAILY_STATS_SQL = """
+    SELECT trade_date,
+           COUNT(*) as total_count,
+           SUM(CASE WHEN close_price > open_price THEN 1 ELSE 0 END) as up_count,
+           SUM(CASE WHEN close_price < open_price THEN 1 ELSE 0 END) as down_count,
+           SUM(CASE WHEN close_price = open_price THEN 1 ELSE 0 END) as flat_count,
+           AVG(CASE WHEN close_price > open_price
+               THEN (close_price - open_price) / open_price * 100
+               ELSE NULL END) as avg_up_percent,
+           AVG(CASE WHEN close_price < open_price
+               THEN (close_price - open_price) / open_price * 100
+               ELSE NULL END) as avg_down_percent
+    FROM stock_history
+    WHERE trade_date BETWEEN %s AND %s{exclude}
+    GROUP BY trade_date
+    ORDER BY trade_date
+"""
+
+
+def compute_daily_stats(start_date, end_date, exclude=()):
+    """
+    从 stock_history 实时聚合日期范围内每个交易日的统计
+
+    Args:
+        exclude: 不需要聚合的交易日（已物化的日期）
+
+    Returns:
+        按 trade_date 升序的 DailyMarketStats 实例列表（未保存）
+    """
+    exclude = list(exclude)
+    sql = DAILY_STATS_SQL.format(
+        exclude=f" AND trade_date NOT IN ({', '.join(['%s'] * len(exclude))})" if exclude else ''
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [start_date, end_date, *exclude])
+        _, columns = fetch_columns(cursor)
+
+    stats = []
+    for trade_date, total, up, down, flat, avg_up, avg_down in zip(*columns):
+        stats.append(DailyMarketStats(
+            trade_date=datetime.strptime(trade_date, '%Y-%m-%d').date(),
+            total_count=int(total),
+            up_count=int(up),
+            down_count=int(down),
+            flat_count=int(flat),
+            avg_up_percent=avg_up,
+            avg_down_percent=avg_down
+        ))
+    return stats
+
+
+def get_last_stats_date():
+    """已物化的最新交易日，没有数据时返回 None"""
+    return DailyMarketStats.objects.aggregate(last=Max('trade_date'))['last']
+
+
+def write_daily_stats(stats, batch_size=WRITE_BATCH_SIZE):
+    """按交易日批量写入（存在则更新）"""
+    if not stats:
+        return 0
+    options = {
+        'update_conflicts': True,
+        'update_fields': list(STATS_FIELDS) + ['updated_at'],
+        'batch_size': batch_size,
+    }
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不支持指定冲突字段
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['trade_date']
+    with transaction.atomic():
+        DailyMarketStats.objects.bulk_create(stats, **options)
+    return len(stats)
+
+
+def refresh_daily_stats(start_date=None, end_date=None):
+    """
+    重新计算并物化日期范围内的统计
+
+    Args:
+        start_date: 开始日期（含），默认从已物化的最新交易日开始（该日可能只导入了部分数据），
+                    表为空时从最早的交易日开始
+        end_date: 结束日期（含），默认到最新的交易日
+
+    Returns:
+        写入的交易日数量
+    """
+    if start_date is None:
+        start_date = get_last_stats_date()
+    if start_date is None or end_date is None:
+        bounds = StockHistory.objects.aggregate(first=Min('trade_date'), last=Max('trade_date'))
+        if bounds['last'] is None:
+            return 0
+        start_date = start_date or bounds['first']
+        end_date = end_date or bounds['last']
+    return write_daily_stats(compute_daily_stats(start_date, end_date))
+
+
+def get_daily_stats(start_date, end_date, today=None):
+    """
+    读取日期范围内的每日统计
+
+    已物化且早于今天的交易日按主键范围读取；范围内其余交易日（尚未物化、物化有缺口，
+    以及数据可能仍在导入的今天）用一次查询实时聚合。
+
+    Returns:
+        按 trade_date 升序的 DailyMarketStats 实例列表
+    """
+    if today is None:
+        today = datetime.now().date()
+
+    stored = list(DailyMarketStats.objects.filter(
+        trade_date__gte=start_date, trade_date__lte=min(end_date, today - timedelta(days=1))
+    ).order_by('trade_date'))
+    live = compute_daily_stats(start_date, end_date, exclude=[stats.trade_date for stats in stored])
+    if not stored or not live:
+        return stored or live
+    return sorted(stored + live, key=lambda stats: stats.trade_date)
+
+
+def serialize_daily_stats(stats):
+    """DailyMarketStats -> 接口返回的字典"""
+    return {
+        'trade_date': stats.trade_date.strftime('%Y-%m-%d'),
+        **{field: getattr(stats, field) for field in STATS_FIELDS}
+    }
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMarketStats',
+            fields=[
+                ('trade_date', models.DateField(primary_key=True, serialize=False, verbose_name='交易日期')),
+                ('total_count', models.IntegerField(verbose_name='股票总数')),
+                ('up_count', models.IntegerField(verbose_name='上涨数量')),
+                ('down_count', models.IntegerField(verbose_name='下跌数量')),
+                ('flat_count', models.IntegerField(verbose_name='平盘数量')),
+                ('avg_up_percent', models.FloatField(null=True, verbose_name='平均涨幅(%)')),
+                ('avg_down_percent', models.FloatField(null=True, verbose_name='平均跌幅(%)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '每日市场统计',
+                'verbose_name_plural': '每日市场统计',
+                'db_table': 'daily_market_stats',
+                'ordering': ['trade_date'],
+                'managed': True,
+            },
+        ),
+    ]
@@ -1,3 +1,23 @@
 from django.db import models
 
-# Create your models here.
+
+class DailyMarketStats(models.Model):
+    """按交易日物化的市场涨跌统计，由 refresh_market_stats 命令增量维护"""
+    trade_date = models.DateField(primary_key=True, verbose_name='交易日期')
+    total_count = models.IntegerField(verbose_name='股票总数')
+    up_count = models.IntegerField(verbose_name='上涨数量')
+    down_count = models.IntegerField(verbose_name='下跌数量')
+    flat_count = models.IntegerField(verbose_name='平盘数量')
+    avg_up_percent = models.FloatField(null=True, verbose_name='平均涨幅(%)')
+    avg_down_percent = models.FloatField(null=True, verbose_name='平均跌幅(%)')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        managed = True
+        db_table = 'daily_market_stats'
+        verbose_name = '每日市场统计'
+        verbose_name_plural = '每日市场统计'
+        ordering = ['trade_date']
+
+    def __str__(self):
+        return f"{self.trade_date} - 涨 {self.up_count} / 跌 {self.down_count}"
@@ -0,0 +1,307 @@
+"""
+区间涨跌幅选股
+
+SQL 引擎按股票一次 GROUP BY 得到区间内首末交易日和成交量合计，再通过
+(ticker, trade_date) 唯一索引连接取首末收盘价，总数用 COUNT(*) OVER () 在过滤后的结果上计算。
+
+NumPy 引擎把最近 SCREENER_LOOKBACK_DAYS 天内全部股票的收盘价/成交量缓存为 float32 的
+(股票 × 交易日) 矩阵，筛选只做内存中的切片运算；矩阵在后台线程中按股票分块构建，
+构建完成前以及开始日期早于回看窗口时使用 SQL 引擎。
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection
+from django.db.models import Max
+
+from stock.models import StockHistory, StockTicker
+from stock.universe import get_ticker_info
+
+from .encoding import fetch_columns
+
+
+logger = logging.getLogger(__name__)
+
+
+# 默认选股引擎：sql 或 numpy
+SCREENER_ENGINE = 'sql'
+
+# NumPy 矩阵超过该时间（秒）后访问时检查是否有新交易日
+SCREENER_CHECK_INTERVAL = 60
+
+# 构建 NumPy 矩阵时每次查询的股票数量
+SCREENER_TICKER_CHUNK_SIZE = 200
+
+# NumPy 矩阵覆盖的日历天数（从最新交易日往前），更早的开始日期使用 SQL 引擎
+SCREENER_LOOKBACK_DAYS = 400
+
+SCREENER_SQL = """
+    WITH stock_range AS (
+        SELECT ticker,
+               MIN(trade_date) as start_day,
+               MAX(trade_date) as end_day,
+               SUM(volume) as total_volume
+        FROM stock_history
+        WHERE trade_date BETWEEN %s AND %s
+        GROUP BY ticker
+    ),
+    stock_data AS (
+        SELECT sr.ticker,
+               sp.close_price as start_price,
+               ep.close_price as end_price,
+               ((ep.close_price - sp.close_price) / sp.close_price * 100) as change_percent,
+               sr.total_volume
+        FROM stock_range sr
+        JOIN stock_history sp ON sp.ticker = sr.ticker AND sp.trade_date = sr.start_day
+        JOIN stock_history ep ON ep.ticker = sr.ticker AND ep.trade_date = sr.end_day
+    ),
+    filtered AS (
+        SELECT * FROM stock_data
+        WHERE (%s IS NULL OR change_percent >= %s)
+          AND (%s IS NULL OR change_percent <= %s)
+          AND (%s IS NULL OR total_volume >= %s)
+    )
+    SELECT ticker, start_price, end_price, change_percent, total_volume,
+           COUNT(*) OVER () as total_count
+    FROM filtered
+    ORDER BY change_percent DESC, ticker
+    LIMIT %s OFFSET %s
+"""
+
+SCREENER_COUNT_SQL = """
+    WITH stock_range AS (
+        SELECT ticker,
+               MIN(trade_date) as start_day,
+               MAX(trade_date) as end_day,
+               SUM(volume) as total_volume
+        FROM stock_history
+        WHERE trade_date BETWEEN %s AND %s
+        GROUP BY ticker
+    )
+    SELECT COUNT(*)
+    FROM stock_range sr
+    JOIN stock_history sp ON sp.ticker = sr.ticker AND sp.trade_date = sr.start_day
+    JOIN stock_history ep ON ep.ticker = sr.ticker AND ep.trade_date = sr.end_day
+    WHERE (%s IS NULL OR (ep.close_price - sp.close_price) / sp.close_price * 100 >= %s)
+      AND (%s IS NULL OR (ep.close_price - sp.close_price) / sp.close_price * 100 <= %s)
+      AND (%s IS NULL OR sr.total_volume >= %s)
+"""
+
+RESULT_FIELDS = ('ticker', 'start_price', 'end_price', 'change_percent', 'total_volume')
+
+
+def screen_stocks_sql(start_date, end_date, min_change=None, max_change=None, min_volume=None,
+                      limit=50, offset=0):
+    """
+    用 SQL 计算区间涨跌幅并筛选
+
+    Args:
+        start_date, end_date: 区间（含），取区间内每只股票的首末交易日收盘价
+        min_change, max_change: 涨跌幅（%）上下限，None 表示不限
+        min_volume: 区间成交量下限，None 表示不限
+        limit, offset: 分页
+
+    Returns:
+        (columns, total)：columns 为 {字段: 数组}，字段见 RESULT_FIELDS，按涨跌幅降序；
+        total 为过滤后的股票总数
+    """
+    filters = [min_change, min_change, max_change, max_change, min_volume, min_volume]
+    with connection.cursor() as cursor:
+        cursor.execute(SCREENER_SQL, [start_date, end_date, *filters, limit, offset])
+        names, columns = fetch_columns(cursor)
+        if columns[-1]:
+            total = columns[-1][0]
+        elif offset:
+            # 页码超出范围时窗口函数没有返回行，单独计数
+            cursor.execute(SCREENER_COUNT_SQL, [start_date, end_date, *filters])
+            total = cursor.fetchone()[0]
+        else:
+            total = 0
+
+    # 去掉 total_count 列；与原接口一致，缺失的数值返回 0.0
+    result = dict(zip(names[:-1], columns[:-1]))
+    for field in RESULT_FIELDS[1:]:
+        if None in result[field]:
+            result[field] = [0.0 if v is None else v for v in result[field]]
+    return result, total
+
+
+class CloseMatrix:
+    """
+    最近 lookback_days 天内全部股票的收盘价/成交量矩阵，行为股票，列为交易日，缺失值为 NaN
+
+    股票列表来自 stock_ticker 登记表（最后交易日在窗口内的股票），矩阵按日历天分配后
+    按股票分块读取窗口内的 stock_history 直接写入，最后只保留有数据的列作为交易日轴，
+    不对 stock_history 做 SELECT DISTINCT 扫描。矩阵为 float32，成交量合计按 float64 累加。
+    首次访问时启动构建并返回 None（调用方改用 SQL 引擎）；超过 check_interval 秒后
+    访问时在后台检查登记表的最新交易日，有新交易日则重建，重建完成前继续使用旧矩阵。
+    """
+
+    def __init__(self, check_interval=SCREENER_CHECK_INTERVAL, chunk_size=SCREENER_TICKER_CHUNK_SIZE,
+                 lookback_days=SCREENER_LOOKBACK_DAYS):
+        self.check_interval = check_interval
+        self.chunk_size = chunk_size
+        self.lookback_days = lookback_days
+        self._lock = threading.Lock()
+        self._data = None
+        self._checked_at = 0.0
+        self._stale = False
+        self._thread = None
+
+    def build(self):
+        """
+        读取回看窗口内的 stock_history
+
+        Returns:
+            (tickers, dates, closes, volumes, since)：since 为窗口的第一天，
+            早于该日期的区间不能用矩阵计算
+        """
+        info = get_ticker_info()
+        last = max((item['last_trade_date'] for item in info.values()), default=None)
+        if last is None:
+            empty = np.empty((0, 0), dtype=np.float32)
+            return np.array([], dtype=str), np.array([], dtype='datetime64[D]'), empty, empty, None
+
+        since = last - timedelta(days=self.lookback_days)
+        tickers = np.array(sorted(
+            ticker for ticker, item in info.items() if item['last_trade_date'] >= since
+        ), dtype=str)
+        shape = (len(tickers), (last - since).days + 1)
+        closes = np.full(shape, np.nan, dtype=np.float32)
+        volumes = np.full(shape, np.nan, dtype=np.float32)
+        origin = np.datetime64(since, 'D')
+
+        for start in range(0, len(tickers), self.chunk_size):
+            chunk = tickers[start:start + self.chunk_size]
+            rows = list(StockHistory.objects.filter(
+                ticker__in=chunk.tolist(), trade_date__gte=since, trade_date__lte=last
+            ).order_by().values_list('ticker', 'trade_date', 'close_price', 'volume'))
+            if not rows:
+                continue
+            chunk_tickers, chunk_dates, chunk_closes, chunk_volumes = zip(*rows)
+            row_idx = start + np.searchsorted(chunk, np.array(chunk_tickers, dtype=str))
+            col_idx = (np.array(chunk_dates, dtype='datetime64[D]') - origin).astype(np.intp)
+            # 转为浮点时 None 变为 NaN
+            closes[row_idx, col_idx] = np.array(chunk_closes, dtype=np.float64)
+            volumes[row_idx, col_idx] = np.array(chunk_volumes, dtype=np.float64)
+
+        # 周末和节假日没有任何数据，只保留交易日列
+        traded = np.flatnonzero(~(np.isnan(closes).all(axis=0) & np.isnan(volumes).all(axis=0)))
+        return tickers, origin + traded, closes[:, traded], volumes[:, traded], since
+
+    def get(self):
+        """
+        返回 build() 的结果，矩阵尚未构建完成时返回 None
+
+        不在请求线程中查询数据库，需要检查或重建时交给后台线程。
+        """
+        with self._lock:
+            now = time.time()
+            if self._data is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                self._start_refresh()
+            return self._data
+
+    def invalidate(self):
+        """标记矩阵过期，下次访问时在后台重建"""
+        with self._lock:
+            self._stale = True
+            self._checked_at = 0.0
+
+    def _start_refresh(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh, name='close-matrix-refresh', daemon=True)
+            self._thread.start()
+
+    def _needs_rebuild(self):
+        with self._lock:
+            data, stale = self._data, self._stale
+        if data is None or stale:
+            return True
+        last = StockTicker.objects.aggregate(last=Max('last_trade_date'))['last']
+        dates = data[1]
+        return last is None or not len(dates) or np.datetime64(last, 'D') != dates[-1]
+
+    def _refresh(self):
+        try:
+            if self._needs_rebuild():
+                with self._lock:
+                    self._stale = False
+                data = self.build()
+                with self._lock:
+                    self._data = data
+        except Exception:
+            logger.exception('构建收盘价矩阵失败')
+        finally:
+            with self._lock:
+                self._thread = None
+            connection.close()
+
+
+close_matrix = CloseMatrix()
+
+
+def screen_stocks_numpy(start_date, end_date, min_change=None, max_change=None, min_volume=None,
+                        limit=50, offset=0):
+    """用缓存的收盘价矩阵筛选，参数和返回值同 screen_stocks_sql"""
+    data = close_matrix.get()
+    if data is None or data[4] is None or start_date < data[4]:
+        # 矩阵仍在后台构建，或区间开始于回看窗口之前
+        return screen_stocks_sql(start_date, end_date, min_change=min_change, max_change=max_change,
+                                 min_volume=min_volume, limit=limit, offset=offset)
+    tickers, dates, closes, volumes, _ = data
+    lo = np.searchsorted(dates, np.datetime64(start_date, 'D'), 'left')
+    hi = np.searchsorted(dates, np.datetime64(end_date, 'D'), 'right')
+    if lo >= hi:
+        return {field: [] for field in RESULT_FIELDS}, 0
+
+    window = closes[:, lo:hi]
+    valid = ~np.isnan(window)
+    has_data = valid.any(axis=1)
+    rows = np.flatnonzero(has_data)
+    first = valid[rows].argmax(axis=1)
+    last = window.shape[1] - 1 - valid[rows, ::-1].argmax(axis=1)
+    # 舍入到价格字段的 4 位小数，去掉 float32 的表示误差
+    start_prices = window[rows, first].astype(np.float64).round(4)
+    end_prices = window[rows, last].astype(np.float64).round(4)
+    total_volumes = np.nansum(volumes[rows, lo:hi], axis=1, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = (end_prices - start_prices) / start_prices * 100
+    changes[~np.isfinite(changes)] = np.nan
+
+    # 与 SQL 一致：涨跌幅无法计算的股票不满足任何涨跌幅条件
+    keep = np.ones(len(rows), dtype=bool)
+    if min_change is not None:
+        keep &= changes >= float(min_change)
+    if max_change is not None:
+        keep &= changes <= float(max_change)
+    if min_volume is not None:
+        keep &= total_volumes >= float(min_volume)
+    selected = np.flatnonzero(keep)
+
+    # 按涨跌幅降序、股票代码升序，无法计算的排在最后
+    order = np.lexsort((tickers[rows[selected]], np.nan_to_num(-changes[selected], nan=np.inf)))
+    page = selected[order[offset:offset + limit]]
+
+    changes = changes[page]
+    return {
+        'ticker': tickers[rows[page]].tolist(),
+        'start_price': start_prices[page].tolist(),
+        'end_price': end_prices[page].tolist(),
+        'change_percent': np.nan_to_num(changes, nan=0.0).tolist(),
+        'total_volume': total_volumes[page].tolist()
+    }, len(selected)
+
+
+SCREENER_ENGINES = {
+    'sql': screen_stocks_sql,
+    'numpy': screen_stocks_numpy,
+}
+
+
+def screen_stocks(start_date, end_date, engine=None, **filters):
+    """按引擎名称选股，engine 默认 SCREENER_ENGINE"""
+    return SCREENER_ENGINES[engine or SCREENER_ENGINE](start_date, end_date, **filters)
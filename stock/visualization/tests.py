@@ -1,3 +1,166 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from stock.models import StockHistory
+from stock.tests.base import StockHistoryMixin, make_history
+from stock.universe import refresh_tickers
+
+from . import screener
+from .encoding import columns_to_rows, rows_to_columns
+from .market_stats import compute_daily_stats, get_daily_stats, refresh_daily_stats, serialize_daily_stats
+from .models import DailyMarketStats
+
+
+class MarketStatsTests(StockHistoryMixin, TestCase):
+    tickers = ['000001', '600000', '600519', '688001']
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history(self.tickers, count=15)
+        self.today = self.days[-1] + timedelta(days=1)
+
+    def expected(self, start, end):
+        return [serialize_daily_stats(stats) for stats in compute_daily_stats(start, end)]
+
+    def get(self, start, end, today=None):
+        return [serialize_daily_stats(stats) for stats in get_daily_stats(start, end, today=today or self.today)]
+
+    def test_materialized_range(self):
+        self.assertEqual(refresh_daily_stats(), len(self.days))
+        self.assertEqual(self.get(self.days[0], self.days[-1]), self.expected(self.days[0], self.days[-1]))
+        self.assertEqual(self.get(self.days[3], self.days[5]), self.expected(self.days[3], self.days[5]))
+
+    def test_gaps_computed_live(self):
+        refresh_daily_stats()
+        DailyMarketStats.objects.filter(trade_date__in=[self.days[0], self.days[4], self.days[5]]).delete()
+        self.assertEqual(self.get(self.days[0], self.days[-1]), self.expected(self.days[0], self.days[-1]))
+
+    def test_unmaterialized_tail(self):
+        refresh_daily_stats(self.days[0], self.days[9])
+        self.assertEqual(self.get(self.days[0], self.days[-1]), self.expected(self.days[0], self.days[-1]))
+
+    def test_today_computed_live(self):
+        refresh_daily_stats()
+        DailyMarketStats.objects.filter(trade_date=self.days[-1]).update(total_count=0)
+        result = self.get(self.days[-3], self.days[-1], today=self.days[-1])
+        self.assertEqual(result, self.expected(self.days[-3], self.days[-1]))
+        self.assertEqual(result[-1]['total_count'], len(self.tickers))
+
+    def test_empty_table(self):
+        self.assertEqual(self.get(self.days[0], self.days[-1]), self.expected(self.days[0], self.days[-1]))
+
+    def test_summary_shapes(self):
+        params = {'start_date': self.days[0].strftime('%Y-%m-%d'), 'end_date': self.days[-1].strftime('%Y-%m-%d')}
+        rows = self.client.get('/api/market/daily-summary', params).json()['data']
+        columns = self.client.get('/api/market/daily-summary', {**params, 'shape': 'columns'}).json()['data']
+        self.assertEqual(len(rows), len(self.days))
+        self.assertEqual(columns_to_rows(list(columns), list(columns.values())), rows)
+
+
+class ScreenerTests(StockHistoryMixin, TestCase):
+    """NumPy 引擎的结果和总数与 SQL 引擎一致"""
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history([f'{600000 + i}' for i in range(12)], count=40)
+        # 一只在区间中途上市、一只提前停牌的股票
+        make_history(['300750'], count=20, start=self.days[20], seed=7)
+        make_history(['000001'], count=10, seed=8)
+        refresh_tickers()
+
+    def assertEnginesMatch(self, matrix, start, end, **filters):
+        expected, expected_total = screener.screen_stocks_sql(start, end, **filters)
+        with mock.patch.object(screener.close_matrix, 'get', return_value=matrix):
+            result, total = screener.screen_stocks_numpy(start, end, **filters)
+        self.assertEqual(total, expected_total)
+        self.assertEqual(result['ticker'], expected['ticker'])
+        for field in screener.RESULT_FIELDS[1:]:
+            for value, reference in zip(result[field], expected[field]):
+                self.assertAlmostEqual(value, float(reference), places=3, msg=field)
+
+    def test_engines_match(self):
+        matrix = screener.CloseMatrix().build()
+        self.assertEqual(matrix[2].dtype.name, 'float32')
+        self.assertEqual(len(matrix[1]), len(self.days))
+        ranges = [(self.days[0], self.days[-1]), (self.days[5], self.days[25]), (self.days[22], self.days[22])]
+        for start, end in ranges:
+            self.assertEnginesMatch(matrix, start, end)
+            self.assertEnginesMatch(matrix, start, end, min_change=0)
+            self.assertEnginesMatch(matrix, start, end, max_change=-1, min_volume=5000)
+            self.assertEnginesMatch(matrix, start, end, limit=4, offset=4)
+            self.assertEnginesMatch(matrix, start, end, limit=4, offset=100)
+
+    def test_lookback_window(self):
+        matrix = screener.CloseMatrix(lookback_days=14).build()
+        tickers, dates, closes, volumes, since = matrix
+        self.assertEqual(since, self.days[-1] - timedelta(days=14))
+        self.assertGreaterEqual(dates[0], since)
+        self.assertNotIn('000001', tickers.tolist())
+        self.assertEqual(closes.shape, (len(tickers), len(dates)))
+
+        # 开始日期在窗口内用矩阵计算，更早的开始日期改用 SQL
+        self.assertEnginesMatch(matrix, self.days[-5], self.days[-1])
+        with mock.patch.object(screener, 'screen_stocks_sql', wraps=screener.screen_stocks_sql) as sql:
+            self.assertEnginesMatch(matrix, self.days[0], self.days[-1])
+        # 一次是参照结果，一次是 NumPy 引擎回退
+        self.assertEqual(sql.call_count, 2)
+
+    def test_empty_registry(self):
+        with mock.patch.object(screener, 'get_ticker_info', return_value={}):
+            tickers, dates, closes, volumes, since = screener.CloseMatrix().build()
+        self.assertIsNone(since)
+        self.assertEqual(len(tickers), 0)
+
+
+class StockDetailsTests(StockHistoryMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.days = make_history(['600000', '600519'], count=60)
+
+    def fetch(self, **params):
+        response = self.client.get('/api/stocks/details', {
+            'tickers': '600000,600519,300750',
+            'start_date': self.days[10].strftime('%Y-%m-%d'),
+            'end_date': self.days[40].strftime('%Y-%m-%d'),
+            **params
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_window(self):
+        data = self.fetch()
+        self.assertEqual(data['300750'], [])
+        closes = StockHistory.objects.filter(
+            ticker='600000', trade_date__gte=self.days[10], trade_date__lte=self.days[40]
+        ).order_by('trade_date').values_list('trade_date', 'close_price')
+        self.assertEqual(data['600000'], [
+            {'date': trade_date.strftime('%Y-%m-%d'), 'price': float(close)} for trade_date, close in closes
+        ])
+
+    def test_downsampled(self):
+        full = self.fetch()['600519']
+        points = self.fetch(max_points=10)['600519']
+        self.assertEqual(len(points), 10)
+        self.assertEqual(points[0], full[0])
+        self.assertEqual(points[-1], full[-1])
+        self.assertTrue(all(point in full for point in points))
+
+
+class EncodingTests(SimpleTestCase):
+
+    def test_rows_columns_round_trip(self):
+        names = ('ticker', 'change_percent')
+        columns = [['600000', '000001'], [1.5, -0.25]]
+        rows = columns_to_rows(names, columns)
+        self.assertEqual(rows, [
+            {'ticker': '600000', 'change_percent': 1.5},
+            {'ticker': '000001', 'change_percent': -0.25},
+        ])
+        self.assertEqual(rows_to_columns(rows, names), dict(zip(names, columns)))
+
+    def test_empty(self):
+        self.assertEqual(columns_to_rows(('ticker',), [[]]), [])
+        self.assertEqual(rows_to_columns([], ('ticker',)), {'ticker': []})
@@ -8,6 +8,7 @@ urlpatterns = [
     path('api/stocks/<str:ticker>/kline', views.get_stock_kline, name='stock_kline'),
     path('api/stocks/list', views.stock_list, name='stock_list'),
     path('api/stocks/<str:ticker>/detail', views.stock_detail, name='stock_detail'),
+    path('api/stocks/details', views.stock_details, name='stock_details'),
 
     # 页面路由
     path('', views.index, name='index'),
@@ -1,14 +1,31 @@
 from django.http import JsonResponse
 from django.shortcuts import render
-from django.views.decorators.http import require_http_methods
-from django.db import connection
-from datetime import datetime, timedelta, date
-from decimal import Decimal
+from django.views.decorators.http import condition, require_http_methods
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from stock.downsample import lttb_indices
+from stock.rollups import OHLCV_COLUMNS, get_nday_bars, get_rollup_bars
+from stock.series import PRICE_COLUMNS, date_strings, load_series, series_store, to_json_list
+from stock.universe import UNIVERSE_SEARCH_LIMIT, get_ticker_info, ticker_universe
+
+from .encoding import FastJsonResponse, columns_to_rows, get_result_shape, rows_to_columns
+from .market_stats import STATS_FIELDS, get_daily_stats, serialize_daily_stats
+from .screener import RESULT_FIELDS, SCREENER_ENGINES, screen_stocks
+
+
+# 批量迷你图表一次最多查询的股票数量
+MAX_DETAIL_TICKERS = 200
 
 
 @require_http_methods(["GET"])
 def daily_market_summary(request):
-    """每日市场涨跌统计"""
+    """
+    每日市场涨跌统计
+
+    参数 shape=columns 时 data 为 {字段: 数组}
+    """
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
 
@@ -23,44 +40,22 @@ def daily_market_summary(request):
     else:
         start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
 
-    with connection.cursor() as cursor:
-        # 计算每日涨跌情况
-        cursor.execute("""
-            SELECT trade_date,
-                   COUNT(*) as total_count,
-                   SUM(CASE WHEN close_price > open_price THEN 1 ELSE 0 END) as up_count,
-                   SUM(CASE WHEN close_price < open_price THEN 1 ELSE 0 END) as down_count,
-                   SUM(CASE WHEN close_price = open_price THEN 1 ELSE 0 END) as flat_count,
-                   AVG(CASE WHEN close_price > open_price
-                       THEN (close_price - open_price) / open_price * 100
-                       ELSE NULL END) as avg_up_percent,
-                   AVG(CASE WHEN close_price < open_price
-                       THEN (close_price - open_price) / open_price * 100
-                       ELSE NULL END) as avg_down_percent
-            FROM stock_history
-            WHERE trade_date BETWEEN %s AND %s
-            GROUP BY trade_date
-            ORDER BY trade_date
-        """, [start_date, end_date])
-
-        columns = [col[0] for col in cursor.description]
-        daily_stats = []
-        for row in cursor.fetchall():
-            data = dict(zip(columns, row))
-            # 转换Decimal为float
-            for key, value in data.items():
-                if isinstance(value, Decimal):
-                    data[key] = float(value)
-                elif isinstance(value, date):
-                    data[key] = str(value)
-            daily_stats.append(data)
-
-    return JsonResponse({'data': daily_stats})
+    # 已物化的交易日按主键范围读取，其余日期实时聚合
+    daily_stats = [serialize_daily_stats(stats) for stats in get_daily_stats(start_date, end_date)]
+
+    if get_result_shape(request) == 'columns':
+        return FastJsonResponse({'data': rows_to_columns(daily_stats, ('trade_date',) + STATS_FIELDS)})
+    return FastJsonResponse({'data': daily_stats})
 
 
 @require_http_methods(["GET"])
 def stock_screener(request):
-    """股票选股接口"""
+    """
+    股票选股接口
+
+    按区间内首末交易日收盘价计算涨跌幅，total 为满足筛选条件的股票数。
+    参数 engine=sql（默认）或 numpy；shape=columns 时 stocks 为 {字段: 数组}
+    """
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     min_change = request.GET.get('min_change')  # 最小涨跌幅
@@ -80,65 +75,29 @@ def stock_screener(request):
     else:
         start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
 
-    with connection.cursor() as cursor:
-        # 计算每个股票在指定日期范围内的涨跌幅
-        cursor.execute("""
-            WITH stock_range AS (
-                SELECT ticker,
-                       MAX(CASE WHEN trade_date >= %s THEN trade_date END) as start_day,
-                       MAX(CASE WHEN trade_date <= %s THEN trade_date END) as end_day
-                FROM stock_history
-                GROUP BY ticker
-            ),
-            price_range AS (
-                SELECT sr.ticker,
-                       (SELECT close_price FROM stock_history sh
-                        WHERE sh.ticker = sr.ticker AND sh.trade_date = sr.end_day) as end_price,
-                       (SELECT close_price FROM stock_history sh
-                        WHERE sh.ticker = sr.ticker AND sh.trade_date = sr.start_day) as start_price
-                FROM stock_range sr
-                WHERE sr.start_day IS NOT NULL AND sr.end_day IS NOT NULL
-            ),
-            stock_data AS (
-                SELECT pr.ticker,
-                       pr.start_price,
-                       pr.end_price,
-                       ((pr.end_price - pr.start_price) / pr.start_price * 100) as change_percent,
-                       (SELECT SUM(sh.volume) FROM stock_history sh
-                        WHERE sh.ticker = pr.ticker AND sh.trade_date BETWEEN %s AND %s) as total_volume
-                FROM price_range pr
-            )
-            SELECT * FROM stock_data
-            WHERE (%s IS NULL OR change_percent >= %s)
-              AND (%s IS NULL OR change_percent <= %s)
-              AND (%s IS NULL OR total_volume >= %s)
-            ORDER BY change_percent DESC
-            LIMIT %s OFFSET %s
-        """, [start_date, end_date, start_date, end_date,
-              min_change, min_change, max_change, max_change,
-              min_volume, min_volume, page_size, (page - 1) * page_size])
-
-        columns = [col[0] for col in cursor.description]
-        stocks = []
-        for row in cursor.fetchall():
-            data = dict(zip(columns, row))
-            # 转换Decimal为float
-            for key, value in data.items():
-                if isinstance(value, Decimal):
-                    data[key] = float(value)
-                elif value is None:
-                    data[key] = 0.0
-            stocks.append(data)
-
-        # 获取总数
-        cursor.execute("""
-            SELECT COUNT(DISTINCT ticker)
-            FROM stock_history
-            WHERE trade_date BETWEEN %s AND %s
-        """, [start_date, end_date])
-        total = cursor.fetchone()[0]
-
-    return JsonResponse({
+    try:
+        min_change, max_change, min_volume = (
+            float(value) if value not in (None, '') else None for value in (min_change, max_change, min_volume)
+        )
+    except ValueError:
+        return JsonResponse({'error': 'min_change/max_change/min_volume 应为数字'}, status=400)
+
+    # engine=numpy 时使用内存中的收盘价矩阵筛选
+    engine = request.GET.get('engine')
+    if engine is not None and engine not in SCREENER_ENGINES:
+        return JsonResponse({'error': f'engine 应为 {"/".join(SCREENER_ENGINES)}'}, status=400)
+
+    columns, total = screen_stocks(
+        start_date, end_date, engine=engine,
+        min_change=min_change, max_change=max_change, min_volume=min_volume,
+        limit=page_size, offset=(page - 1) * page_size
+    )
+    if get_result_shape(request) == 'columns':
+        stocks = columns
+    else:
+        stocks = columns_to_rows(RESULT_FIELDS, [columns[field] for field in RESULT_FIELDS])
+
+    return FastJsonResponse({
         'stocks': stocks,
         'total': total,
         'page': page,
@@ -148,8 +107,13 @@ def stock_screener(request):
 
 @require_http_methods(["GET"])
 def get_stock_kline(request, ticker):
-    """获取股票K线数据"""
-    period = request.GET.get('period', 'daily')  # daily, weekly, monthly
+    """
+    获取股票K线数据
+
+    period 为 daily、weekly、monthly 或 nday（每 n 个交易日一根，参数 n 默认 5）；
+    shape=columns 时 data 为 {字段: 数组}
+    """
+    period = request.GET.get('period', 'daily')  # daily, weekly, monthly, nday
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
 
@@ -164,74 +128,69 @@ def get_stock_kline(request, ticker):
     else:
         start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
 
-    with connection.cursor() as cursor:
-        if period == 'daily':
-            cursor.execute("""
-                SELECT trade_date, open_price, high_price, low_price, close_price, volume,
-                       ma_1, ma_2, ma_3
-                FROM stock_history
-                WHERE ticker = %s
-                  AND trade_date BETWEEN %s AND %s
-                ORDER BY trade_date
-            """, [ticker, start_date, end_date])
-        elif period == 'weekly':
-            cursor.execute("""
-                SELECT
-                    DATE(DATE_SUB(trade_date, INTERVAL WEEKDAY(trade_date) DAY)) as trade_date,
-                    MIN(open_price) as open_price,
-                    MAX(high_price) as high_price,
-                    MIN(low_price) as low_price,
-                    MAX(close_price) as close_price,
-                    SUM(volume) as volume
-                FROM stock_history
-                WHERE ticker = %s
-                  AND trade_date BETWEEN %s AND %s
-                GROUP BY YEAR(trade_date), WEEK(trade_date, 5), DATE(DATE_SUB(trade_date, INTERVAL WEEKDAY(trade_date) DAY))
-                ORDER BY trade_date
-            """, [ticker, start_date, end_date])
-        else:  # monthly
-            cursor.execute("""
-                SELECT
-                    DATE_FORMAT(trade_date, '%Y-%m-01') as trade_date,
-                    MIN(open_price) as open_price,
-                    MAX(high_price) as high_price,
-                    MIN(low_price) as low_price,
-                    MAX(close_price) as close_price,
-                    SUM(volume) as volume
-                FROM stock_history
-                WHERE ticker = %s
-                  AND trade_date BETWEEN %s AND %s
-                GROUP BY YEAR(trade_date), MONTH(trade_date)
-                ORDER BY trade_date
-            """, [ticker, start_date, end_date])
-
-        columns = [col[0] for col in cursor.description]
-        data = []
-        for row in cursor.fetchall():
-            item = dict(zip(columns, row))
-            # 转换Decimal为float
-            for key, value in item.items():
-                if isinstance(value, Decimal):
-                    item[key] = float(value)
-                elif isinstance(value, date):
-                    item[key] = str(value)
-            data.append(item)
-
-    return JsonResponse({'data': data})
+    if period == 'daily':
+        # 日线直接从序列缓存截取
+        dates, columns = series_store.get(ticker).window(start=start_date, end=end_date)
+        names = ['trade_date'] + [field for field, _ in PRICE_COLUMNS]
+        values = [date_strings(dates)] + [to_json_list(columns[name]) for _, name in PRICE_COLUMNS]
+        if get_result_shape(request) == 'columns':
+            return FastJsonResponse({'data': dict(zip(names, values))})
+        return FastJsonResponse({'data': columns_to_rows(names, values)})
+
+    if period == 'nday':
+        # 每 n 个交易日一根，从首个交易日起分组，分组不随查询范围变化
+        try:
+            n = max(int(request.GET.get('n', 5)), 1)
+        except ValueError:
+            return JsonResponse({'error': 'n 应为整数'}, status=400)
+        data = get_nday_bars(ticker, n, start_date, end_date)
+    else:
+        # 周线/月线读取物化表，最新周期实时聚合
+        data = get_rollup_bars(ticker, 'weekly' if period == 'weekly' else 'monthly', start_date, end_date)
+
+    if get_result_shape(request) == 'columns':
+        data = rows_to_columns(data, ('trade_date',) + tuple(field for field, _ in OHLCV_COLUMNS))
+    return FastJsonResponse({'data': data})
+
+
+def _stock_list_etag(request):
+    return ticker_universe.etag()
 
 
 @require_http_methods(["GET"])
+@condition(etag_func=_stock_list_etag)
 def stock_list(request):
-    """获取股票列表"""
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT DISTINCT ticker
-            FROM stock_history
-            ORDER BY ticker
-        """)
-        stocks = [row[0] for row in cursor.fetchall()]
+    """
+    获取股票列表
+
+    从内存中的股票代码登记表返回，带 ETag。参数:
+        q: 代码前缀，用于自动补全
+        limit: 前缀搜索返回的最大数量，默认 20
+        detail: 为 1 时返回每只股票的首末交易日和行数
+    """
+    prefix = request.GET.get('q')
+    if prefix:
+        try:
+            limit = min(max(int(request.GET.get('limit', UNIVERSE_SEARCH_LIMIT)), 1), 1000)
+        except ValueError:
+            return JsonResponse({'error': 'limit 应为整数'}, status=400)
+        stocks = ticker_universe.search(prefix, limit)
+    else:
+        stocks = ticker_universe.tickers()
+
+    if request.GET.get('detail') == '1':
+        info = get_ticker_info(stocks if prefix else None)
+        return FastJsonResponse({'stocks': [
+            {
+                'ticker': ticker,
+                'first_trade_date': info[ticker]['first_trade_date'].strftime('%Y-%m-%d'),
+                'last_trade_date': info[ticker]['last_trade_date'].strftime('%Y-%m-%d'),
+                'row_count': info[ticker]['row_count']
+            }
+            for ticker in stocks if ticker in info
+        ]})
 
-    return JsonResponse({'stocks': stocks})
+    return FastJsonResponse({'stocks': stocks})
 
 
 @require_http_methods(["GET"])
@@ -250,18 +209,55 @@ def stock_detail(request, ticker):
     else:
         start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
 
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT trade_date, close_price
-            FROM stock_history
-            WHERE ticker = %s
-              AND trade_date BETWEEN %s AND %s
-            ORDER BY trade_date
-        """, [ticker, start_date, end_date])
+    dates, columns = series_store.get(ticker).window(start=start_date, end=end_date)
+    data = [
+        {'date': trade_date, 'price': price}
+        for trade_date, price in zip(date_strings(dates), columns['close'].tolist())
+    ]
 
-        data = [{'date': str(row[0]), 'price': float(row[1])} for row in cursor.fetchall()]
+    return FastJsonResponse({'data': data})
 
-    return JsonResponse({'data': data})
+
+@require_http_methods(["GET"])
+def stock_details(request):
+    """
+    批量获取多只股票的收盘价（用于曲线选股一页结果的迷你图表）
+
+    参数:
+        tickers: 逗号分隔的股票代码，最多 MAX_DETAIL_TICKERS 只
+        start_date/end_date: 日期范围，默认同 stock_detail
+        max_points: 每只股票用 LTTB 降采样到至多 max_points 个点
+    """
+    tickers = [t for t in request.GET.get('tickers', '').split(',') if t]
+    if not tickers:
+        return JsonResponse({'error': '缺少 tickers 参数'}, status=400)
+    if len(tickers) > MAX_DETAIL_TICKERS:
+        return JsonResponse({'error': f'一次最多查询 {MAX_DETAIL_TICKERS} 只股票'}, status=400)
+
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    try:
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else datetime.now().date()
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date \
+            else end_date - timedelta(days=30)
+        max_points = int(request.GET.get('max_points') or 0)
+    except ValueError:
+        return JsonResponse({'error': '日期格式应为 YYYY-MM-DD，max_points 应为整数'}, status=400)
+
+    # 只读取日期范围内的收盘价，全部股票合并为一次查询
+    data = {}
+    for ticker, series in load_series(tickers, ('close_price',), start=start_date, end=end_date).items():
+        dates = np.array(series['dates'], dtype='datetime64[D]')
+        closes = np.array(series['close_price'], dtype=np.float64)
+        if max_points > 0:
+            selected = lttb_indices(closes, max_points)
+            dates, closes = dates[selected], closes[selected]
+        data[ticker] = [
+            {'date': trade_date, 'price': price}
+            for trade_date, price in zip(date_strings(dates), closes.tolist())
+        ]
+
+    return FastJsonResponse({'data': data})
 
 
 def index(request):